@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark loading a synthetic PatentsView dataset."""
+
+import argparse
+import json
+import os
+
+from handler.benchmark import LoadBenchmark
+from handler.sinks import FileSink, MemorySink
+from handler.synthetic import SyntheticPatentsView
+
+if __name__ == "__main__":
+    pparser = argparse.ArgumentParser()
+    pparser.add_argument('data', help='dir of the synthetic dataset')
+    pparser.add_argument('--scale', type=float, default=0.001,
+                         help='fraction of the real release to generate')
+    pparser.add_argument('--skew', type=float, default=1.1,
+                         help=('Zipf exponent of citations, assignee sizes '
+                               'and code popularity'))
+    pparser.add_argument('--seed', type=int, default=0,
+                         help='seed of the generator')
+    pparser.add_argument('--regenerate', action='store_true',
+                         help=('write the dataset even if it exists, with '
+                               'new parameters'))
+    pparser.add_argument('--stages', nargs='+', metavar='STAGE',
+                         choices=['read', 'construct', 'load'],
+                         default=['read', 'construct', 'load'],
+                         help='stages to time, read, construct and load')
+    pparser.add_argument('--sink', default='memory',
+                         choices=['memory', 'csv', 'parquet'],
+                         help='where the load stage writes to')
+    pparser.add_argument('--sink-dir', metavar='DIR',
+                         help=('dir of csv and parquet sinks, defaults to '
+                               'sink in the data dir'))
+    pparser.add_argument('--batch-size', type=int, default=10000,
+                         help='rows per transaction to start each phase with')
+    pparser.add_argument('--report', default='benchmark.json',
+                         help='JSON report to write')
+    args = pparser.parse_args()
+    manifest = os.path.join(args.data, 'synthetic.json')
+    if args.regenerate or not os.path.exists(manifest):
+        SyntheticPatentsView(args.data, args.scale, args.skew,
+                             args.seed).generate()
+    with open(manifest, 'r') as ifp:
+        dataset = json.load(ifp)
+    if args.sink == 'memory':
+        sink = MemorySink()
+    else:
+        sink = FileSink(args.sink_dir or os.path.join(args.data, 'sink'),
+                        args.sink)
+    with sink:
+        benchmark = LoadBenchmark(args.data, sink,
+                                  {'batch_size': args.batch_size})
+        benchmark.run(args.stages)
+        report = benchmark.report(args.report, dataset)
+    for stage, seconds in report['totals'].items():
+        print('{}: {:.3f}s'.format(stage, seconds))
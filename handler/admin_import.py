@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+
+from .patentsview_handler import (HIERARCHICAL, PatentsViewHandler,
+                                  code_hierarchy)
+
+
+def _slices(frame, chunksize):
+    """Yield consecutive row slices of a frame."""
+    for start in range(0, len(frame), chunksize):
+        yield frame.iloc[start:start + chunksize]
+
+
+def _strip(column):
+    """Strip a string column, mapping missing values to ''."""
+    return column.where(column.notnull(), '').astype(str).str.strip()
+
+
+class AdminImportHandler(object):
+    """Export PatentsView dataset as CSV files for ``neo4j-admin import``.
+
+    Node files carry typed headers with one ID space per label, e.g.,
+    ``pid:ID(patent)``, relationship files use ``:START_ID(...)`` and
+    ``:END_ID(...)``. Every table is written to disk in chunks, the citation
+    table is streamed from the raw TSV and never held in memory as a whole.
+
+    .. note::
+
+       Unlike the MERGE based loader, citations are only deduplicated within a
+       chunk. Pairs pointing at patents that do not exist are dropped by
+       ``--skip-bad-relationships``.
+
+    Parameters
+    ----------
+    data : str
+        Dir to data files.
+    opath : str
+        Dir to write CSV files to.
+    chunksize : int
+        Number of rows written per chunk.
+    compact : bool
+        Link patents only to the most specific code of hierarchical
+        classifications and link codes to their parents by SUBCLASS_OF
+        relationships.
+
+    Attributes
+    ----------
+    _data : str
+        Dir to data files.
+    _opath : str
+        Dir to write CSV files to.
+    _chunksize : int
+        Number of rows written per chunk.
+    _compact : bool
+        Write the compact classification schema.
+    _nodes : list
+        (label, path) of written node files.
+    _relationships : list
+        (type, path) of written relationship files.
+
+    """
+
+    def __init__(self, data, opath, chunksize=1000000, compact=False):
+        super(AdminImportHandler, self).__init__()
+        self._data = data
+        self._opath = opath
+        self._chunksize = chunksize
+        self._compact = compact
+        self._nodes = []
+        self._relationships = []
+        os.makedirs(opath, exist_ok=True)
+
+    def export_patentsview(self):
+        """Export PatentsView dataset and print the import command."""
+        self.export_patent_nodes()
+        self.export_assignee_nodes()
+        self.export_inventor_nodes()
+        self.export_location_nodes()
+        self.export_citation_relationships()
+        self.export_patent_assignee_relationships()
+        self.export_patent_inventor_relationships()
+        self.export_assignee_location_relationships()
+        self.export_inventor_location_relationships()
+        self.export_classification('cpc', ['cpc_section', 'cpc_subsection',
+                                           'cpc_group', 'cpc_subgroup'])
+        self.export_classification('uspc', ['uspc_mainclass',
+                                            'uspc_subclass'])
+        self.export_classification('ipcr', ['ipcr_section', 'ipcr_class',
+                                            'ipcr_subclass', 'ipcr_group',
+                                            'ipcr_subgroup'])
+        self.export_classification('nber', ['nber_category',
+                                            'nber_subcategory'])
+        print(self.import_command())
+
+    def import_command(self):
+        """Build the ``neo4j-admin import`` command for written files.
+
+        Returns
+        -------
+        str
+            Shell command.
+
+        """
+
+        args = ['neo4j-admin import', '--id-type=STRING',
+                '--skip-bad-relationships=true']
+        args += ['--nodes={}={}'.format(label, path)
+                 for label, path in self._nodes]
+        args += ['--relationships={}={}'.format(rel_type, path)
+                 for rel_type, path in self._relationships]
+        return ' \\\n    '.join(args)
+
+    def export_patent_nodes(self):
+        """Write patent nodes."""
+
+        print('Exporting patent nodes.')
+        patents = PatentsViewHandler(self._data).construct_patent_nodes()
+        header = ['pid:ID(patent)', 'type', 'date:date', 'application_id',
+                  'series_code', 'application_date:date', 'dependent:int',
+                  'independent:int', 'foreigncitation:int',
+                  'otherreference:int', 'applicationcitation:int']
+        columns = ['pid', 'type', 'date', 'application_id', 'series_code',
+                   'application_date', 'dependent', 'independent',
+                   'foreigncitation', 'otherreference', 'applicationcitation']
+
+        def convert(chunk):
+            chunk = chunk.reset_index()
+            chunk['date'] = chunk['date'].dt.strftime('%Y-%m-%d')
+            chunk['application_date'] = pd.to_datetime(  # e.g., '1968-05-00'
+                    chunk['application_date'], format='%Y-%m-%d',
+                    errors='coerce').dt.strftime('%Y-%m-%d')
+            for column in columns[6:]:
+                chunk[column] = chunk[column].astype('Int64')
+            return chunk[columns]
+
+        self._write_nodes('patent', header,
+                          map(convert, _slices(patents, self._chunksize)))
+
+    def export_assignee_nodes(self):
+        """Write assignee nodes."""
+
+        print('Exporting assignee nodes.')
+        assignees = PatentsViewHandler(self._data).construct_assignee_nodes()
+        header = ['assignee_id:ID(assignee)', 'assignee_name',
+                  'assignee_type']
+
+        def convert(chunk):
+            chunk = chunk.reset_index()
+            return pd.DataFrame({column: _strip(chunk[column]) for column in
+                                 ['assignee_id', 'assignee_name',
+                                  'assignee_type']})
+
+        self._write_nodes('assignee', header,
+                          map(convert, _slices(assignees, self._chunksize)))
+
+    def export_inventor_nodes(self):
+        """Write inventor nodes."""
+
+        print('Exporting inventor nodes.')
+        inventors = PatentsViewHandler(self._data).construct_inventor_nodes()
+        header = ['inventor_id:ID(inventor)', 'inventor_name']
+
+        def convert(chunk):
+            chunk = chunk.reset_index()
+            chunk['inventor_name'] = _strip(chunk['inventor_name'])
+            return chunk[['inventor_id', 'inventor_name']]
+
+        self._write_nodes('inventor', header,
+                          map(convert, _slices(inventors, self._chunksize)))
+
+    def export_location_nodes(self):
+        """Write location nodes."""
+
+        print('Exporting location nodes.')
+        locations = PatentsViewHandler(self._data).construct_location_nodes()
+        header = ['location_id:ID(location)', 'city', 'state', 'country',
+                  'gps:point', 'county', 'state_fips', 'county_fips']
+
+        def convert(chunk):
+            chunk = chunk.reset_index()
+            valid = chunk['longitude'].notnull() & chunk['latitude'].notnull()
+            chunk['gps'] = ('{longitude:' + chunk['longitude'] +
+                            ', latitude:' + chunk['latitude'] + '}')
+            chunk['gps'] = chunk['gps'].where(valid, None)
+            return chunk[['location_id', 'city', 'state', 'country', 'gps',
+                          'county', 'state_fips', 'county_fips']]
+
+        self._write_nodes('location', header,
+                          map(convert, _slices(locations, self._chunksize)))
+
+    def export_citation_relationships(self):
+        """Write citation relationships, streaming the raw table."""
+
+        print('Exporting citation relationships.')
+        handler = PatentsViewHandler(self._data)
+        chunks = (chunk[['patent_id', 'citation_id']].drop_duplicates()
+                  for chunk in handler.iter_patent_citations(self._chunksize))
+        self._write_relationships('CITES', 'patent', 'patent', chunks)
+
+    def export_patent_assignee_relationships(self):
+        """Write patent-assignee relationships."""
+
+        print('Exporting patent-assignee relationships.')
+        handler = PatentsViewHandler(self._data)
+        edges = handler.construct_patent_assignee_edges()
+        edges = pd.DataFrame({'assignee_id': _strip(edges['assignee_id']),
+                              'patent_id': _strip(edges['patent_id'])})
+        self._write_relationships(
+                'OWNS', 'assignee', 'patent',
+                _slices(edges.drop_duplicates(), self._chunksize))
+
+    def export_patent_inventor_relationships(self):
+        """Write patent-inventor relationships."""
+
+        print('Exporting patent-inventor relationships.')
+        handler = PatentsViewHandler(self._data)
+        edges = handler.construct_patent_inventor_edges()
+        edges = edges[['inventor_id', 'patent_id']].drop_duplicates()
+        self._write_relationships('INVENTS', 'inventor', 'patent',
+                                  _slices(edges, self._chunksize))
+
+    def export_assignee_location_relationships(self):
+        """Write assignee-location relationships."""
+
+        print('Exporting assignee-location relationships.')
+        handler = PatentsViewHandler(self._data)
+        edges = handler.construct_assignee_location_edges()
+        edges = edges[['assignee_id', 'location_id']].drop_duplicates()
+        self._write_relationships('LOCATES_AT', 'assignee', 'location',
+                                  _slices(edges, self._chunksize))
+
+    def export_inventor_location_relationships(self):
+        """Write inventor-location relationships."""
+
+        print('Exporting inventor-location relationships.')
+        handler = PatentsViewHandler(self._data)
+        edges = handler.construct_inventor_location_edges()
+        edges = edges[['inventor_id', 'location_id']].drop_duplicates()
+        self._write_relationships('LOCATES_AT', 'inventor', 'location',
+                                  _slices(edges, self._chunksize))
+
+    def export_classification(self, scheme, levels):
+        """Write classification nodes and patent BELONGS_TO edges, in the
+        compact schema only those of the most specific level plus SUBCLASS_OF
+        edges between codes.
+
+        Parameters
+        ----------
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber'.
+        levels : list
+            Classification levels, i.e., node labels and columns.
+
+        """
+
+        print('Exporting {} nodes and edges.'.format(scheme))
+        construct = getattr(PatentsViewHandler(self._data),
+                            'construct_{}_nodes'.format(scheme))
+        nodes, edges = construct()
+        for level, codes in zip(levels, nodes):
+            codes = pd.DataFrame({'id': sorted(str(code) for code in codes)})
+            self._write_nodes(level, ['id:ID({})'.format(level)],
+                              _slices(codes, self._chunksize))
+        if self._compact and scheme in HIERARCHICAL:
+            for child, parent, pairs in code_hierarchy(edges, levels):
+                self._write_relationships('SUBCLASS_OF', child, parent,
+                                          _slices(pairs, self._chunksize),
+                                          name='subclass_of_{}'.format(child))
+            levels = levels[-1:]
+        for level in levels:
+            pairs = edges[['patent_id', level]].drop_duplicates()
+            self._write_relationships('BELONGS_TO', 'patent', level,
+                                      _slices(pairs, self._chunksize),
+                                      name='belongs_to_{}'.format(level))
+
+    def _write_nodes(self, label, header, chunks):
+        """Write node chunks to ``<label>.csv``."""
+        path = self._write(label, header, chunks)
+        self._nodes.append((label, path))
+
+    def _write_relationships(self, rel_type, start, end, chunks, name=None):
+        """Write (start id, end id) chunks to a relationship file."""
+        name = name or '{}_{}_{}'.format(start, rel_type.lower(), end)
+        header = [':START_ID({})'.format(start), ':END_ID({})'.format(end)]
+        path = self._write(name, header, chunks)
+        self._relationships.append((rel_type, path))
+
+    def _write(self, name, header, chunks):
+        """Write a header line followed by chunks of rows.
+
+        Parameters
+        ----------
+        name : str
+            File name without extension.
+        header : list
+            Typed header fields, one per column.
+        chunks : iterable
+            :class:`pandas.DataFrame` chunks with columns in header order.
+
+        Returns
+        -------
+        str
+            Path to the written file.
+
+        """
+
+        path = os.path.join(self._opath, '{}.csv'.format(name))
+        with open(path, 'w', newline='') as ofp:
+            ofp.write(','.join(header) + '\n')
+            for ix, chunk in enumerate(chunks, start=1):
+                print('[CHUNK {:04d}] {}'.format(ix, name))
+                chunk.to_csv(ofp, header=False, index=False)
+        return path
@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+import pandas as pd
+
+from .batching import oversized
+from .metrics import payload_size
+from .neo4j_handler import (NODE_BATCH, Neo4jHandler, classification_triples,
+                            merge_statement, relationship_batch)
+from .patentsview_handler import code_hierarchy
+from .scheduler import PhaseScheduler
+from .streaming import Stream
+
+
+class AsyncNeo4jHandler(Neo4jHandler):
+    """Load the PatentsView dataset through the neo4j asyncio driver.
+
+    Every phase is a pipeline: a producer turns batches into statement
+    parameters on a worker thread while up to ``in_flight`` transactions,
+    each on its own session, are committing on the server. The producer runs
+    at most ``prefetch`` batches ahead of the writers, so a slow database
+    holds back the client instead of filling its memory.
+
+    Phases have the same names and dependencies as in :class:`Neo4jHandler`,
+    see :attr:`Neo4jHandler.PHASES`, but are coroutines. Checkpoints are
+    recorded as batches commit, which may be out of order.
+
+    .. note::
+
+       Requires neo4j 5.0 or later. Concurrent transactions of one phase may
+       deadlock on shared nodes; they are retried by the driver.
+
+    Parameters
+    ----------
+    credential : str
+        Path to credential file.
+    data : str
+        Dir to data files.
+    in_flight : int
+        Maximum number of transactions committing at the same time per phase.
+    prefetch : int
+        Maximum number of prepared batches waiting for a writer per phase.
+    kwargs : dict
+        Passed to :class:`Neo4jHandler`.
+
+    Attributes
+    ----------
+    _in_flight : int
+        Maximum number of transactions committing at the same time per phase.
+    _prefetch : int
+        Maximum number of prepared batches waiting for a writer per phase.
+
+    """
+
+    def __init__(self, credential, data, in_flight=4, prefetch=2, **kwargs):
+        super(AsyncNeo4jHandler, self).__init__(credential, data, **kwargs)
+        self._in_flight = in_flight
+        self._prefetch = prefetch
+
+    def load_patentsview(self, workers=1, only=None, skip=()):
+        """Load PatentsView dataset into Neo4j database.
+
+        Runs an event loop until all phases have finished. A failing phase
+        cancels the phases still running. Constraints and indexes are created
+        around the event loop, as by :meth:`Neo4jHandler.load_patentsview`.
+
+        Parameters
+        ----------
+        workers : int
+            Maximum number of phases running at the same time.
+        only : list
+            Run only these phases, None to run all.
+        skip : list
+            Phases already loaded.
+
+        """
+
+        self._schema.create_constraints()
+        asyncio.run(self._load_patentsview(workers, only, skip))
+        self.create_indexes()
+
+    async def _load_patentsview(self, workers, only, skip):
+        """Run phases on the event loop, see :meth:`load_patentsview`."""
+        scheduler = PhaseScheduler(workers)
+        for name, method, requires in self.PHASES:
+            scheduler.add(name, getattr(self, method), requires)
+        pending = scheduler.order(only, skip)
+        finished = {name: asyncio.Event() for name in pending}
+        slots = asyncio.Semaphore(workers)
+
+        async def run(name, method, requires):
+            for required in requires:
+                if required in finished:
+                    await finished[required].wait()
+            async with slots:
+                print('[PHASE] Start {}.'.format(name))
+                start = time.time()
+                try:
+                    await getattr(self, method)()
+                except Exception:
+                    print('[PHASE] {} failed.'.format(name))
+                    raise
+                print('[PHASE] Finish {} in {:.1f}s.'.format(
+                    name, time.time() - start))
+            finished[name].set()
+
+        tasks = [asyncio.ensure_future(run(name, method, requires))
+                 for name, method, requires in self.PHASES
+                 if name in finished]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._connection.aclose()
+
+    async def create_patent_nodes(self, batch_size=None):
+        """CREATE patent nodes in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_nodes('patent', 'construct_patent_nodes',
+                               self._patent_records,
+                               batch_size=batch_size)
+
+    async def create_assignee_nodes(self, batch_size=None):
+        """CREATE assignee nodes in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_nodes('assignee', 'construct_assignee_nodes',
+                               self._assignee_records,
+                               batch_size=batch_size)
+
+    async def create_inventor_nodes(self, batch_size=None):
+        """CREATE inventor nodes in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_nodes('inventor', 'construct_inventor_nodes',
+                               self._inventor_records,
+                               batch_size=batch_size)
+
+    async def create_location_nodes(self, batch_size=None):
+        """CREATE location nodes in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_nodes('location', 'construct_location_nodes',
+                               self._location_records,
+                               batch_size=batch_size)
+
+    async def create_citation_relationships(self, batch_size=None,
+                                            deduplicated=False):
+        """MERGE citation relationships in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd.
+
+        """
+
+        await self._load_relationships(
+                'citation', 'construct_patent_citations',
+                ('patent_id', 'citation_id'), ('patent', 'pid'),
+                ('patent', 'pid'), 'CITES', deduplicated,
+                batch_size=batch_size)
+
+    async def create_patent_assignee_relationships(self, batch_size=None,
+                                                   deduplicated=False):
+        """CREATE patent-assignee relationships in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+
+        """
+
+        await self._load_relationships(
+                'patent_assignee', 'construct_patent_assignee_edges',
+                ('assignee_id', 'patent_id'), ('assignee', 'assignee_id'),
+                ('patent', 'pid'), 'OWNS', deduplicated, strip=True,
+                batch_size=batch_size)
+
+    async def create_patent_inventor_relationships(self, batch_size=None,
+                                                   deduplicated=False):
+        """CREATE patent-inventor relationships in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+
+        """
+
+        await self._load_relationships(
+                'patent_inventor', 'construct_patent_inventor_edges',
+                ('inventor_id', 'patent_id'), ('inventor', 'inventor_id'),
+                ('patent', 'pid'), 'INVENTS', deduplicated,
+                batch_size=batch_size)
+
+    async def create_assignee_location_relationships(self, batch_size=None,
+                                                     deduplicated=False):
+        """CREATE assignee-location relationships in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+
+        """
+
+        await self._load_relationships(
+                'assignee_location', 'construct_assignee_location_edges',
+                ('assignee_id', 'location_id'), ('assignee', 'assignee_id'),
+                ('location', 'location_id'), 'LOCATES_AT', deduplicated,
+                batch_size=batch_size)
+
+    async def create_inventor_location_relationships(self, batch_size=None,
+                                                     deduplicated=False):
+        """CREATE inventor-location relationships in neo4j database.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+
+        """
+
+        await self._load_relationships(
+                'inventor_location', 'construct_inventor_location_edges',
+                ('inventor_id', 'location_id'), ('inventor', 'inventor_id'),
+                ('location', 'location_id'), 'LOCATES_AT', deduplicated,
+                batch_size=batch_size)
+
+    async def create_cpc_nodes_and_edges(self, batch_size=None):
+        """Create cpc nodes and edges.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_classification(
+                'cpc', 'construct_cpc_nodes', self.LEVELS['cpc'],
+                batch_size=batch_size)
+
+    async def create_uspc_nodes_and_edges(self, batch_size=None):
+        """Create uspc nodes and edges.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_classification(
+                'uspc', 'construct_uspc_nodes', self.LEVELS['uspc'],
+                batch_size=batch_size)
+
+    async def create_ipcr_nodes_and_edges(self, batch_size=None):
+        """Create ipcr nodes and edges.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_classification(
+                'ipcr', 'construct_ipcr_nodes', self.LEVELS['ipcr'],
+                batch_size=batch_size)
+
+    async def create_nber_nodes_and_edges(self, batch_size=None):
+        """Create nber nodes and edges.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        await self._load_classification(
+                'nber', 'construct_nber_nodes', self.LEVELS['nber'],
+                batch_size=batch_size)
+
+    async def _load_nodes(self, label, construct, records, batch_size=None):
+        """Create the nodes of one label.
+
+        Parameters
+        ----------
+        label : str
+            Node label, also the phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building the node table.
+        records : callable
+            ``records(chunk)``, converts a chunk to statement parameters.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        print('Loading {} nodes.'.format(label))
+        data = await self._construct(construct)
+        print('Finish loading {} nodes.'.format(label))
+
+        def prepare(chunk):
+            return [(NODE_BATCH[label], records(chunk))]
+
+        await self._pipeline(data, prepare, label, batch_size)
+
+    async def _load_relationships(self, phase, construct, columns, source,
+                                  target, rel_type, deduplicated=False,
+                                  strip=False, batch_size=None):
+        """Create the relationships of one edge table.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building the edge table.
+        columns : tuple
+            Columns holding the start and end node keys.
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+        strip : bool
+            Strip surrounding whitespace from keys.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        print('Loading {} relationships.'.format(phase))
+        data = await self._construct(construct)
+        print('Finish loading {} relationships.'.format(phase))
+        statement = relationship_batch(source, target, rel_type,
+                                       create=deduplicated)
+
+        def prepare(chunk):
+            return [(statement, self._pair_records(
+                chunk, columns[0], columns[1], strip=strip))]
+
+        dropped = await self._pipeline(data, prepare, phase, batch_size)
+        print('Dropped {} {} relationships with missing endpoints.'.format(
+            dropped, phase))
+
+    async def _load_classification(self, phase, construct, levels,
+                                   batch_size=None):
+        """Create classification codes and BELONGS_TO relationships.
+
+        Batches of deduplicated triples, see :func:`classification_triples`,
+        send one statement per level. In the compact schema, see
+        :meth:`_edge_levels`, SUBCLASS_OF relationships between codes are
+        written first.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building codes and patent
+            classifications.
+        levels : list
+            Classification levels, i.e., node labels and columns.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        print('Loading {} nodes.'.format(phase))
+        data = await self._construct(construct)
+        print('Finish loading {} nodes.'.format(phase))
+        edge_levels = self._edge_levels(phase)
+        statements = {level: relationship_batch(('patent', 'pid'),
+                                                (level, 'id'), 'BELONGS_TO')
+                      for level in edge_levels}
+
+        def prepare(chunk):
+            return [(statements[level],
+                     self._pair_records(group, 'patent_id', 'code'))
+                    for level, group in chunk.groupby('level', observed=True,
+                                                      sort=False)]
+
+        async def expand(nodes, frame, phases=False):
+            await self._amerge_codes(levels, nodes, batch_size)
+            if edge_levels != levels:
+                for child, parent, pairs in code_hierarchy(frame, levels):
+                    print('Linking {} to {}.'.format(child, parent))
+                    await self._pipeline(
+                            pairs, self._hierarchy_batch(child, parent),
+                            'subclass_of_{}'.format(child) if phases else None,
+                            batch_size)
+            return classification_triples(frame, edge_levels)
+
+        if not isinstance(data, Stream):
+            await self._pipeline(await expand(*data, phases=True), prepare,
+                                 phase, batch_size)
+            return
+        # triples are deduplicated per chunk, so their positions depend on
+        # where chunks fall; checkpoint the source rows of each chunk once
+        # all its triples are committed, as Neo4jHandler does
+        loop = asyncio.get_running_loop()
+        key = data.key and '{}:{}:rows'.format(data.key,
+                                               ','.join(edge_levels))
+        committed = await loop.run_in_executor(None, self._committed_rows,
+                                               phase, None, key)
+        batcher = self._batcher(batch_size)
+        chunks = iter(data)
+        offset = 0
+        self._start_phase(phase)
+        while True:  # read the next chunk off the event loop
+            item = await loop.run_in_executor(None, next, chunks, None)
+            if item is None:
+                break
+            nodes, frame = item
+            start, offset = offset, offset + len(frame)
+            frame = self._uncommitted_rows(frame, committed, start)
+            if not len(frame):
+                continue
+            await self._pipeline(await expand(nodes, frame), prepare, phase,
+                                 batcher=batcher, checkpoint=False)
+            self._commit_batch(phase, start, offset)
+        self._finish_phase(phase)
+
+    async def _amerge_codes(self, levels, nodes, batch_size=None):
+        """MERGE the codes of each level in batches, see :meth:`_pipeline`,
+        as :meth:`Neo4jHandler._create_codes` does.
+
+        Parameters
+        ----------
+        levels : list
+            Classification levels, i.e., node labels.
+        nodes : tuple
+            Set of codes of each level.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        """
+
+        for level, codes in zip(levels, nodes):
+            statement = ('UNWIND $rows AS code '
+                         'MERGE (c:{} {{id: code}})'.format(level))
+
+            def prepare(chunk, statement=statement):
+                return [(statement, chunk['id'].tolist())]
+
+            await self._pipeline(
+                    pd.DataFrame({'id': sorted(str(code) for code in codes)}),
+                    prepare, batch_size=batch_size)
+
+    def _hierarchy_batch(self, child, parent):
+        """Build ``prepare`` for batches of (child, parent) code pairs."""
+        statement = relationship_batch((child, 'id'), (parent, 'id'),
+                                       'SUBCLASS_OF')
+
+        def prepare(chunk):
+            return [(statement, self._pair_records(chunk, child, parent))]
+
+        return prepare
+
+    async def _construct(self, construct):
+        """Run a :class:`PatentsViewHandler` builder on a worker thread.
+
+        With ``stream=True``, builders of :attr:`STREAMS` return a
+        :class:`Stream` of chunks instead, see :meth:`_stream_chunks`.
+
+        """
+
+        loop = asyncio.get_running_loop()
+        handler = self._patentsview()
+        if self._stream and construct in self.STREAMS:
+            return await loop.run_in_executor(None, self._stream_chunks,
+                                              handler, construct)
+        return await loop.run_in_executor(None, getattr(handler, construct))
+
+    async def _pipeline(self, data, prepare, phase=None, batch_size=None,
+                        batcher=None, checkpoint=True):
+        """Write a frame, or a stream of them, with bounded transactions in
+        flight.
+
+        Batch sizes adapt to commit latency, see :class:`AdaptiveBatcher`. A
+        batch the server rejects as too large is prepared and written again
+        in two halves. Time spent in ``prepare`` is recorded as transform
+        time, the rest of a batch as transaction latency.
+
+        Parameters
+        ----------
+        data : :class:`pandas.DataFrame`
+            Rows to write, or a :class:`Stream` of them, read one chunk at a
+            time and checkpointed by position in the whole stream.
+        prepare : callable
+            ``prepare(chunk)``, returns the (statement, rows) pairs of one
+            batch. Runs on a worker thread.
+        phase : str
+            Phase name to checkpoint rows under, None to not checkpoint.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        batcher : :class:`AdaptiveBatcher`
+            Batcher carried over from an earlier call, e.g., for the chunks
+            of a stream, None for a new one.
+        checkpoint : bool
+            Checkpoint rows under ``phase``, False to only record its
+            metrics, e.g., where the caller checkpoints source rows.
+
+        Returns
+        -------
+        int
+            Number of rows dropped because an endpoint was not found.
+
+        """
+
+        loop = asyncio.get_running_loop()
+        checkpoint = phase if checkpoint else None
+        if isinstance(data, Stream):
+            committed = await loop.run_in_executor(
+                    None, self._committed_rows, checkpoint, None, data.key)
+        else:
+            committed = await loop.run_in_executor(
+                    None, self._committed_rows, checkpoint, data)
+        batcher = batcher or self._batcher(batch_size)
+        queue = asyncio.Queue(self._prefetch)
+        measure = self._metrics is not None and phase is not None
+
+        def timed(chunk, merge=False):
+            start = time.perf_counter()
+            statements = prepare(chunk)
+            if merge:  # rows a previous run may have committed
+                statements = [(merge_statement(statement), rows)
+                              for statement, rows in statements]
+            transform = time.perf_counter() - start
+            size = sum(len(statement.encode('utf-8')) +
+                       payload_size({'rows': rows})
+                       for statement, rows in statements) if measure else 0
+            return statements, transform, size
+
+        async def frames():
+            if not isinstance(data, Stream):
+                yield data
+                return
+            chunks = iter(data)
+            while True:  # read the next chunk off the event loop
+                item = await loop.run_in_executor(None, next, chunks, None)
+                if item is None:
+                    return
+                yield item
+
+        async def produce():
+            offset = 0
+            async for frame in frames():
+                for start, stop, chunk in self._pending_batches(
+                        checkpoint, frame, batcher, committed, offset):
+                    merge = self._write_batch(checkpoint, start, stop)
+                    prepared = await loop.run_in_executor(None, timed, chunk,
+                                                          merge)
+                    await queue.put((start, stop, chunk, prepared, merge))
+                offset += len(frame)
+            for _ in range(self._in_flight):
+                await queue.put(None)
+
+        async def write(session, chunk, prepared, merge=False):
+            statements, transform, size = prepared
+            begin = time.time()
+            try:
+                dropped = await session.execute_write(
+                        self._write_statements, statements)
+            except Exception as error:
+                if not oversized(error) or len(chunk) < 2:
+                    raise
+                batcher.shrink()
+                print('[BATCH] {} rows too large, split in two.'.format(
+                    len(chunk)))
+                dropped = 0
+                for part in (chunk.iloc[:len(chunk) // 2],
+                             chunk.iloc[len(chunk) // 2:]):
+                    dropped += await write(session, part, await
+                                           loop.run_in_executor(None, timed,
+                                                                part, merge),
+                                           merge)
+                return dropped
+            latency = time.time() - begin
+            batcher.record(len(chunk), latency)
+            if measure:
+                self._metrics.record(phase, len(chunk), latency, transform,
+                                     size)
+            return dropped
+
+        async def consume():
+            dropped = 0
+            async with self._connection.async_session() as session:
+                while True:
+                    batch = await queue.get()
+                    if batch is None:
+                        return dropped
+                    start, stop, chunk, prepared, merge = batch
+                    dropped += await write(session, chunk, prepared, merge)
+                    self._commit_batch(checkpoint, start, stop)
+
+        self._start_phase(phase)
+        tasks = [asyncio.ensure_future(produce())] + [
+                asyncio.ensure_future(consume())
+                for _ in range(self._in_flight)]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._finish_phase(phase)
+        return sum(results[1:])
+
+    @staticmethod
+    async def _write_statements(tx, statements):
+        """Run the statements of one batch in one transaction.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.AsyncManagedTransaction`
+            A neo4j asyncio transaction.
+        statements : list
+            (statement, rows) pairs.
+
+        Returns
+        -------
+        int
+            Number of rows dropped by statements returning ``matched``.
+
+        """
+
+        dropped = 0
+        for statement, rows in statements:
+            if not rows:
+                continue
+            result = await tx.run(statement, rows=rows)
+            record = await result.single()
+            if record is not None:
+                dropped += len(rows) - record['matched']
+        return dropped
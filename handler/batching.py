@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+# Parts of server error codes meaning a transaction outgrew a memory or time
+# limit, e.g., Neo.TransientError.General.MemoryPoolOutOfMemoryError
+OVERSIZED = ('MemoryLimit', 'OutOfMemory', 'TransactionTimedOut')
+
+
+def oversized(error):
+    """Whether ``error`` means the transaction was too large.
+
+    Parameters
+    ----------
+    error : Exception
+        Error raised by a write transaction.
+
+    Returns
+    -------
+    bool
+        The server ran out of transaction memory or time.
+
+    """
+
+    code = getattr(error, 'code', None) or ''
+    return any(part in code for part in OVERSIZED)
+
+
+def gaps(ranges, rows):
+    """Row ranges not covered by ``ranges``.
+
+    Parameters
+    ----------
+    ranges : list
+        Sorted, disjoint [start, stop) row ranges.
+    rows : int
+        Number of rows.
+
+    Returns
+    -------
+    list
+        (start, stop) row ranges between ``ranges``.
+
+    """
+
+    uncovered, start = [], 0
+    for begin, end in ranges:
+        if begin > start:
+            uncovered.append((start, min(begin, rows)))
+        start = max(start, end)
+    if start < rows:
+        uncovered.append((start, rows))
+    return uncovered
+
+
+class AdaptiveBatcher(object):
+    """Slice a frame into batches whose size follows commit latency.
+
+    Batches are views, ``frame.iloc[start:stop]``, sliced when the previous
+    one is taken, so a size change applies to the very next batch. The size
+    doubles while commits take less than half the ``target`` latency, shrinks
+    in proportion when they take longer, and halves when the server rejects a
+    transaction as too large, see :func:`oversized`.
+
+    Parameters
+    ----------
+    size : int
+        Rows per batch to start with.
+    target : float
+        Commit latency to aim for in seconds.
+    min_size : int
+        Smallest batch size.
+    max_size : int
+        Largest batch size.
+
+    Attributes
+    ----------
+    _size : int
+        Rows per batch.
+    _target : float
+        Commit latency to aim for in seconds.
+    _min_size : int
+        Smallest batch size.
+    _max_size : int
+        Largest batch size.
+    _lock : :class:`threading.Lock`
+        Guards the size against concurrent writers.
+
+    """
+
+    def __init__(self, size=10000, target=1.0, min_size=100,
+                 max_size=500000):
+        super(AdaptiveBatcher, self).__init__()
+        self._size = max(min_size, min(size, max_size))
+        self._target = target
+        self._min_size = min_size
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """int: Rows per batch."""
+        return self._size
+
+    def slices(self, frame, committed=()):
+        """Yield batches of rows not committed yet.
+
+        Parameters
+        ----------
+        frame : :class:`pandas.DataFrame`
+            Rows to write.
+        committed : list
+            Sorted, disjoint [start, stop) ranges of rows to skip.
+
+        Yields
+        ------
+        tuple
+            Start and stop row, and the batch.
+
+        """
+
+        for start, stop in gaps(committed, len(frame)):
+            while start < stop:
+                end = min(start + self._size, stop)
+                yield start, end, frame.iloc[start:end]
+                start = end
+
+    def record(self, rows, seconds):
+        """Adjust the batch size to the latency of one commit.
+
+        Parameters
+        ----------
+        rows : int
+            Rows in the batch.
+        seconds : float
+            Time taken to commit it.
+
+        """
+
+        with self._lock:
+            if seconds > self._target:
+                size = int(self._size * self._target / seconds)
+            elif seconds < self._target / 2 and rows >= self._size:
+                size = 2 * self._size
+            else:
+                return
+            self._size = max(self._min_size, min(size, self._max_size))
+
+    def shrink(self):
+        """Halve the batch size."""
+        with self._lock:
+            self._size = max(self._min_size, self._size // 2)
+
+    def write(self, write, batch, record=True):
+        """Write one batch, splitting it while the server rejects it as too
+        large.
+
+        Parameters
+        ----------
+        write : callable
+            ``write(batch)``, commits a batch.
+        batch : :class:`pandas.DataFrame` or list
+            Rows to write.
+        record : bool
+            Adjust the batch size to the commit latency, False where the
+            caller records the latency of a whole batch, e.g., of which
+            ``batch`` is one cell, see :class:`PartitionedWriter`.
+
+        Returns
+        -------
+        list
+            Return values of ``write``, one per transaction.
+
+        """
+
+        start = time.time()
+        try:
+            result = write(batch)
+        except Exception as error:
+            if not oversized(error) or len(batch) < 2:
+                raise
+            self.shrink()
+            half = len(batch) // 2
+            rows = batch.iloc if hasattr(batch, 'iloc') else batch
+            print('[BATCH] {} rows too large, split in two.'.format(
+                len(batch)))
+            return self.write(write, rows[:half], record) + \
+                self.write(write, rows[half:], record)
+        if record:
+            self.record(len(batch), time.time() - start)
+        return [result]
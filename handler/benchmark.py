@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from .cache import SUFFIXES
+from .neo4j_handler import Neo4jHandler
+from .patentsview_handler import PatentsViewHandler
+
+# table readers of :class:`PatentsViewHandler`
+READERS = [
+    '_patent', '_application', '_claim', '_foreigncitation',
+    '_otherreference', '_usapplicationcitation', '_assignee', '_inventor',
+    '_location', '_uspatentcitation', '_patent_assignee', '_patent_inventor',
+    '_location_assignee', '_location_inventor', '_cpc_current',
+    '_uspc_current', '_ipcr', '_nber',
+]
+
+# node and edge builders of :class:`PatentsViewHandler`
+BUILDERS = [
+    'construct_patent_nodes', 'construct_assignee_nodes',
+    'construct_inventor_nodes', 'construct_location_nodes',
+    'construct_patent_citations', 'construct_patent_assignee_edges',
+    'construct_patent_inventor_edges', 'construct_assignee_location_edges',
+    'construct_inventor_location_edges', 'construct_cpc_nodes',
+    'construct_uspc_nodes', 'construct_ipcr_nodes', 'construct_nber_nodes',
+]
+
+
+def _rows(value):
+    """Number of rows of what a reader or builder returned."""
+    if isinstance(value, tuple):  # classification codes and frame
+        value = value[-1]
+    return len(value) if hasattr(value, '__len__') else None
+
+
+def _commit():
+    """Commit of the working tree, None outside a git checkout."""
+    try:
+        commit = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.decode().strip()
+
+
+class LoadBenchmark(object):
+    """Time every stage of a load, from raw tables to a sink.
+
+    Three stages are timed, one entry per step:
+
+    - ``read``, each table reader with no cached frames,
+    - ``construct``, each builder with the tables it reads cached,
+    - ``load``, each phase of :attr:`Neo4jHandler.PHASES`, writing to the
+      sink.
+
+    Parameters
+    ----------
+    data : str
+        Dir to data files, e.g., written by :class:`SyntheticPatentsView`.
+    sink : :class:`Sink`
+        Receives the statements of the load stage.
+    handler : dict
+        Keyword arguments of :class:`Neo4jHandler`, e.g., ``batch_size``.
+
+    Attributes
+    ----------
+    _data : str
+        Dir to data files.
+    _sink : :class:`Sink`
+        Receives the statements of the load stage.
+    _handler : dict
+        Keyword arguments of :class:`Neo4jHandler`.
+    _timings : list
+        One dict per step with 'stage', 'step', 'seconds' and 'rows'.
+
+    """
+
+    def __init__(self, data, sink, handler=None):
+        super(LoadBenchmark, self).__init__()
+        self._data = data
+        self._sink = sink
+        self._handler = handler or {}
+        self._timings = []
+
+    def run(self, stages=('read', 'construct', 'load')):
+        """Run stages in order.
+
+        Parameters
+        ----------
+        stages : list
+            Stages to run, later stages reuse frames cached by earlier ones.
+
+        Returns
+        -------
+        list
+            Timings of all steps run so far.
+
+        """
+
+        if 'read' in stages:
+            self.clear_cache()
+            for reader in READERS:
+                self._time('read', reader,
+                           getattr(PatentsViewHandler(self._data), reader))
+        if 'construct' in stages:
+            for builder in BUILDERS:
+                self._time('construct', builder,
+                           getattr(PatentsViewHandler(self._data), builder))
+        if 'load' in stages:
+            with Neo4jHandler(None, self._data, sink=self._sink,
+                              **self._handler) as handler:
+                for name, method, requires in handler.PHASES:
+                    self._time('load', name, getattr(handler, method))
+        return self._timings
+
+    def clear_cache(self):
+        """Remove frames cached by readers and builders."""
+        for suffix in SUFFIXES.values():
+            for path in glob.glob(os.path.join(self._data, '*' + suffix)):
+                os.remove(path)
+
+    def _time(self, stage, step, work):
+        """Run and time one step."""
+        print('[BENCHMARK] {} {}'.format(stage, step))
+        statements = sum(self._sink.statements.values())
+        start = time.perf_counter()
+        value = work()
+        seconds = time.perf_counter() - start
+        timing = {'stage': stage, 'step': step, 'seconds': seconds,
+                  'rows': _rows(value)}
+        if stage == 'load':
+            timing['statements'] = \
+                sum(self._sink.statements.values()) - statements
+        self._timings.append(timing)
+        print('[BENCHMARK] {} {} in {:.3f}s.'.format(stage, step, seconds))
+
+    def report(self, path, dataset=None):
+        """Write timings and the environment they were taken in as JSON.
+
+        Parameters
+        ----------
+        path : str
+            Report file.
+        dataset : dict
+            Parameters of the dataset, e.g., its scale and seed.
+
+        Returns
+        -------
+        dict
+            The report.
+
+        """
+
+        report = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'dataset': dataset or {},
+            'sink': type(self._sink).__name__,
+            'handler': self._handler,
+            'timings': self._timings,
+            'totals': {stage: sum(timing['seconds']
+                                  for timing in self._timings
+                                  if timing['stage'] == stage)
+                       for stage in ('read', 'construct', 'load')},
+            'sink_summary': self._sink.summary(),
+        }
+        with open(path, 'w') as ofp:
+            json.dump(report, ofp, indent=1)
+        return report
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # columnar caches are optional
+    pa = feather = pq = None
+
+# cache format to file suffix
+SUFFIXES = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'pickle': '.pkl.bz2',
+}
+
+# manifest of cached frames and the sources they were built from
+MANIFEST = 'cache.json'
+
+# manifest path to the lock serializing its updates across handlers
+_LOCKS = collections.defaultdict(threading.Lock)
+
+
+def file_digest(path, block=1 << 20):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as ifp:
+        for chunk in iter(lambda: ifp.read(block), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FrameCache(object):
+    """Cache of frames built from PatentsView tables, one file per frame.
+
+    Parquet and Feather files are compressed with a fast codec, so frames of
+    tens of millions of rows are written and read in seconds, and can be
+    read in part: only some columns, see :meth:`load`, or one row group at
+    a time, see :meth:`iter_frames`. Frames keep their index and dtypes.
+
+    Frames cached by earlier versions as bz2 pickles, ``<name>.pkl.bz2``,
+    are still read, and converted to the cache format on first use.
+
+    Frames declared in ``frames`` are content addressed: their key hashes
+    the version of the transform building them, the SHA-256 of their source
+    files and the keys of the frames they are built from. A cached frame
+    whose key changed, e.g., because a new release was put in the data dir
+    or a reader's cleaning changed, is stale; :meth:`load` returns None and
+    the caller rebuilds it. Keys and source digests are kept in
+    :data:`MANIFEST`; a source is hashed again only when its size or mtime
+    changed. A cached frame missing from the manifest, e.g., written by an
+    earlier version, is adopted if it is newer than its sources.
+
+    Parameters
+    ----------
+    ipath : str
+        Dir to cache files in.
+    fmt : str
+        'parquet', 'feather' or 'pickle'. None for 'parquet' if pyarrow is
+        installed, 'pickle' otherwise.
+    compression : str
+        Codec of Parquet and Feather files, e.g., 'zstd', 'lz4' or 'snappy'.
+    row_group_size : int
+        Rows per Parquet row group and Feather record batch, i.e., per frame
+        of :meth:`iter_frames`.
+    frames : dict
+        Frame name to (transform version, source file names, names of frames
+        it is built from). Frames left out are never stale.
+
+    Attributes
+    ----------
+    _ipath : str
+        Dir to cache files in.
+    _fmt : str
+        Cache format.
+    _compression : str
+        Codec of Parquet and Feather files.
+    _row_group_size : int
+        Rows per Parquet row group and Feather record batch.
+    _frames : dict
+        Frame name to (version, sources, frames it is built from).
+    _digests : dict
+        Source file name to its SHA-256, computed once per cache.
+
+    """
+
+    def __init__(self, ipath, fmt=None, compression='zstd',
+                 row_group_size=1000000, frames=None):
+        super(FrameCache, self).__init__()
+        if fmt is None:
+            fmt = 'pickle' if pa is None else 'parquet'
+        if fmt not in SUFFIXES:
+            raise ValueError('Unknown cache format {}.'.format(fmt))
+        if fmt != 'pickle' and pa is None:
+            raise ImportError('{} caches require pyarrow.'.format(fmt))
+        self._ipath = ipath
+        self._fmt = fmt
+        self._compression = compression
+        self._row_group_size = row_group_size
+        self._frames = frames or {}
+        self._digests = {}
+
+    @property
+    def fmt(self):
+        """Cache format."""
+        return self._fmt
+
+    def path(self, name, fmt=None):
+        """Path of the file caching frame ``name``."""
+        return os.path.join(self._ipath, name + SUFFIXES[fmt or self._fmt])
+
+    def exists(self, name):
+        """Whether frame ``name`` is cached, in any format."""
+        return any(os.path.exists(self.path(name, fmt)) for fmt in SUFFIXES)
+
+    def load(self, name, columns=None):
+        """Read a cached frame.
+
+        Parameters
+        ----------
+        name : str
+            Frame name, e.g., 'patent'.
+        columns : list
+            Columns to read, None to read all. The index is always read.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            The frame, None if not cached.
+
+        """
+
+        if not self.valid(name):
+            if self.exists(name):
+                print('[CACHE] {} is stale, rebuild it.'.format(name))
+            return None
+        path = self.path(name)
+        if not os.path.exists(path):
+            legacy = self.path(name, 'pickle')
+            if not os.path.exists(legacy):
+                return None
+            frame = pd.read_pickle(legacy)
+            if self._fmt != 'pickle':
+                print('[CACHE] Convert {} to {}.'.format(
+                    os.path.basename(legacy), self._fmt))
+                self.save(name, frame)
+            return frame if columns is None else frame[list(columns)]
+        if self._fmt == 'pickle':
+            frame = pd.read_pickle(path)
+            return frame if columns is None else frame[list(columns)]
+        if self._fmt == 'parquet':
+            schema = pq.read_schema(path)
+            table = pq.read_table(path, columns=self._projection(schema,
+                                                                 columns))
+        else:
+            schema = self._feather_schema(path)
+            table = feather.read_table(path, self._projection(schema,
+                                                              columns),
+                                       memory_map=True)
+        return table.to_pandas()
+
+    def iter_frames(self, name, columns=None, batch_size=None):
+        """Stream a cached frame in parts, never holding it as a whole.
+
+        Parameters
+        ----------
+        name : str
+            Frame name, e.g., 'uspatentcitation'.
+        columns : list
+            Columns to read, None to read all. The index is always read.
+        batch_size : int
+            Maximum rows per part, None for the row group size.
+
+        Yields
+        ------
+        :class:`pandas.DataFrame`
+            Consecutive rows of the frame.
+
+        """
+
+        batch_size = batch_size or self._row_group_size
+        if not self.valid(name):
+            return
+        if self._fmt == 'pickle' or not os.path.exists(self.path(name)):
+            frame = self.load(name, columns)
+            if frame is None:
+                return
+            for start in range(0, len(frame), batch_size):
+                yield frame.iloc[start:start + batch_size]
+            return
+        path = self.path(name)
+        if self._fmt == 'parquet':
+            parquet = pq.ParquetFile(path, memory_map=True)
+            schema = parquet.schema_arrow
+            batches = parquet.iter_batches(
+                    batch_size, columns=self._projection(schema, columns))
+        else:  # memory mapped, only projected columns are decompressed
+            schema = self._feather_schema(path)
+            batches = feather.read_table(
+                    path, self._projection(schema, columns),
+                    memory_map=True).to_batches(batch_size)
+        offset = 0
+        for batch in batches:
+            frame = pa.Table.from_batches([batch]).replace_schema_metadata(
+                    schema.metadata).to_pandas()
+            if isinstance(frame.index, pd.RangeIndex):  # only in metadata
+                frame.index = frame.index + offset * frame.index.step
+            offset += len(frame)
+            yield frame
+
+    def save(self, name, frame):
+        """Write a frame to the cache, replacing an earlier version.
+
+        Parameters
+        ----------
+        name : str
+            Frame name, e.g., 'patent'.
+        frame : :class:`pandas.DataFrame`
+            Frame to cache.
+
+        """
+
+        path = self.path(name)
+        tmp = path + '.tmp'
+        if self._fmt == 'pickle':
+            frame.to_pickle(tmp, compression='bz2')
+        elif self._fmt == 'parquet':
+            pq.write_table(pa.Table.from_pandas(frame), tmp,
+                           compression=self._compression,
+                           row_group_size=self._row_group_size)
+        else:
+            feather.write_feather(pa.Table.from_pandas(frame), tmp,
+                                  compression=self._compression,
+                                  chunksize=self._row_group_size)
+        os.replace(tmp, path)
+        legacy = self.path(name, 'pickle')
+        if self._fmt != 'pickle' and os.path.exists(legacy):
+            os.remove(legacy)
+        self._record(name, rows=len(frame))
+
+    def remove(self, name):
+        """Remove frame ``name`` from the cache, in every format."""
+        for fmt in SUFFIXES:
+            if os.path.exists(self.path(name, fmt)):
+                os.remove(self.path(name, fmt))
+        with _LOCKS[self._manifest_path()]:
+            manifest = self._read_manifest()
+            manifest['frames'].pop(name, None)
+            self._write_manifest(manifest)
+
+    def key(self, name):
+        """Content address of a declared frame.
+
+        Parameters
+        ----------
+        name : str
+            Frame name, see ``frames``.
+
+        Returns
+        -------
+        str
+            SHA-256 of the transform version, the digests of the source
+            files and the keys of the frames it is built from. A missing
+            source counts with the digest it had when the frame was cached.
+
+        """
+
+        version, sources, frames = self._frames[name]
+        recorded = self._entry(name).get('sources', {})
+        digests = [self._digest(source) or recorded.get(source)
+                   for source in sources]
+        payload = json.dumps([version, digests,
+                              [self.key(frame) for frame in frames]])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def valid(self, name):
+        """Whether frame ``name`` is cached and not stale."""
+        if not self.exists(name):
+            return False
+        if name not in self._frames:
+            return True
+        entry = self._entry(name)
+        if not entry:
+            return self._adopt(name)
+        return entry['key'] == self.key(name)
+
+    def stale(self):
+        """Names of declared frames that are cached but stale."""
+        return [name for name in self._frames
+                if self.exists(name) and not self.valid(name)]
+
+    def entries(self):
+        """Cached frames and the size of their files.
+
+        Returns
+        -------
+        list
+            One dict per cached file, with 'name', 'format', 'path', 'bytes',
+            'rows', 'version', 'created' and 'stale', None where unknown.
+
+        """
+
+        manifest = self._read_manifest()
+        entries = []
+        for fname in sorted(os.listdir(self._ipath)):
+            for fmt, suffix in SUFFIXES.items():
+                if not fname.endswith(suffix):
+                    continue
+                name = fname[:-len(suffix)]
+                entry = manifest['frames'].get(name, {})
+                path = os.path.join(self._ipath, fname)
+                entries.append({
+                    'name': name, 'format': fmt, 'path': path,
+                    'bytes': os.path.getsize(path),
+                    'rows': entry.get('rows'),
+                    'version': entry.get('version'),
+                    'created': entry.get('created'),
+                    'stale': (name in self._frames and bool(entry) and
+                              entry['key'] != self.key(name)),
+                })
+        return entries
+
+    def alias(self, source, original):
+        """Record ``source`` with the digest of ``original``, e.g., a table
+        converted to another codec, so frames read from either have the
+        same key. The alias holds while the size and mtime of ``source``
+        match, see :meth:`_digest`."""
+        digest = self._digest(original)
+        stat = os.stat(os.path.join(self._ipath, source))
+        with _LOCKS[self._manifest_path()]:
+            manifest = self._read_manifest()
+            manifest['sources'][source] = {'size': stat.st_size,
+                                           'mtime': stat.st_mtime_ns,
+                                           'sha256': digest}
+            self._write_manifest(manifest)
+        self._digests[source] = digest
+
+    def _adopt(self, name):
+        """Record a frame cached without a manifest entry if it is newer
+        than its sources, otherwise consider it stale."""
+        version, sources, frames = self._frames[name]
+        path = next(self.path(name, fmt) for fmt in SUFFIXES
+                    if os.path.exists(self.path(name, fmt)))
+        inputs = [os.path.join(self._ipath, source) for source in sources] + \
+            [self.path(frame, fmt) for frame in frames for fmt in SUFFIXES]
+        newest = max([os.path.getmtime(ipath) for ipath in inputs
+                      if os.path.exists(ipath)] or [0])
+        if any(not self.valid(frame) for frame in frames) or \
+                os.path.getmtime(path) < newest:
+            print('[CACHE] {} is older than its sources, rebuild it.'.format(
+                name))
+            return False
+        print('[CACHE] Adopt {}.'.format(os.path.basename(path)))
+        self._record(name)
+        return True
+
+    def _digest(self, source):
+        """SHA-256 of a source file, None if it is missing. The digest in
+        the manifest is reused while the file's size and mtime match."""
+        if source in self._digests:
+            return self._digests[source]
+        path = os.path.join(self._ipath, source)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        recorded = self._read_manifest()['sources'].get(source, {})
+        if recorded.get('size') == stat.st_size and \
+                recorded.get('mtime') == stat.st_mtime_ns:
+            digest = recorded['sha256']
+        else:
+            print('[CACHE] Hash {}.'.format(source))
+            digest = file_digest(path)
+            with _LOCKS[self._manifest_path()]:
+                manifest = self._read_manifest()
+                manifest['sources'][source] = {'size': stat.st_size,
+                                               'mtime': stat.st_mtime_ns,
+                                               'sha256': digest}
+                self._write_manifest(manifest)
+        self._digests[source] = digest
+        return digest
+
+    def _entry(self, name):
+        """Manifest entry of a cached frame, empty if not recorded."""
+        return self._read_manifest()['frames'].get(name, {})
+
+    def _record(self, name, rows=None):
+        """Record the key of a declared frame just cached."""
+        if name not in self._frames:
+            return
+        version, sources, frames = self._frames[name]
+        key = self.key(name)
+        entry = {'key': key, 'version': version,
+                 'sources': {source: self._digest(source)
+                             for source in sources},
+                 'frames': {frame: self.key(frame) for frame in frames},
+                 'rows': rows,
+                 'created': datetime.datetime.now().isoformat(
+                     timespec='seconds')}
+        with _LOCKS[self._manifest_path()]:
+            manifest = self._read_manifest()
+            manifest['frames'][name] = entry
+            self._write_manifest(manifest)
+
+    def _manifest_path(self):
+        return os.path.join(self._ipath, MANIFEST)
+
+    def _read_manifest(self):
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return {'sources': {}, 'frames': {}}
+        with open(path, 'r') as ifp:
+            return json.load(ifp)
+
+    def _write_manifest(self, manifest):
+        path = self._manifest_path()
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as ofp:
+            json.dump(manifest, ofp, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _feather_schema(path):
+        """Schema of a Feather file, without reading its columns."""
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema
+
+    @staticmethod
+    def _projection(schema, columns):
+        """Columns to read for ``columns``, including the index columns
+        pandas stored in the schema metadata."""
+        if columns is None:
+            return None
+        index = [column for column in
+                 schema.pandas_metadata.get('index_columns', [])
+                 if isinstance(column, str)]
+        return list(columns) + [column for column in index
+                                if column not in columns]
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+from .batching import gaps
+
+
+def fingerprint(data):
+    """Fingerprint the content of a phase's input.
+
+    Parameters
+    ----------
+    data : :class:`pandas.DataFrame`
+        Rows of the phase.
+
+    Returns
+    -------
+    str
+        Hex digest, changes with the number, order, columns or content of the
+        rows.
+
+    """
+
+    digest = hashlib.sha1(repr((len(data), list(data.columns))).encode())
+    value = pd.util.hash_pandas_object(data, index=True).values
+    digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or adjacent [start, stop) row ranges."""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and merged[-1][1] >= start:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+class CheckpointManifest(object):
+    """Record committed rows of each phase on disk.
+
+    The manifest is a JSON file mapping each phase to the fingerprint of its
+    input, see :func:`fingerprint`, and the ranges of committed rows. A
+    phase whose input no longer matches its fingerprint starts over. As
+    rows, not batches, are recorded, batch sizes may differ between runs.
+
+    Rows are recorded as pending before their transaction runs, see
+    :meth:`write`, and as committed once it has. If the loader dies in
+    between, a resumed run cannot tell whether pending rows were committed,
+    so it writes them again idempotently, e.g., MERGE rather than CREATE.
+
+    Parameters
+    ----------
+    path : str
+        Path to the manifest file.
+    resume : bool
+        Keep rows committed by a previous run, otherwise start afresh.
+
+    Attributes
+    ----------
+    _path : str
+        Path to the manifest file.
+    _phases : dict
+        Phase to {'key': fingerprint, 'rows': [start, stop) ranges of
+        committed rows, 'pending': ranges being written, 'doubt': ranges
+        pending when a previous run stopped}.
+    _lock : :class:`threading.Lock`
+        Guards the manifest against concurrently running phases.
+
+    """
+
+    def __init__(self, path, resume=False):
+        super(CheckpointManifest, self).__init__()
+        self._path = path
+        self._phases = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with open(path, 'r') as ifp:
+                for phase, entry in json.load(ifp)['phases'].items():
+                    if 'rows' in entry:  # not a manifest of batch indices
+                        doubt = merge_ranges(entry.pop('doubt', []) +
+                                             entry.pop('pending', []))
+                        if doubt:
+                            entry['doubt'] = doubt
+                        self._phases[phase] = entry
+
+    def begin(self, phase, data, key=None):
+        """Start or resume a phase.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        data : :class:`pandas.DataFrame`
+            Rows of the phase, None if they are streamed.
+        key : str
+            Identity of the rows, e.g., of a streamed table, None for the
+            :func:`fingerprint` of ``data``.
+
+        Returns
+        -------
+        list
+            Sorted, disjoint [start, stop) ranges of rows already committed.
+
+        """
+
+        key = key or fingerprint(data)
+        with self._lock:
+            entry = self._phases.get(phase)
+            if entry is not None and entry['key'] != key:
+                print('[CHECKPOINT] Input of {} changed, discard its '
+                      'checkpoint.'.format(phase))
+                entry = None
+            if entry is None:
+                entry = self._phases[phase] = {'key': key, 'rows': []}
+                self._save()
+            elif entry['rows']:
+                print('[CHECKPOINT] Resume {}, {} of {} rows '
+                      'committed.'.format(
+                          phase, sum(stop - start
+                                     for start, stop in entry['rows']),
+                          '?' if data is None else len(data)))
+            return [list(rows) for rows in entry['rows']]
+
+    def write(self, phase, start, stop):
+        """Record rows ``start`` to ``stop`` of ``phase`` as pending, before
+        their transaction runs.
+
+        Returns
+        -------
+        bool
+            Whether a previous run stopped while writing any of the rows, so
+            they may be committed already.
+
+        """
+
+        with self._lock:
+            entry = self._phases[phase]
+            entry.setdefault('pending', []).append([start, stop])
+            self._save()
+            return any(first < stop and last > start
+                       for first, last in entry.get('doubt', []))
+
+    def commit(self, phase, start, stop):
+        """Record rows ``start`` to ``stop`` of ``phase`` as committed.
+
+        Rows in doubt are cleared once committed, as they were written
+        again idempotently, so later runs write them as usual.
+
+        """
+
+        with self._lock:
+            entry = self._phases[phase]
+            if [start, stop] in entry.get('pending', []):
+                entry['pending'].remove([start, stop])
+            entry['rows'] = merge_ranges(entry['rows'] + [[start, stop]])
+            doubt = [[max(first, begin), min(last, end)]
+                     for begin, end in entry.pop('doubt', [])
+                     for first, last in gaps(entry['rows'], end)
+                     if min(last, end) > max(first, begin)]
+            if doubt:
+                entry['doubt'] = doubt
+            self._save()
+
+    def _save(self):
+        """Atomically rewrite the manifest file."""
+        manifest = {'phases': self._phases}
+        tmp = self._path + '.tmp'
+        with open(tmp, 'w') as ofp:
+            json.dump(manifest, ofp, indent=1)
+        os.replace(tmp, self._path)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from neo4j import GraphDatabase
+try:
+    from neo4j import AsyncGraphDatabase
+except ImportError:  # neo4j < 5.0
+    AsyncGraphDatabase = None
+
+
+def execute_write(session, work, *args, **kwargs):
+    """Run ``work`` in a managed write transaction of ``session``.
+
+    ``session.execute_write`` of neo4j 5.0 and later is used, and
+    ``write_transaction``, removed in neo4j 6.0, only where it is missing,
+    i.e., on neo4j 4.x.
+
+    Parameters
+    ----------
+    session : :class:`neo4j.Session`
+        A neo4j session.
+    work : callable
+        ``work(tx, *args, **kwargs)``, the transaction function.
+
+    Returns
+    -------
+    object
+        Return value of ``work``.
+
+    """
+
+    run = getattr(session, 'execute_write', None)
+    if run is None:  # neo4j < 5.0
+        run = session.write_transaction
+    return run(work, *args, **kwargs)
+
+
+class ConnectionManager(object):
+    """One pooled neo4j driver shared by all load phases and worker threads.
+
+    The driver is created on first use, so no connection is opened until a
+    session is requested. Sessions are not thread safe, every phase and
+    worker asks for its own; they all borrow connections from the same pool.
+
+    Parameters
+    ----------
+    username : str
+        Username.
+    password : str
+        Password.
+    uri : str
+        Bolt URI of the database.
+    pool_size : int
+        Maximum number of connections in the pool.
+    fetch_size : int
+        Records fetched per pull, None for the driver default.
+    lifetime : int
+        Seconds before a pooled connection is retired.
+
+    Attributes
+    ----------
+    _auth : tuple
+        (username, password).
+    _uri : str
+        Bolt URI of the database.
+    _config : dict
+        Driver configuration.
+    _fetch_size : int
+        Records fetched per pull.
+    _driver : :class:`neo4j.Driver`
+        The shared driver, None until first use.
+    _async_driver : :class:`neo4j.AsyncDriver`
+        The shared asyncio driver, None until first use.
+    _lock : :class:`threading.Lock`
+        Guards creation of the driver.
+
+    """
+
+    def __init__(self, username, password, uri='bolt://localhost:7687',
+                 pool_size=100, fetch_size=None, lifetime=3600):
+        super(ConnectionManager, self).__init__()
+        self._auth = (username, password)
+        self._uri = uri
+        self._config = {'max_connection_pool_size': pool_size,
+                        'max_connection_lifetime': lifetime}
+        self._fetch_size = fetch_size
+        self._driver = None
+        self._async_driver = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def driver(self):
+        """:class:`neo4j.Driver`: The shared driver."""
+        with self._lock:
+            if self._driver is None:
+                self._driver = GraphDatabase.driver(self._uri, auth=self._auth,
+                                                    **self._config)
+            return self._driver
+
+    def session(self, **config):
+        """Open a session on the shared driver.
+
+        Parameters
+        ----------
+        config : dict
+            Session configuration, passed to the driver.
+
+        Returns
+        -------
+        :class:`neo4j.Session`
+            A neo4j session.
+
+        """
+
+        if self._fetch_size is not None:
+            config.setdefault('fetch_size', self._fetch_size)
+        return self.driver.session(**config)
+
+    def async_session(self, **config):
+        """Open a session on the shared asyncio driver.
+
+        The asyncio driver has its own pool, sized like the blocking one. It
+        must be used, and closed with :meth:`aclose`, on one event loop.
+
+        Parameters
+        ----------
+        config : dict
+            Session configuration, passed to the driver.
+
+        Returns
+        -------
+        :class:`neo4j.AsyncSession`
+            A neo4j asyncio session.
+
+        """
+
+        if self._async_driver is None:
+            if AsyncGraphDatabase is None:
+                raise ImportError('The asyncio driver requires neo4j 5.0 or '
+                                  'later.')
+            self._async_driver = AsyncGraphDatabase.driver(
+                    self._uri, auth=self._auth, **self._config)
+        if self._fetch_size is not None:
+            config.setdefault('fetch_size', self._fetch_size)
+        return self._async_driver.session(**config)
+
+    async def aclose(self):
+        """Close the asyncio driver and its pooled connections."""
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+
+    def close(self):
+        """Close the driver and all pooled connections."""
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from .neo4j_handler import Neo4jHandler
+from .patentsview_handler import PatentsViewHandler, code_hierarchy, \
+    _vocabulary
+
+
+def hash_keys(values):
+    """Hash keys to uint64, far smaller than the Python strings they stand for.
+
+    Parameters
+    ----------
+    values : :class:`pandas.Index` or :class:`pandas.DataFrame`
+        Keys, one per element or row.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        One uint64 hash per key.
+
+    """
+
+    if isinstance(values, pd.DataFrame):
+        return pd.util.hash_pandas_object(_normalize(values),
+                                          index=False).values
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _normalize(frame):
+    """Give columns the dtype they hash in, so that equal values of both
+    releases hash equally, e.g., integer counts that became float due to a
+    missing value, or codes cached as categorical in one release only.
+    """
+
+    frame = frame.copy(deep=False)
+    for column in frame.columns:
+        dtype = frame[column].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(dtype):
+            frame[column] = frame[column].astype('float64')
+        elif isinstance(dtype, pd.CategoricalDtype) or dtype != object:
+            frame[column] = frame[column].astype(object)
+    return frame
+
+
+def _isin(keys, sorted_keys):
+    """Whether each hash of ``keys`` is in the sorted hashes
+    ``sorted_keys``, and the position it is found at."""
+    positions = np.searchsorted(sorted_keys, keys)
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool), positions
+    positions[positions == len(sorted_keys)] = 0
+    return sorted_keys[positions] == keys, positions
+
+
+def _concat(parts, columns=None):
+    """Concatenate the rows picked from each chunk."""
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts)
+
+
+def diff_nodes(old, new):
+    """Compare two releases of a node table indexed by node key, chunk by
+    chunk.
+
+    Besides one chunk, only the uint64 hashes of the keys and rows of both
+    releases, and the rows that differ, are held in memory.
+
+    Parameters
+    ----------
+    old : callable
+        Returns the chunks of the previous release, called twice.
+    new : callable
+        Returns the chunks of the new release.
+
+    Returns
+    -------
+    tuple
+        Added rows, removed keys (a one-column frame) and changed rows (new
+        values).
+
+    """
+
+    old_keys, old_rows = [], []
+    for chunk in old():
+        old_keys.append(hash_keys(chunk.index))
+        old_rows.append(hash_keys(chunk))
+    old_keys = np.concatenate(old_keys or [np.empty(0, np.uint64)])
+    order = np.argsort(old_keys, kind='stable')
+    old_keys = old_keys[order]
+    old_rows = np.concatenate(old_rows or [np.empty(0, np.uint64)])[order]
+    del order
+    added, changed, new_keys = [], [], []
+    for chunk in new():
+        keys = hash_keys(chunk.index)
+        found, positions = _isin(keys, old_keys)
+        rows = hash_keys(chunk[found])
+        added.append(chunk[~found])
+        changed.append(chunk[found][old_rows[positions[found]] != rows])
+        new_keys.append(keys)
+    new_keys = np.sort(np.concatenate(new_keys or [np.empty(0, np.uint64)]))
+    del old_keys, old_rows
+    removed = [chunk.index[~_isin(hash_keys(chunk.index), new_keys)[0]]
+               .to_frame(index=False) for chunk in old()]
+    return _concat(added), _concat(removed), _concat(changed)
+
+
+def diff_edges(old, new, columns):
+    """Compare two releases of an edge table chunk by chunk, see
+    :func:`diff_nodes`.
+
+    Parameters
+    ----------
+    old : callable
+        Returns the chunks of the previous release, called twice.
+    new : callable
+        Returns the chunks of the new release.
+    columns : list
+        Columns identifying an edge.
+
+    Returns
+    -------
+    tuple
+        Distinct added and removed edges, restricted to ``columns``.
+
+    """
+
+    old_keys = np.sort(np.concatenate(
+        [hash_keys(chunk[columns]) for chunk in old()] or
+        [np.empty(0, np.uint64)]))
+    added, new_keys = [], []
+    for chunk in new():
+        keys = hash_keys(chunk[columns])
+        added.append(chunk.loc[~_isin(keys, old_keys)[0], columns])
+        new_keys.append(keys)
+    new_keys = np.sort(np.concatenate(new_keys or [np.empty(0, np.uint64)]))
+    del old_keys
+    removed = [chunk.loc[~_isin(hash_keys(chunk[columns]), new_keys)[0],
+                         columns] for chunk in old()]
+    return (_concat(added, columns).drop_duplicates(),
+            _concat(removed, columns).drop_duplicates())
+
+
+class DeltaHandler(Neo4jHandler):
+    """Apply the difference between two PatentsView releases to a graph
+    loaded from the older one.
+
+    Both releases are read through :class:`PatentsViewHandler` from their
+    cached frames, e.g., ``patent.node.parquet``, which are built first if
+    missing or stale. Frames are streamed in chunks of ``chunksize`` rows
+    and compared by the uint64 hashes of their keys and rows, so the largest
+    tables can be compared on one machine. A hash collision (about 1 in
+    10^4 for 10^8 rows) may hide one changed row.
+
+    Parameters
+    ----------
+    credential : str
+        Path to credential file.
+    data : str
+        Dir to data files of the new release.
+    previous : str
+        Dir to data files of the previous release.
+    kwargs : dict
+        Passed to :class:`Neo4jHandler`.
+
+    Attributes
+    ----------
+    _previous : str
+        Dir to data files of the previous release.
+
+    """
+
+    # (phase, construct method, cached frame, key, label, records method,
+    # create method)
+    NODES = [
+        ('patent', 'construct_patent_nodes', 'patent.node', 'pid', 'patent',
+         '_patent_records', 'create_patent_node_batch'),
+        ('assignee', 'construct_assignee_nodes', 'assignee', 'assignee_id',
+         'assignee', '_assignee_records', 'create_assignee_node_batch'),
+        ('inventor', 'construct_inventor_nodes', 'inventor', 'inventor_id',
+         'inventor', '_inventor_records', 'create_inventor_node_batch'),
+        ('location', 'construct_location_nodes', 'location', 'location_id',
+         'location', '_location_records', 'create_location_node_batch'),
+    ]
+
+    # (phase, construct method, cached frame, columns, source, target, type,
+    # strip)
+    EDGES = [
+        ('citation', 'construct_patent_citations', 'uspatentcitation',
+         ['patent_id', 'citation_id'], ('patent', 'pid'), ('patent', 'pid'),
+         'CITES', False),
+        ('patent_assignee', 'construct_patent_assignee_edges',
+         'patent_assignee', ['assignee_id', 'patent_id'],
+         ('assignee', 'assignee_id'), ('patent', 'pid'), 'OWNS', True),
+        ('patent_inventor', 'construct_patent_inventor_edges',
+         'patent_inventor', ['inventor_id', 'patent_id'],
+         ('inventor', 'inventor_id'), ('patent', 'pid'), 'INVENTS', False),
+        ('assignee_location', 'construct_assignee_location_edges',
+         'location_assignee', ['assignee_id', 'location_id'],
+         ('assignee', 'assignee_id'), ('location', 'location_id'),
+         'LOCATES_AT', False),
+        ('inventor_location', 'construct_inventor_location_edges',
+         'location_inventor', ['inventor_id', 'location_id'],
+         ('inventor', 'inventor_id'), ('location', 'location_id'),
+         'LOCATES_AT', False),
+    ]
+
+    # (phase, construct method, cached frame, levels)
+    CLASSIFICATIONS = [
+        ('cpc', 'construct_cpc_nodes', 'cpc_current',
+         ['cpc_section', 'cpc_subsection', 'cpc_group', 'cpc_subgroup']),
+        ('uspc', 'construct_uspc_nodes', 'uspc_current',
+         ['uspc_mainclass', 'uspc_subclass']),
+        ('ipcr', 'construct_ipcr_nodes', 'ipcr',
+         ['ipcr_section', 'ipcr_class', 'ipcr_subclass', 'ipcr_group',
+          'ipcr_subgroup']),
+        ('nber', 'construct_nber_nodes', 'nber',
+         ['nber_category', 'nber_subcategory']),
+    ]
+
+    def __init__(self, credential, data, previous, **kwargs):
+        super(DeltaHandler, self).__init__(credential, data, **kwargs)
+        self._previous = previous
+
+    def load_delta(self):
+        """Apply node, edge and classification changes to the graph.
+
+        Nodes come first so that added edges find their endpoints; removed
+        nodes take their edges with them.
+
+        """
+
+        for spec in self.NODES:
+            self.apply_node_delta(*spec)
+        for spec in self.EDGES:
+            self.apply_edge_delta(*spec)
+        for spec in self.CLASSIFICATIONS:
+            self.apply_classification_delta(*spec)
+
+    def _releases(self, construct, frame, columns=None):
+        """Chunk readers of a cached frame of the previous and the new
+        release.
+
+        Parameters
+        ----------
+        construct : str
+            :class:`PatentsViewHandler` method building, and caching, the
+            frame if it is not cached or stale.
+        frame : str
+            Cached frame, see :attr:`PatentsViewHandler.FRAMES`.
+        columns : list
+            Columns to read, None to read all.
+
+        Returns
+        -------
+        tuple
+            Two callables, each returning chunks of :attr:`_chunksize` rows
+            of one release, see :meth:`FrameCache.iter_frames`.
+
+        """
+
+        readers = []
+        for ipath in (self._previous, self._data):
+            handler = PatentsViewHandler(ipath)
+            if not handler.cache.valid(frame):
+                getattr(handler, construct)()
+            readers.append(lambda cache=handler.cache: cache.iter_frames(
+                frame, columns, self._chunksize))
+        return tuple(readers)
+
+    def apply_node_delta(self, phase, construct, frame, key, label, records,
+                         create):
+        """Create added, update changed and delete removed nodes.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building the node table.
+        frame : str
+            Cached frame of the node table.
+        key : str
+            Key property.
+        label : str
+            Node label.
+        records : str
+            Method converting a chunk to statement parameters.
+        create : str
+            Method creating a batch of nodes.
+
+        """
+
+        print('Comparing {} nodes.'.format(label))
+        added, removed, changed = diff_nodes(
+                *self._releases(construct, frame))
+        print('{} nodes: {} added, {} removed, {} changed.'.format(
+            label, len(added), len(removed), len(changed)))
+        records, create = getattr(self, records), getattr(self, create)
+
+        def write_added(tx, chunk):
+            create(tx, records(chunk))
+
+        def write_changed(tx, chunk):
+            self.update_node_batch(tx, label, key, records(chunk))
+
+        def write_removed(tx, chunk):
+            self.delete_node_batch(tx, label, key, chunk.iloc[:, 0].tolist())
+
+        with self._connection.session() as session:
+            for step, data, write in [('removed', removed, write_removed),
+                                      ('changed', changed, write_changed),
+                                      ('added', added, write_added)]:
+                self._write_batches(session, data, write,
+                                    'delta_{}_{}'.format(phase, step))
+
+    def apply_edge_delta(self, phase, construct, frame, columns, source,
+                         target, rel_type, strip):
+        """Merge added and delete removed relationships.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building the edge table.
+        frame : str
+            Cached frame of the edge table.
+        columns : list
+            Columns holding the start and end node keys.
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+        strip : bool
+            Strip surrounding whitespace from keys.
+
+        """
+
+        print('Comparing {} relationships.'.format(phase))
+        added, removed = diff_edges(
+                *self._releases(construct, frame, columns), columns=columns)
+        print('{}: {} added, {} removed.'.format(phase, len(added),
+                                                 len(removed)))
+        self._apply_pairs(phase, added, removed, columns, source, target,
+                          rel_type, strip)
+
+    def apply_classification_delta(self, phase, construct, frame, levels):
+        """Merge new and delete vanished codes, then add and delete
+        BELONGS_TO relationships of every classification level, or
+        SUBCLASS_OF relationships between codes and BELONGS_TO relationships
+        of the most specific level in the compact schema.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        construct : str
+            :class:`PatentsViewHandler` method building codes and patent
+            classifications.
+        frame : str
+            Cached frame of patent classifications.
+        levels : list
+            Classification levels, i.e., node labels and columns.
+
+        """
+
+        print('Comparing {} classification.'.format(phase))
+        old, new = self._releases(construct, frame)
+        (old_codes, old_pairs), (new_codes, new_pairs) = [
+            self._codes(release(), levels) for release in (old, new)]
+        with self._connection.session() as session:
+            for level, old_level, new_level in zip(levels, old_codes,
+                                                   new_codes):
+                added = sorted(str(code) for code in new_level - old_level)
+                removed = sorted(str(code) for code in old_level - new_level)
+                print('{}: {} new codes, {} vanished.'.format(
+                    level, len(added), len(removed)))
+                self._merge_codes(session, level, added,
+                                  'delta_{}_codes_added'.format(level))
+                self._write_batches(
+                    session, pd.DataFrame({'id': removed}),
+                    lambda tx, chunk, level=level: self.delete_node_batch(
+                        tx, level, 'id', chunk['id'].tolist()),
+                    'delta_{}_codes_removed'.format(level))
+        if self._edge_levels(phase) != levels:
+            for (child, parent, old_level), (_, _, new_level) in zip(
+                    old_pairs, new_pairs):
+                columns = [child, parent]
+                added, removed = diff_edges(lambda: [old_level],
+                                            lambda: [new_level], columns)
+                print('{} to {}: {} added, {} removed.'.format(
+                    child, parent, len(added), len(removed)))
+                self._apply_pairs('subclass_of_{}'.format(child), added,
+                                  removed, columns, (child, 'id'),
+                                  (parent, 'id'), 'SUBCLASS_OF', False)
+            levels = self._edge_levels(phase)
+        for level in levels:
+            columns = ['patent_id', level]
+            old, new = self._releases(construct, frame, columns)
+            added, removed = diff_edges(old, new, columns)
+            print('{}: {} added, {} removed.'.format(level, len(added),
+                                                     len(removed)))
+            self._apply_pairs(level, added, removed, columns,
+                              ('patent', 'pid'), (level, 'id'), 'BELONGS_TO',
+                              False)
+
+    @staticmethod
+    def _codes(chunks, levels):
+        """Codes of each level, and distinct (child, parent) code pairs, see
+        :func:`code_hierarchy`, of patent classifications read in chunks."""
+        codes = tuple(set() for level in levels)
+        pairs = []
+        for chunk in chunks:
+            for level, found in zip(codes, _vocabulary(chunk, levels)):
+                level |= found
+            pairs.append(code_hierarchy(chunk, levels))
+        hierarchy = []
+        for index, (child, parent) in enumerate(zip(levels[1:],
+                                                    levels[:-1])):
+            found = [chunk[index][2] for chunk in pairs]
+            hierarchy.append((child, parent, _concat(
+                found, [child, parent]).drop_duplicates()))
+        return codes, hierarchy
+
+    def _apply_pairs(self, phase, added, removed, columns, source, target,
+                     rel_type, strip):
+        """Delete removed, then merge added relationships."""
+
+        def write_added(tx, chunk):
+            return self.create_relationship_batch(
+                    tx, self._pair_records(chunk, columns[0], columns[1],
+                                           strip=strip),
+                    source, target, rel_type)
+
+        def write_removed(tx, chunk):
+            self.delete_relationship_batch(
+                    tx, self._pair_records(chunk, columns[0], columns[1],
+                                           strip=strip),
+                    source, target, rel_type)
+
+        with self._connection.session() as session:
+            self._write_batches(session, removed, write_removed,
+                                'delta_{}_removed'.format(phase))
+            dropped = sum(self._write_batches(
+                session, added, write_added, 'delta_{}_added'.format(phase)))
+        print('Dropped {} added {} pairs with missing endpoints.'.format(
+            dropped, phase))
+
+    def update_node_batch(self, tx, label, key, rows):
+        """Overwrite the properties of a batch of nodes.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        label : str
+            Node label.
+        key : str
+            Key property.
+        rows : list
+            Node records, missing values remove the property.
+
+        """
+
+        st = ('UNWIND $rows AS row MATCH (n:{0} {{{1}: row.{1}}}) '
+              'SET n += row').format(label, key)
+        tx.run(st, rows=rows)
+
+    def delete_node_batch(self, tx, label, key, keys):
+        """Delete a batch of nodes and their relationships.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        label : str
+            Node label.
+        key : str
+            Key property.
+        keys : list
+            Keys of nodes to delete.
+
+        """
+
+        st = ('UNWIND $keys AS key MATCH (n:{} {{{}: key}}) '
+              'DETACH DELETE n').format(label, key)
+        tx.run(st, keys=keys)
+
+    def delete_relationship_batch(self, tx, rows, source, target, rel_type):
+        """Delete a batch of relationships.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Key pairs, see :meth:`_pair_records`.
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+
+        """
+
+        st = ('UNWIND $rows AS row '
+              'MATCH (:{0} {{{1}: row.source}})-[r:{4}]->'
+              '(:{2} {{{3}: row.target}}) DELETE r').format(
+                      source[0], source[1], target[0], target[1], rel_type)
+        tx.run(st, rows=rows)
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+# quantiles of transaction latency reported per phase
+QUANTILES = (0.5, 0.9, 0.99)
+
+# upper bounds in seconds of the transaction latency histogram, sqrt(2)
+# apart from 1 ms to about 4 minutes, with a last bucket for anything slower
+LATENCY_BUCKETS = tuple(0.001 * 2 ** (i / 2) for i in range(37))
+
+# items of a list parameter measured by :func:`payload_size`
+SAMPLE_ROWS = 32
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes, None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def payload_size(parameters, sample=SAMPLE_ROWS):
+    """Estimate the bytes a statement's parameters take on the wire.
+
+    Parameters are measured as compact UTF-8 JSON, values JSON cannot
+    encode, e.g., dates and points, as their text. Of a list, e.g., the rows
+    of a batch, only ``sample`` evenly spaced items are encoded and the
+    size is scaled to the whole list, so the cost does not grow with the
+    batch. Bolt's binary encoding is usually smaller, so the estimate is
+    an upper bound.
+
+    Parameters
+    ----------
+    parameters : dict
+        Statement parameters.
+    sample : int
+        Items of a list parameter to encode.
+
+    Returns
+    -------
+    int
+        Estimated bytes.
+
+    """
+
+    size = 0
+    for name, value in parameters.items():
+        size += len(name.encode('utf-8'))
+        if isinstance(value, list) and len(value) > sample:
+            step = len(value) / sample
+            size += int(round(_json_size(
+                [value[int(i * step)] for i in range(sample)]) *
+                len(value) / sample))
+        else:
+            size += _json_size(value)
+    return size
+
+
+def _json_size(value):
+    """Bytes of ``value`` as compact UTF-8 JSON."""
+    return len(json.dumps(value, default=str, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8'))
+
+
+def _quantile(counts, q, peak):
+    """Estimate a quantile of the latencies counted in
+    :data:`LATENCY_BUCKETS`, interpolating linearly within the bucket it
+    falls in, as Prometheus' ``histogram_quantile`` does. The last bucket
+    ends at the slowest latency ``peak``."""
+    rank = q * sum(counts)
+    below = 0
+    for index, count in enumerate(counts):
+        if count and below + count >= rank:
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            upper = LATENCY_BUCKETS[index] \
+                if index < len(LATENCY_BUCKETS) else peak
+            return min(peak, lower + (upper - lower) * (rank - below) / count)
+        below += count
+    return 0.0
+
+
+class TimedTransaction(object):
+    """Wrap a transaction to measure the time spent in and the bytes passed
+    to ``run``.
+
+    Parameters
+    ----------
+    tx : :class:`neo4j.Transaction`
+        A neo4j transaction.
+
+    Attributes
+    ----------
+    seconds : float
+        Time spent in ``run``.
+    bytes : int
+        Estimated size of the statements and their parameters, see
+        :func:`payload_size`.
+    overhead : float
+        Time spent estimating sizes, neither transform nor latency.
+    _tx : :class:`neo4j.Transaction`
+        The wrapped transaction.
+
+    """
+
+    def __init__(self, tx):
+        super(TimedTransaction, self).__init__()
+        self._tx = tx
+        self.seconds = 0.0
+        self.bytes = 0
+        self.overhead = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+    def run(self, statement, parameters=None, **kwparameters):
+        start = time.perf_counter()
+        self.bytes += len(statement.encode('utf-8')) + payload_size(
+                dict(parameters or {}, **kwparameters))
+        self.overhead += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            return self._tx.run(statement, parameters, **kwparameters)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class LoadMetrics(object):
+    """Record rows, transaction latency, transform time, bytes sent and
+    peak memory of each phase.
+
+    Every transaction is appended to a JSON lines file as an event 'batch',
+    and every finished phase as an event 'phase' with its totals and latency
+    quantiles. A Prometheus textfile, e.g., for the textfile collector of
+    node_exporter, is rewritten at most every ``interval`` seconds and when
+    a phase finishes.
+
+    Latencies are counted in the fixed buckets of :data:`LATENCY_BUCKETS`,
+    so memory and the cost of quantiles do not grow with the number of
+    transactions. Quantiles are estimated within a bucket, the maximum is
+    exact.
+
+    Parameters
+    ----------
+    path : str
+        JSON lines file to append to, None to not write events.
+    textfile : str
+        Prometheus textfile to rewrite, None to not write one.
+    interval : float
+        Seconds between rewrites of the textfile.
+    prefix : str
+        Prefix of Prometheus metric names.
+
+    Attributes
+    ----------
+    _ofp : file
+        Open JSON lines file, None if not written.
+    _textfile : str
+        Prometheus textfile.
+    _interval : float
+        Seconds between rewrites of the textfile.
+    _prefix : str
+        Prefix of Prometheus metric names.
+    _phases : dict
+        Phase to its counters, latency histogram and start and end time.
+    _written : float
+        Time the textfile was last written.
+    _lock : :class:`threading.Lock`
+        Guards the counters against concurrent writers.
+
+    """
+
+    def __init__(self, path=None, textfile=None, interval=10.0,
+                 prefix='patentsview_load'):
+        super(LoadMetrics, self).__init__()
+        self._ofp = open(path, 'a') if path else None
+        self._textfile = textfile
+        self._interval = interval
+        self._prefix = prefix
+        self._phases = {}
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Write the textfile a last time and close the JSON lines file."""
+        with self._lock:
+            self._write_textfile()
+            if self._ofp is not None:
+                self._ofp.close()
+                self._ofp = None
+
+    def start(self, phase):
+        """Start the clock of a phase.
+
+        Starts of a running phase, e.g., of each chunk of a streamed phase,
+        nest: the phase is reported by the matching outermost
+        :meth:`finish`.
+
+        """
+
+        with self._lock:
+            entry = self._phase(phase)
+            if not entry['open']:
+                entry['start'] = time.time()
+                entry['end'] = None
+            entry['open'] += 1
+
+    def record(self, phase, rows, latency, transform=0.0, size=0):
+        """Record one transaction.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name.
+        rows : int
+            Rows written.
+        latency : float
+            Seconds from sending the batch to its commit.
+        transform : float
+            Seconds spent converting the batch to statement parameters.
+        size : int
+            Estimated bytes sent, see :func:`payload_size`.
+
+        """
+
+        with self._lock:
+            entry = self._phase(phase)
+            entry['rows'] += rows
+            entry['transactions'] += 1
+            entry['latencies'][bisect.bisect_left(LATENCY_BUCKETS,
+                                                  latency)] += 1
+            entry['latency'] += latency
+            entry['slowest'] = max(entry['slowest'], latency)
+            entry['transform'] += transform
+            entry['bytes'] += size
+            entry['last'] = time.time()
+            self._emit({'event': 'batch', 'phase': phase, 'rows': rows,
+                        'latency': latency, 'transform': transform,
+                        'bytes': size, 'peak_rss': peak_rss()})
+            if entry['last'] - self._written >= self._interval:
+                self._write_textfile()
+
+    def finish(self, phase):
+        """Stop the clock of a phase and report its totals.
+
+        Returns
+        -------
+        dict
+            Totals of the phase, see :meth:`summary`.
+
+        """
+
+        with self._lock:
+            entry = self._phase(phase)
+            entry['open'] = max(0, entry['open'] - 1)
+            if entry['open']:
+                return self._summary(phase)
+            entry['end'] = time.time()
+            summary = self._summary(phase)
+            self._emit(dict(summary, event='phase'))
+            self._write_textfile()
+        print('[METRICS] {phase}: {rows} rows in {seconds:.1f}s, '
+              '{rows_per_second:.0f} rows/s, p99 latency {p99:.3f}s, '
+              'transform {transform:.1f}s.'.format(
+                  p99=summary['latency']['p99'], **summary))
+        return summary
+
+    def summary(self, phase):
+        """Totals of a phase.
+
+        Returns
+        -------
+        dict
+            'phase', 'rows', 'transactions', 'seconds', 'rows_per_second',
+            'latency' quantiles and maximum, 'transform' seconds, 'bytes'
+            and 'peak_rss'.
+
+        """
+
+        with self._lock:
+            return self._summary(phase)
+
+    def _phase(self, phase):
+        """Counters of a phase, created on first use."""
+        if phase not in self._phases:
+            now = time.time()
+            self._phases[phase] = {'rows': 0, 'transactions': 0,
+                                   'latencies': [0] * (len(LATENCY_BUCKETS) +
+                                                       1),
+                                   'latency': 0.0, 'slowest': 0.0,
+                                   'transform': 0.0, 'bytes': 0,
+                                   'start': now, 'last': now, 'end': None,
+                                   'open': 0}
+        return self._phases[phase]
+
+    def _summary(self, phase):
+        entry = self._phase(phase)
+        seconds = (entry['end'] or time.time()) - entry['start']
+        latency = {'p{:g}'.format(q * 100): _quantile(entry['latencies'], q,
+                                                       entry['slowest'])
+                   for q in QUANTILES}
+        latency['max'] = entry['slowest']
+        return {'phase': phase, 'rows': entry['rows'],
+                'transactions': entry['transactions'], 'seconds': seconds,
+                'rows_per_second': entry['rows'] / seconds if seconds else 0.0,
+                'latency': latency, 'transform': entry['transform'],
+                'bytes': entry['bytes'], 'peak_rss': peak_rss()}
+
+    def _emit(self, event):
+        """Append an event to the JSON lines file."""
+        if self._ofp is not None:
+            event['time'] = time.time()
+            self._ofp.write(json.dumps(event) + '\n')
+            self._ofp.flush()
+
+    def _write_textfile(self):
+        """Atomically rewrite the Prometheus textfile."""
+        self._written = time.time()
+        if not self._textfile:
+            return
+        lines = []
+
+        def metric(name, kind, help, samples):
+            name = '{}_{}'.format(self._prefix, name)
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            # a sample's optional third item suffixes the name, e.g., the
+            # '_bucket', '_sum' and '_count' series of a histogram
+            for sample in samples:
+                labels, value, suffix = (tuple(sample) + ('',))[:3]
+                labels = ','.join('{}="{}"'.format(*label)
+                                  for label in labels)
+                lines.append('{}{}{} {}'.format(
+                    name, suffix, '{{{}}}'.format(labels) if labels else '',
+                    value))
+
+        phases = sorted(self._phases)
+        entries = [(phase, self._phases[phase]) for phase in phases]
+        metric('rows_total', 'counter', 'Rows written.',
+               [([('phase', phase)], entry['rows'])
+                for phase, entry in entries])
+        metric('transactions_total', 'counter', 'Transactions committed.',
+               [([('phase', phase)], entry['transactions'])
+                for phase, entry in entries])
+        metric('bytes_total', 'counter',
+               'Estimated bytes of statements and parameters sent.',
+               [([('phase', phase)], entry['bytes'])
+                for phase, entry in entries])
+        metric('transform_seconds_total', 'counter',
+               'Seconds spent converting batches to parameters.',
+               [([('phase', phase)], entry['transform'])
+                for phase, entry in entries])
+        samples = []
+        for phase, entry in entries:
+            below = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',),
+                                    entry['latencies']):
+                below += count
+                samples.append(([('phase', phase), ('le', bound)], below,
+                                '_bucket'))
+            samples.append(([('phase', phase)], entry['latency'], '_sum'))
+            samples.append(([('phase', phase)], entry['transactions'],
+                            '_count'))
+        metric('transaction_latency_seconds', 'histogram',
+               'Seconds from sending a batch to its commit.', samples)
+        metric('rows_per_second', 'gauge', 'Rows written per second.',
+               [([('phase', phase)], self._summary(phase)['rows_per_second'])
+                for phase in phases])
+        metric('last_batch_timestamp_seconds', 'gauge',
+               'Time of the last committed transaction.',
+               [([('phase', phase)], entry['last'])
+                for phase, entry in entries])
+        metric('finished', 'gauge', 'Whether the phase has finished.',
+               [([('phase', phase)], int(entry['end'] is not None))
+                for phase, entry in entries])
+        rss = peak_rss()
+        if rss is not None:
+            metric('peak_rss_bytes', 'gauge',
+                   'Peak resident set size of the loader.', [([], rss)])
+        tmp = self._textfile + '.tmp'
+        with open(tmp, 'w') as ofp:
+            ofp.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self._textfile)
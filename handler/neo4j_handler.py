@@ -1,12 +1,277 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import re
+import time
 
-from neo4j import GraphDatabase
-from neo4j.types.spatial import WGS84Point
+try:
+    from neo4j.spatial import WGS84Point
+except ImportError:  # neo4j < 4.0
+    from neo4j.types.spatial import WGS84Point
 import numpy as np
+import pandas as pd
+
+from .batching import AdaptiveBatcher, gaps
+from .checkpoint import CheckpointManifest
+from .connection import ConnectionManager, execute_write
+from .metrics import TimedTransaction
+from .partition import PartitionedWriter
+from .patentsview_handler import (HIERARCHICAL, PatentsViewHandler,
+                                  code_hierarchy)
+from .scheduler import PhaseScheduler
+from .schema import SchemaManager
+from .streaming import Stream, prefetch
+
+
+# UNWIND statements creating a batch of nodes from a list of records
+NODE_BATCH = {
+    'patent': ('UNWIND $rows AS row '
+               'CREATE (p:patent {pid: row.pid, type: row.type, '
+               'date: row.date, application_id: row.application_id, '
+               'series_code: row.series_code, '
+               'application_date: row.application_date, '
+               'dependent: row.dependent, independent: row.independent, '
+               'foreigncitation: row.foreigncitation, '
+               'otherreference: row.otherreference, '
+               'applicationcitation: row.applicationcitation})'),
+    'assignee': ('UNWIND $rows AS row '
+                 'CREATE (a:assignee {assignee_id: row.assignee_id, '
+                 'assignee_name: row.assignee_name, '
+                 'assignee_type: row.assignee_type})'),
+    'inventor': ('UNWIND $rows AS row '
+                 'CREATE (a:inventor {inventor_id: row.inventor_id, '
+                 'inventor_name: row.inventor_name})'),
+    'location': ('UNWIND $rows AS row '
+                 'CREATE (a:location {location_id: row.location_id, '
+                 'city: row.city, state: row.state, country: row.country, '
+                 'gps: row.gps, county: row.county, '
+                 'state_fips: row.state_fips, county_fips: row.county_fips})'),
+}
+
+# CREATE of a node batch, see :data:`NODE_BATCH`, and its properties
+NODE_CREATE = re.compile(r'^(?P<unwind>UNWIND \$rows AS row) '
+                         r'CREATE \((?P<node>\w+):(?P<label>\w+) '
+                         r'\{(?P<key>\w+: row\.\w+), (?P<properties>.*)\}\)$')
+
+
+def _merge_nodes(statement):
+    """MERGE a :data:`NODE_BATCH` statement: nodes are matched on their key,
+    the first property, and only set the others when created."""
+    match = NODE_CREATE.match(statement)
+    return '{} MERGE ({}:{} {{{}}}) ON CREATE SET {}'.format(
+            match.group('unwind'), match.group('node'), match.group('label'),
+            match.group('key'), ', '.join(
+                '{}.{}'.format(match.group('node'), prop.replace(':', ' =', 1))
+                for prop in match.group('properties').split(', ')))
+
+
+# MERGE statements writing the rows of :data:`NODE_BATCH` again
+NODE_MERGE = {statement: _merge_nodes(statement)
+              for statement in NODE_BATCH.values()}
+
+
+def merge_statement(statement):
+    """Turn a batch statement into one that may run again on rows committed
+    already without duplicating them.
 
-from .patentsview_handler import PatentsViewHandler
+    Parameters
+    ----------
+    statement : str
+        Cypher statement, e.g., of :data:`NODE_BATCH` or
+        :func:`relationship_batch`.
+
+    Returns
+    -------
+    str
+        The MERGE form of node and relationship batches that CREATE, other
+        statements as they are.
+
+    """
+
+    if statement in NODE_MERGE:
+        return NODE_MERGE[statement]
+    return statement.replace(') CREATE (a)-[', ') MERGE (a)-[', 1)
+
+
+class MergeTransaction(object):
+    """Wrap a transaction to run batch statements in their MERGE form, see
+    :func:`merge_statement`, for rows a previous run may have committed.
+
+    Parameters
+    ----------
+    tx : :class:`neo4j.Transaction`
+        A neo4j transaction.
+
+    Attributes
+    ----------
+    _tx : :class:`neo4j.Transaction`
+        The wrapped transaction.
+
+    """
+
+    def __init__(self, tx):
+        super(MergeTransaction, self).__init__()
+        self._tx = tx
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+    def run(self, statement, parameters=None, **kwparameters):
+        return self._tx.run(merge_statement(statement), parameters,
+                            **kwparameters)
+
+
+def relationship_batch(source, target, rel_type, create=False):
+    """Build the statement inserting a batch of relationships.
+
+    The statement takes key pairs as ``$rows``, see
+    :meth:`Neo4jHandler._pair_records`, and returns the number of pairs whose
+    endpoints were both found as ``matched``.
+
+    Parameters
+    ----------
+    source : tuple
+        (label, key property) of the start node.
+    target : tuple
+        (label, key property) of the end node.
+    rel_type : str
+        Relationship type.
+    create : bool
+        CREATE relationships instead of MERGE them.
+
+    Returns
+    -------
+    str
+        Cypher statement.
+
+    """
+
+    return ('UNWIND $rows AS row '
+            'MATCH (a:{0} {{{1}: row.source}}) '
+            'MATCH (b:{2} {{{3}: row.target}}) '
+            '{4} (a)-[:{5}]->(b) '
+            'RETURN count(*) AS matched').format(
+                    source[0], source[1], target[0], target[1],
+                    'CREATE' if create else 'MERGE', rel_type)
+
+
+def classification_triples(data, levels):
+    """Deduplicate the (patent, level, code) triples of a classification.
+
+    A patent classified under several subgroups of one group belongs to that
+    group, and its section, only once.
+
+    Parameters
+    ----------
+    data : :class:`pandas.DataFrame`
+        Patent classifications, one column per level.
+    levels : list
+        Classification levels, i.e., node labels and columns.
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        Distinct triples in columns 'patent_id', 'level' (categorical) and
+        'code', grouped by level.
+
+    """
+
+    frames = []
+    for level in levels:
+        pairs = data[['patent_id', level]].drop_duplicates()
+        frames.append(pd.DataFrame({'patent_id': pairs['patent_id'].values,
+                                    'level': level,
+                                    'code': pairs[level].astype(str).values}))
+    triples = pd.concat(frames, ignore_index=True)
+    triples['level'] = pd.Categorical(triples['level'], categories=levels)
+    return triples
+
+
+def _code_path(levels, level, compact):
+    """Pattern from a patent's BELONGS_TO relationship to code ``c`` of
+    ``level``, through SUBCLASS_OF relationships in the compact schema."""
+    hops = len(levels) - 1 - levels.index(level) if compact else 0
+    if not hops:
+        return '(c:{})'.format(level)
+    return '(:{0})-[:SUBCLASS_OF*{1}]->(c:{2})'.format(levels[-1], hops,
+                                                        level)
+
+
+def classes_query(levels, level, compact=False):
+    """Build the statement listing the codes of ``level`` patent ``$pid``
+    belongs to, as ``id``.
+
+    Parameters
+    ----------
+    levels : list
+        Classification levels, from the most general to the most specific.
+    level : str
+        Level to roll up to.
+    compact : bool
+        Patents only belong to codes of the most specific level, which are
+        linked to their parents by SUBCLASS_OF relationships.
+
+    Returns
+    -------
+    str
+        Cypher statement.
+
+    """
+
+    return ('MATCH (p:patent {{pid: $pid}})-[:BELONGS_TO]->{0} '
+            'RETURN DISTINCT c.id AS id ORDER BY id').format(
+                    _code_path(levels, level, compact))
+
+
+def members_query(levels, level, compact=False):
+    """Build the statement listing the patents under code ``$code`` of
+    ``level``, as ``pid``. Parameters as of :func:`classes_query`."""
+    return ('MATCH (p:patent)-[:BELONGS_TO]->{0} WHERE c.id = $code '
+            'RETURN DISTINCT p.pid AS pid ORDER BY pid').format(
+                    _code_path(levels, level, compact))
+
+
+def counts_query(levels, level, compact=False):
+    """Build the statement counting the patents under each code of
+    ``level``, as ``id`` and ``patents``. Parameters as of
+    :func:`classes_query`."""
+    return ('MATCH (p:patent)-[:BELONGS_TO]->{0} '
+            'RETURN c.id AS id, count(DISTINCT p) AS patents').format(
+                    _code_path(levels, level, compact))
+
+
+def _records(frame, key):
+    """Convert a chunk to one dict per row, with the index as ``key`` and
+    missing values as None.
+
+    Parameters
+    ----------
+    frame : :class:`pandas.DataFrame`
+        Chunk of a node table.
+    key : str
+        Name of the key property.
+
+    Returns
+    -------
+    list
+        Property name to value, one per row.
+
+    """
+
+    frame = frame.astype(object)
+    frame = frame.where(frame.notnull(), None)
+    frame.insert(0, key, frame.index.astype(object))
+    return frame.to_dict('records')
+
+
+def _row_frame(key, attrs):
+    """Turn one row, as yielded by ``iterrows``, back into a chunk."""
+    return pd.DataFrame([attrs.values], index=[key], columns=attrs.index)
+
+
+def _strip(column):
+    """Strip a string column, mapping missing values to ''."""
+    return column.where(column.notnull(), '').astype(str).str.strip()
 
 
 def to_epoch(date):
@@ -31,12 +296,61 @@ class Neo4jHandler(object):
     """API interface for manipulations of patent citation network saved in
     neo4j.
 
+    All phases share one pooled driver. Use the handler as a context manager,
+    or call :meth:`close`, to release its connections.
+
     Parameters
     ----------
     credential : str
-        Path to credential file.
+        Path to credential file, not read if ``sink`` is given.
     data : str
         Dir to data files.
+    uri : str
+        Bolt URI of the database.
+    pool_size : int
+        Maximum number of pooled connections.
+    fetch_size : int
+        Records fetched per pull, None for the driver default.
+    lifetime : int
+        Seconds before a pooled connection is retired.
+    checkpoint : str
+        Path to a checkpoint manifest recording committed rows, None to
+        disable checkpoints.
+    resume : bool
+        Skip rows the checkpoint manifest records as committed.
+    batch_size : int
+        Rows per transaction to start each phase with.
+    latency : float
+        Commit latency in seconds batch sizes are adjusted to, see
+        :class:`AdaptiveBatcher`.
+    compact : bool
+        Link patents only to the most specific code of hierarchical
+        classifications, see :attr:`HIERARCHICAL`, and link codes to their
+        parents by SUBCLASS_OF relationships.
+    sink : :class:`Sink`
+        Receives the statements instead of a Bolt server, see
+        :class:`MemorySink` and :class:`FileSink`. None to connect to ``uri``.
+    metrics : :class:`LoadMetrics`
+        Records rows, latency, transform time and bytes of every
+        transaction, None to not record metrics.
+    stream : bool
+        Stream the largest tables, uspatentcitation, patent_inventor,
+        location_inventor and cpc_current, in chunks from the data files to
+        the writer, see :meth:`_stream_relationships`, instead of reading
+        them as a whole.
+    chunksize : int
+        Rows per streamed chunk.
+    categorical : bool
+        Hold node keys as integer codes of vocabularies shared by all phases
+        and low-cardinality columns as categorical, see
+        :meth:`PatentsViewHandler._encode`. Keys and codes are decoded to
+        strings only as batches are converted to statement parameters.
+    processes : int
+        Processes parsing each table, see
+        :meth:`PatentsViewHandler._read_table`.
+    writers : int
+        Sessions writing the relationships of each phase concurrently, see
+        :class:`PartitionedWriter`, 1 to write on one session.
 
     Attributes
     ----------
@@ -46,58 +360,204 @@ class Neo4jHandler(object):
         Password
     _data : str
         Dir to data files.
+    _connection : :class:`ConnectionManager`
+        Hands out sessions on the shared driver, or the sink.
+    _checkpoint : :class:`CheckpointManifest`
+        Committed rows of each phase, None if disabled.
+    _batch_size : int
+        Rows per transaction to start each phase with.
+    _latency : float
+        Commit latency in seconds batch sizes are adjusted to.
+    _schema : :class:`SchemaManager`
+        Creates constraints and indexes.
+    _compact : bool
+        Write the compact classification schema.
+    _metrics : :class:`LoadMetrics`
+        Records metrics of every transaction, None if disabled.
+    _stream : bool
+        Stream the largest tables.
+    _chunksize : int
+        Rows per streamed chunk.
+    _vocabularies : dict
+        Kind of node to its shared :class:`Vocabulary`, None to hold frames
+        as strings.
+    _processes : int
+        Processes parsing each table.
+    _writers : int
+        Sessions writing the relationships of each phase concurrently.
 
     """
 
-    def __init__(self, credential, data):
+    def __init__(self, credential, data, uri='bolt://localhost:7687',
+                 pool_size=100, fetch_size=None, lifetime=3600,
+                 checkpoint=None, resume=False, batch_size=10000,
+                 latency=1.0, compact=False, sink=None, metrics=None,
+                 stream=False, chunksize=1000000, categorical=False,
+                 processes=1, writers=1):
         super(Neo4jHandler, self).__init__()
-        with open(credential, 'r') as ifp:
-            lines = ifp.readlines()
-            self._username = lines[0].strip()
-            self._password = lines[1].strip()
+        self._username = self._password = None
+        if sink is None:
+            with open(credential, 'r') as ifp:
+                lines = ifp.readlines()
+                self._username = lines[0].strip()
+                self._password = lines[1].strip()
+            sink = ConnectionManager(
+                    self._username, self._password, uri=uri,
+                    pool_size=pool_size, fetch_size=fetch_size,
+                    lifetime=lifetime)
         self._data = data
+        self._connection = sink
+        self._checkpoint = CheckpointManifest(checkpoint, resume) \
+            if checkpoint else None
+        self._batch_size = batch_size
+        self._latency = latency
+        self._compact = compact
+        self._metrics = metrics
+        self._stream = stream
+        self._chunksize = chunksize
+        self._vocabularies = {} if categorical else None
+        self._processes = processes
+        self._writers = writers
+        self._schema = SchemaManager(self._connection, self.CONSTRAINTS,
+                                     self.INDEXES)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the shared driver."""
+        self._connection.close()
+
+    # (phase, method, required phases)
+    PHASES = [
+        ('patent', 'create_patent_nodes', ()),
+        ('assignee', 'create_assignee_nodes', ()),
+        ('inventor', 'create_inventor_nodes', ()),
+        ('location', 'create_location_nodes', ()),
+        ('citation', 'create_citation_relationships', ('patent',)),
+        ('patent_assignee', 'create_patent_assignee_relationships',
+         ('patent', 'assignee')),
+        ('patent_inventor', 'create_patent_inventor_relationships',
+         ('patent', 'inventor')),
+        ('assignee_location', 'create_assignee_location_relationships',
+         ('assignee', 'location')),
+        ('inventor_location', 'create_inventor_location_relationships',
+         ('inventor', 'location')),
+        ('cpc', 'create_cpc_nodes_and_edges', ('patent',)),
+        ('uspc', 'create_uspc_nodes_and_edges', ('patent',)),
+        ('ipcr', 'create_ipcr_nodes_and_edges', ('patent',)),
+        ('nber', 'create_nber_nodes_and_edges', ('patent',)),
+    ]
+
+    # classification scheme to levels, i.e., node labels and columns
+    LEVELS = {
+        'cpc': ['cpc_section', 'cpc_subsection', 'cpc_group', 'cpc_subgroup'],
+        'uspc': ['uspc_mainclass', 'uspc_subclass'],
+        'ipcr': ['ipcr_section', 'ipcr_class', 'ipcr_subclass', 'ipcr_group',
+                 'ipcr_subgroup'],
+        'nber': ['nber_category', 'nber_subcategory'],
+    }
+
+    # builder to (table, chunked reader) of :class:`PatentsViewHandler`,
+    # streamed with ``stream=True``
+    STREAMS = {
+        'construct_patent_citations': ('uspatentcitation',
+                                       'iter_patent_citations'),
+        'construct_patent_inventor_edges': ('patent_inventor',
+                                            'iter_patent_inventor_edges'),
+        'construct_inventor_location_edges': ('location_inventor',
+                                              'iter_inventor_location_edges'),
+        'construct_cpc_nodes': ('cpc_current', 'iter_cpc_nodes'),
+    }
+
+    # (label, key property) of unique node keys, created before any phase
+    CONSTRAINTS = [
+        ('patent', 'pid'),
+        ('assignee', 'assignee_id'),
+        ('inventor', 'inventor_id'),
+        ('location', 'location_id'),
+    ] + [(level, 'id') for levels in LEVELS.values() for level in levels]
+
+    # (label, property) of secondary indexes, created after all phases
+    INDEXES = [
+        ('patent', 'date'),
+    ]
+
+    def _patentsview(self):
+        """Handler of the data files, sharing the vocabularies of node keys
+        of this handler, see :attr:`_vocabularies`, and parsing tables on
+        :attr:`_processes` processes."""
+        return PatentsViewHandler(self._data, vocabularies=self._vocabularies,
+                                  processes=self._processes)
+
+    def load_patentsview(self, workers=1, only=None, skip=()):
+        """Load PatentsView dataset into Neo4j database.
+
+        Phases run once the phases they depend on, see :attr:`PHASES`, have
+        finished. Uniqueness constraints are created before the first phase,
+        secondary indexes after the last, see :class:`SchemaManager`.
+
+        Parameters
+        ----------
+        workers : int
+            Maximum number of phases running at the same time.
+        only : list
+            Run only these phases, None to run all.
+        skip : list
+            Phases already loaded.
 
-    def load_patentsview(self):
-        """Load PatentsView dataset into Neo4j database."""
-        self.create_patent_nodes()
-        self.create_assignee_nodes()
-        self.create_inventor_nodes()
-        self.create_location_nodes()
-        self.create_citation_relationships()
-        self.create_patent_assignee_relationships()
-        self.create_patent_inventor_relationships()
-        self.create_assignee_location_relationships()
-        self.create_inventor_location_relationships()
-        self.create_cpc_nodes_and_edges()
-        self.create_uspc_nodes_and_edges()
-        self.create_ipcr_nodes_and_edges()
-        self.create_nber_nodes_and_edges()
-
-    def create_patent_nodes(self, chunks=500):
+        """
+
+        scheduler = PhaseScheduler(workers)
+        for name, method, requires in self.PHASES:
+            scheduler.add(name, getattr(self, method), requires)
+        self._schema.create_constraints()
+        scheduler.run(only, skip)
+        self.create_indexes()
+
+    def create_schema(self):
+        """Create all constraints and indexes, e.g., after a bulk import."""
+        self._schema.create_constraints()
+        self.create_indexes()
+
+    def create_indexes(self):
+        """Create secondary indexes and wait until they are populated."""
+        print('Building indexes.')
+        start = time.time()
+        self._schema.create_indexes()
+        self._schema.await_indexes()
+        print('Finish building indexes in {:.1f}s.'.format(
+            time.time() - start))
+
+    def create_patent_nodes(self, batch_size=None, unwind=True):
         """CREATE patent nodes in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per patent.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading patent nodes.')
-        data = PatentsViewHandler(self._data).construct_patent_nodes(chunks)
+        data = self._patentsview().construct_patent_nodes()
         print('Finish loading patent nodes.')
-        with graph.session() as session:
-            session.run(('CREATE CONSTRAINT ON (p:patent) '
-                         'ASSERT p.pid IS UNIQUE'))
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:03d}/{:03d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
+
+        def write(tx, chunk):
+            if unwind:
+                self.create_patent_node_batch(tx, self._patent_records(chunk))
+            else:
                 for pid, attrs in chunk.iterrows():
                     self.create_patent_node(tx, pid, attrs)
-                tx.commit()
-            session.run('CREATE INDEX ON :patent(date)')
+
+        with self._connection.session() as session:
+            self._write_batches(session, data, write, 'patent', batch_size)
 
     def create_patent_node(self, tx, pid, attrs):
         """CREATE one patent node.
@@ -113,46 +573,98 @@ class Neo4jHandler(object):
 
         """
 
-        attrs = attrs.where(attrs.notnull(), None).to_dict()
-        attrs['pid'] = pid
-        attrs['date'] = attrs['date'].date()
-        try:
-            attrs['application_date'] = datetime.datetime.strptime(
-                    attrs['application_date'], '%Y-%m-%d').date()
-        except ValueError:  # invalid date, e.g., '1968-05-00'
-            attrs['application_date'] = None
         st = ('CREATE (p:patent {pid: $pid, type: $type, date: $date, '
               'application_id: $application_id, series_code: $series_code, '
               'application_date: $application_date, dependent: $dependent, '
               'independent: $independent, foreigncitation: $foreigncitation, '
               'otherreference: $otherreference, '
               'applicationcitation: $applicationcitation})')
-        tx.run(st, **attrs)
+        tx.run(st, **self._patent_record(pid, attrs))
+
+    def create_patent_node_batch(self, tx, rows):
+        """CREATE a batch of patent nodes with a single statement.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Patent records, see :meth:`_patent_records`.
+
+        """
+
+        tx.run(NODE_BATCH['patent'], rows=rows)
+
+    def _patent_record(self, pid, attrs):
+        """Convert one patent row to statement parameters.
+
+        Parameters
+        ----------
+        pid : str
+            Patent id.
+        attrs : :class:`pandas.DataFrame`
+            Attributes associated with this patent.
+
+        Returns
+        -------
+        dict
+            Property name to value.
+
+        """
+
+        return self._patent_records(_row_frame(pid, attrs))[0]
+
+    def _patent_records(self, chunk):
+        """Convert a patent chunk to statement parameters.
+
+        Application dates that are not valid dates, e.g., '1968-05-00', are
+        set to None.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Patents indexed by patent id.
 
-    def create_assignee_nodes(self, chunks=50):
+        Returns
+        -------
+        list
+            Patent records, property name to value.
+
+        """
+
+        application_date = pd.to_datetime(chunk['application_date'],
+                                          format='%Y-%m-%d', errors='coerce')
+        return _records(chunk.assign(
+            date=pd.to_datetime(chunk['date'], errors='coerce').dt.date,
+            application_date=application_date.dt.date), 'pid')
+
+    def create_assignee_nodes(self, batch_size=None, unwind=True):
         """CREATE assignee nodes in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per assignee.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading assignee nodes.')
-        data = PatentsViewHandler(self._data).construct_assignee_nodes(chunks)
+        data = self._patentsview().construct_assignee_nodes()
         print('Finish loading assignee nodes.')
-        with graph.session() as session:
-            session.run(('CREATE CONSTRAINT ON (a:assignee) '
-                         'ASSERT a.assignee_id IS UNIQUE'))
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:03d}/{:03d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
+
+        def write(tx, chunk):
+            if unwind:
+                self.create_assignee_node_batch(
+                        tx, self._assignee_records(chunk))
+            else:
                 for assignee_id, attrs in chunk.iterrows():
                     self.create_assignee_node(tx, assignee_id, attrs)
-                tx.commit()
+
+        with self._connection.session() as session:
+            self._write_batches(session, data, write, 'assignee', batch_size)
 
     def create_assignee_node(self, tx, assignee_id, attrs):
         """CREATE one assignee node.
@@ -168,39 +680,93 @@ class Neo4jHandler(object):
 
         """
 
-        attrs = attrs.where(attrs.notnull(), None).to_dict()
-        attrs['assignee_id'] = assignee_id
-        attrs = {key: value.strip() if value else ''
-                 for key, value in attrs.items()}
         statement = ('CREATE (a:assignee {assignee_id: $assignee_id, '
                      'assignee_name: $assignee_name, '
                      'assignee_type: $assignee_type})')
-        tx.run(statement, **attrs)
+        tx.run(statement, **self._assignee_record(assignee_id, attrs))
+
+    def create_assignee_node_batch(self, tx, rows):
+        """CREATE a batch of assignee nodes with a single statement.
 
-    def create_inventor_nodes(self, chunks=100):
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Assignee records, see :meth:`_assignee_records`.
+
+        """
+
+        tx.run(NODE_BATCH['assignee'], rows=rows)
+
+    def _assignee_record(self, assignee_id, attrs):
+        """Convert one assignee row to statement parameters.
+
+        Parameters
+        ----------
+        assignee_id : str
+            Assignee id.
+        attrs : :class:`pandas.DataFrame`
+            Attributes associated with this assignee.
+
+        Returns
+        -------
+        dict
+            Property name to value.
+
+        """
+
+        return self._assignee_records(_row_frame(assignee_id, attrs))[0]
+
+    def _assignee_records(self, chunk):
+        """Convert an assignee chunk to statement parameters.
+
+        All values are stripped strings, missing ones are ''.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Assignees indexed by assignee id.
+
+        Returns
+        -------
+        list
+            Assignee records, property name to value.
+
+        """
+
+        frame = pd.DataFrame({column: _strip(chunk[column])
+                              for column in chunk.columns})
+        frame.index = _strip(chunk.index.to_series()).values
+        return _records(frame, 'assignee_id')
+
+    def create_inventor_nodes(self, batch_size=None, unwind=True):
         """CREATE inventor nodes in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per inventor.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading inventor nodes.')
-        data = PatentsViewHandler(self._data).construct_inventor_nodes(chunks)
+        data = self._patentsview().construct_inventor_nodes()
         print('Finish loading inventor nodes.')
-        with graph.session() as session:
-            session.run(('CREATE CONSTRAINT ON (i:inventor) '
-                         'ASSERT i.inventor_id IS UNIQUE'))
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:03d}/{:03d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
+
+        def write(tx, chunk):
+            if unwind:
+                self.create_inventor_node_batch(
+                        tx, self._inventor_records(chunk))
+            else:
                 for inventor_id, attrs in chunk.iterrows():
                     self.create_inventor_node(tx, inventor_id, attrs)
-                tx.commit()
+
+        with self._connection.session() as session:
+            self._write_batches(session, data, write, 'inventor', batch_size)
 
     def create_inventor_node(self, tx, inventor_id, attrs):
         """Insert one inventor node.
@@ -216,37 +782,87 @@ class Neo4jHandler(object):
 
         """
 
-        attrs = attrs.where(attrs.notnull(), None).to_dict()
-        attrs['inventor_name'] = attrs['inventor_name'].strip()
-        attrs['inventor_id'] = inventor_id
         statement = ('CREATE (a:inventor {inventor_id: $inventor_id, '
                      'inventor_name: $inventor_name})')
-        tx.run(statement, **attrs)
+        tx.run(statement, **self._inventor_record(inventor_id, attrs))
+
+    def create_inventor_node_batch(self, tx, rows):
+        """CREATE a batch of inventor nodes with a single statement.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Inventor records, see :meth:`_inventor_records`.
+
+        """
+
+        tx.run(NODE_BATCH['inventor'], rows=rows)
+
+    def _inventor_record(self, inventor_id, attrs):
+        """Convert one inventor row to statement parameters.
+
+        Parameters
+        ----------
+        inventor_id : str
+            Inventor id.
+        attrs : :class:`pandas.DataFrame`
+            Attributes associated to the select inventor.
+
+        Returns
+        -------
+        dict
+            Property name to value.
 
-    def create_location_nodes(self, chunks=50):
+        """
+
+        return self._inventor_records(_row_frame(inventor_id, attrs))[0]
+
+    def _inventor_records(self, chunk):
+        """Convert an inventor chunk to statement parameters.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Inventors indexed by inventor id.
+
+        Returns
+        -------
+        list
+            Inventor records, property name to value.
+
+        """
+
+        return _records(chunk, 'inventor_id')
+
+    def create_location_nodes(self, batch_size=None, unwind=True):
         """CREATE location nodes in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per location.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading location nodes.')
-        data = PatentsViewHandler(self._data).construct_location_nodes(chunks)
+        data = self._patentsview().construct_location_nodes()
         print('Finish loading location nodes.')
-        with graph.session() as session:
-            session.run(('CREATE CONSTRAINT ON (l:location) '
-                         'ASSERT l.location_id IS UNIQUE'))
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:03d}/{:03d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
+
+        def write(tx, chunk):
+            if unwind:
+                self.create_location_node_batch(
+                        tx, self._location_records(chunk))
+            else:
                 for location_id, attrs in chunk.iterrows():
                     self.create_location_node(tx, location_id, attrs)
-                tx.commit()
+
+        with self._connection.session() as session:
+            self._write_batches(session, data, write, 'location', batch_size)
 
     def create_location_node(self, tx, location_id, attrs):
         """Insert one location node.
@@ -262,41 +878,112 @@ class Neo4jHandler(object):
 
         """
 
-        attrs = attrs.where(attrs.notnull(), None).to_dict()
-        attrs['location_id'] = location_id
-        attrs['gps'] = WGS84Point(
-                (float(attrs['longitude']), float(attrs['latitude'])))
-        del attrs['longitude']
-        del attrs['latitude']
         statement = ('CREATE (a:location {location_id: $location_id, '
                      'city: $city, state: $state, country: $country, '
                      'gps: $gps, county: $county, state_fips: $state_fips, '
                      'county_fips: $county_fips})')
-        tx.run(statement, **attrs)
+        tx.run(statement, **self._location_record(location_id, attrs))
+
+    def create_location_node_batch(self, tx, rows):
+        """CREATE a batch of location nodes with a single statement.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Location records, see :meth:`_location_records`.
+
+        """
+
+        tx.run(NODE_BATCH['location'], rows=rows)
+
+    def _location_record(self, location_id, attrs):
+        """Convert one location row to statement parameters.
+
+        Parameters
+        ----------
+        location_id : str
+            Location id.
+        attrs : :class:`pandas.DataFrame`
+            Attributes associated with this location.
+
+        Returns
+        -------
+        dict
+            Property name to value.
+
+        """
+
+        return self._location_records(_row_frame(location_id, attrs))[0]
+
+    def _location_records(self, chunk):
+        """Convert a location chunk to statement parameters.
+
+        Latitude and longitude become a WGS-84 point ``gps``, None if either
+        is missing.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Locations indexed by location id.
+
+        Returns
+        -------
+        list
+            Location records, property name to value.
+
+        """
 
-    def create_citation_relationships(self, chunks=1000):
+        longitude = pd.to_numeric(chunk['longitude'], errors='coerce')
+        latitude = pd.to_numeric(chunk['latitude'], errors='coerce')
+        valid = (longitude.notnull() & latitude.notnull()).tolist()
+        gps = pd.Series([WGS84Point(point) if ok else None for point, ok in
+                         zip(zip(longitude.tolist(), latitude.tolist()),
+                             valid)], index=chunk.index, dtype=object)
+        frame = chunk.drop(columns=['longitude', 'latitude'])
+        frame['gps'] = gps
+        return _records(frame, 'location_id')
+
+    def create_citation_relationships(self, batch_size=None,
+                                      unwind=True, deduplicated=False,
+                                      writers=None):
         """MERGE citation relationships in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per relationship.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd. Only used when ``unwind`` is set.
+        writers : int
+            Number of sessions writing concurrently, see
+            :class:`PartitionedWriter`, None for the handler default. Only
+            used when ``unwind`` is set.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading citation relationships.')
-        data = PatentsViewHandler(self._data).construct_patent_citations(
-                chunks)
+        handler = self._patentsview()
+        if self._stream and unwind:
+            data = self._stream_chunks(handler,
+                                       'construct_patent_citations')
+        else:
+            data = handler.construct_patent_citations()
         print('Finish loading citation relationships.')
-        with graph.session() as session:
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:04d}/{:04d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, citation in chunk.iterrows():
-                    self.create_citation_relationship(tx, citation)
-                tx.commit()
+        dropped = self._write_relationships(
+                self._connection, data, ('patent_id', 'citation_id'),
+                ('patent', 'pid'), ('patent', 'pid'), 'CITES',
+                self.create_citation_relationship, unwind, deduplicated,
+                writers=writers or self._writers, phase='citation',
+                batch_size=batch_size)
+        if unwind:
+            print('Dropped {} citations with missing '
+                  'endpoints.'.format(dropped))
 
     def create_citation_relationship(self, tx, citation):
         """CREATE citation relationships for the select patent.
@@ -315,29 +1002,40 @@ class Neo4jHandler(object):
         tx.run(st, pid=str(citation['patent_id']),
                cite=str(citation['citation_id']))
 
-    def create_patent_assignee_relationships(self, chunks=600):
+    def create_patent_assignee_relationships(self, batch_size=None,
+                                             unwind=True, deduplicated=False,
+                                             writers=None):
         """CREATE patent-assignee relationships in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per relationship.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd. Only used when ``unwind`` is set.
+        writers : int
+            Number of sessions writing concurrently, see
+            :class:`PartitionedWriter`, None for the handler default. Only
+            used when ``unwind`` is set.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading patent-assignee relationships.')
-        data = PatentsViewHandler(self._data).construct_patent_assignee_edges(
-                chunks)
+        data = self._patentsview().construct_patent_assignee_edges()
         print('Finish loading patent-assignee relationships.')
-        with graph.session() as session:
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:04d}/{:04d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_patent_assignee_relationship(tx, rel)
-                tx.commit()
+        dropped = self._write_relationships(
+                self._connection, data, ('assignee_id', 'patent_id'),
+                ('assignee', 'assignee_id'), ('patent', 'pid'), 'OWNS',
+                self.create_patent_assignee_relationship, unwind, deduplicated,
+                writers=writers or self._writers, strip=True,
+                phase='patent_assignee', batch_size=batch_size)
+        if unwind:
+            print('Dropped {} patent-assignee pairs with missing '
+                  'endpoints.'.format(dropped))
 
     def create_patent_assignee_relationship(self, tx, rel):
         """Insert patent-assignee relationships for the select patent.
@@ -356,29 +1054,45 @@ class Neo4jHandler(object):
         tx.run(statement, assignee_id=rel['assignee_id'].strip(),
                pid=rel['patent_id'].strip())
 
-    def create_patent_inventor_relationships(self, chunks=600):
+    def create_patent_inventor_relationships(self, batch_size=None,
+                                             unwind=True, deduplicated=False,
+                                             writers=None):
         """CREATE patent-inventor relationship in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per relationship.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd. Only used when ``unwind`` is set.
+        writers : int
+            Number of sessions writing concurrently, see
+            :class:`PartitionedWriter`, None for the handler default. Only
+            used when ``unwind`` is set.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading patent-inventor relationships.')
-        handler = PatentsViewHandler(self._data)
-        data = handler.construct_patent_inventor_edges(chunks)
+        handler = self._patentsview()
+        if self._stream and unwind:
+            data = self._stream_chunks(handler,
+                                       'construct_patent_inventor_edges')
+        else:
+            data = handler.construct_patent_inventor_edges()
         print('Finish loading patent-inventor relationships.')
-        with graph.session() as session:
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:04d}/{:04d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_patent_inventor_relationship(tx, rel)
-                tx.commit()
+        dropped = self._write_relationships(
+                self._connection, data, ('inventor_id', 'patent_id'),
+                ('inventor', 'inventor_id'), ('patent', 'pid'), 'INVENTS',
+                self.create_patent_inventor_relationship, unwind, deduplicated,
+                writers=writers or self._writers, phase='patent_inventor',
+                batch_size=batch_size)
+        if unwind:
+            print('Dropped {} patent-inventor pairs with missing '
+                  'endpoints.'.format(dropped))
 
     def create_patent_inventor_relationship(self, tx, rel):
         """Insert patent-inventor relationships for the select patent.
@@ -395,29 +1109,41 @@ class Neo4jHandler(object):
         tx.run(statement, inventor_id=str(rel['inventor_id']),
                pid=str(rel['patent_id']))
 
-    def create_assignee_location_relationships(self, chunks=50):
+    def create_assignee_location_relationships(self, batch_size=None,
+                                               unwind=True, deduplicated=False,
+                                               writers=None):
         """CREATE assignee-location relationship in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per relationship.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd. Only used when ``unwind`` is set.
+        writers : int
+            Number of sessions writing concurrently, see
+            :class:`PartitionedWriter`, None for the handler default. Only
+            used when ``unwind`` is set.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading patent-inventor relationships.')
-        handler = PatentsViewHandler(self._data)
-        data = handler.construct_assignee_location_edges(chunks)
+        handler = self._patentsview()
+        data = handler.construct_assignee_location_edges()
         print('Finish loading patent-inventor relationships.')
-        with graph.session() as session:
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:04d}/{:04d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_assignee_location_relationship(tx, rel)
-                tx.commit()
+        dropped = self._write_relationships(
+                self._connection, data, ('assignee_id', 'location_id'),
+                ('assignee', 'assignee_id'), ('location', 'location_id'),
+                'LOCATES_AT', self.create_assignee_location_relationship,
+                unwind, deduplicated, writers=writers or self._writers,
+                phase='assignee_location', batch_size=batch_size)
+        if unwind:
+            print('Dropped {} assignee-location pairs with missing '
+                  'endpoints.'.format(dropped))
 
     def create_assignee_location_relationship(self, tx, rel):
         """Insert assignee-location relationship for the select assignee.
@@ -435,29 +1161,45 @@ class Neo4jHandler(object):
         tx.run(statement, location_id=str(rel['location_id']),
                assignee_id=str(rel['assignee_id']))
 
-    def create_inventor_location_relationships(self, chunks=300):
+    def create_inventor_location_relationships(self, batch_size=None,
+                                               unwind=True, deduplicated=False,
+                                               writers=None):
         """CREATE inventor-location relationship in neo4j database.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement. Set to False to fall
+            back to one statement per relationship.
+        deduplicated : bool
+            Input is known to contain no duplicate pairs, so relationships
+            are CREATEd instead of MERGEd. Only used when ``unwind`` is set.
+        writers : int
+            Number of sessions writing concurrently, see
+            :class:`PartitionedWriter`, None for the handler default. Only
+            used when ``unwind`` is set.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading inventor-location relationships.')
-        handler = PatentsViewHandler(self._data)
-        data = handler.construct_inventor_location_edges(chunks)
+        handler = self._patentsview()
+        if self._stream and unwind:
+            data = self._stream_chunks(handler,
+                                       'construct_inventor_location_edges')
+        else:
+            data = handler.construct_inventor_location_edges()
         print('Finish loading inventor-location relationships.')
-        with graph.session() as session:
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:04d}/{:04d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_inventor_location_relationship(tx, rel)
-                tx.commit()
+        dropped = self._write_relationships(
+                self._connection, data, ('inventor_id', 'location_id'),
+                ('inventor', 'inventor_id'), ('location', 'location_id'),
+                'LOCATES_AT', self.create_inventor_location_relationship,
+                unwind, deduplicated, writers=writers or self._writers,
+                phase='inventor_location', batch_size=batch_size)
+        if unwind:
+            print('Dropped {} inventor-location pairs with missing '
+                  'endpoints.'.format(dropped))
 
     def create_inventor_location_relationship(self, tx, rel):
         """Insert inventor-location relationship for the select assignee.
@@ -475,51 +1217,519 @@ class Neo4jHandler(object):
         tx.run(statement, location_id=str(rel['location_id']),
                inventor_id=str(rel['inventor_id']))
 
-    def create_cpc_nodes_and_edges(self, chunks=10000):
+    def _write_batches(self, session, data, write, phase=None,
+                       batch_size=None, batcher=None, committed=None,
+                       offset=0, checkpoint=True):
+        """Write a frame one batch, i.e., one transaction, at a time.
+
+        Each batch runs in a managed write transaction, which is retried on
+        transient errors such as deadlocks with concurrently running phases.
+        Batch sizes adapt to commit latency, see :class:`AdaptiveBatcher`.
+
+        Parameters
+        ----------
+        session : :class:`neo4j.Session`
+            A neo4j session.
+        data : :class:`pandas.DataFrame`
+            Rows to write.
+        write : callable
+            ``write(tx, chunk)``, writes one batch.
+        phase : str
+            Phase name to checkpoint rows under, None to not checkpoint.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        batcher : :class:`AdaptiveBatcher`
+            Batcher of a streamed phase, None to start one.
+        committed : list
+            Committed row ranges of a streamed phase, see
+            :meth:`_pending_batches`.
+        offset : int
+            Row of a streamed phase ``data`` starts at.
+        checkpoint : bool
+            Record committed rows of ``data`` under ``phase``, off for rows
+            the caller checkpoints itself, e.g., by the source rows they
+            were derived from.
+
+        Returns
+        -------
+        list
+            Return values of ``write``, one per transaction.
+
+        """
+
+        batcher = batcher or self._batcher(batch_size)
+        results = []
+        self._start_phase(phase)
+        for start, stop, chunk in self._pending_batches(
+                phase if checkpoint else None, data, batcher, committed,
+                offset):
+            merge = checkpoint and self._write_batch(phase, start, stop)
+            results += batcher.write(
+                    lambda rows: self._transact(session, write, rows, phase,
+                                                merge), chunk)
+            if checkpoint:
+                self._commit_batch(phase, start, stop)
+        self._finish_phase(phase)
+        return results
+
+    def _transact(self, session, write, rows, phase=None, merge=False):
+        """Run one batch in a managed write transaction and record its
+        metrics.
+
+        Time spent in ``write`` but not in running statements, e.g.,
+        converting rows to records, is recorded as transform time, the rest
+        as transaction latency.
+
+        Parameters
+        ----------
+        session : :class:`neo4j.Session`
+            A neo4j session.
+        write : callable
+            ``write(tx, rows)``, writes one batch.
+        rows : list
+            Rows of the batch, a list or a :class:`pandas.DataFrame`.
+        phase : str
+            Phase name to record metrics under, None to not record.
+        merge : bool
+            Run statements in their MERGE form, see :class:`MergeTransaction`,
+            for rows a previous run may have committed.
+
+        Returns
+        -------
+        object
+            Return value of ``write``.
+
+        """
+
+        if merge:
+            create = write
+
+            def write(tx, rows):
+                return create(MergeTransaction(tx), rows)
+
+        if self._metrics is None or phase is None:
+            return execute_write(session, write, rows)
+        timings = {}
+
+        def work(tx):
+            timed = TimedTransaction(tx)
+            start = time.perf_counter()
+            try:
+                return write(timed, rows)
+            finally:
+                timings.update(
+                    transform=time.perf_counter() - start - timed.seconds -
+                    timed.overhead, overhead=timed.overhead,
+                    size=timed.bytes)
+
+        start = time.perf_counter()
+        result = execute_write(session, work)
+        latency = time.perf_counter() - start - timings['transform'] - \
+            timings['overhead']
+        self._metrics.record(phase, len(rows), latency, timings['transform'],
+                             timings['size'])
+        return result
+
+    def _start_phase(self, phase):
+        """Start the metrics clock of ``phase``."""
+        if self._metrics is not None and phase is not None:
+            self._metrics.start(phase)
+
+    def _finish_phase(self, phase):
+        """Report the metrics of ``phase``."""
+        if self._metrics is not None and phase is not None:
+            self._metrics.finish(phase)
+
+    def _batcher(self, batch_size=None):
+        """Create the batcher of one phase.
+
+        Parameters
+        ----------
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        Returns
+        -------
+        :class:`AdaptiveBatcher`
+            Slices frames into batches.
+
+        """
+
+        return AdaptiveBatcher(batch_size or self._batch_size,
+                               target=self._latency)
+
+    def _pending_batches(self, phase, data, batcher, committed=None,
+                         offset=0):
+        """Yield batches of rows not committed yet.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name, None to not checkpoint.
+        data : :class:`pandas.DataFrame`
+            Rows to write.
+        batcher : :class:`AdaptiveBatcher`
+            Slices ``data`` into batches.
+        committed : list
+            Committed row ranges, looked up by :meth:`_committed_rows` if
+            None.
+        offset : int
+            Row ``data`` starts at, when it is a chunk of a streamed phase
+            whose ``committed`` rows count from the start of the stream.
+
+        Yields
+        ------
+        tuple
+            Start and stop row, counted like ``committed``, and the batch.
+
+        """
+
+        if committed is None:
+            committed = self._committed_rows(phase, data)
+        stop = offset + len(data)
+        committed = [[max(first, offset) - offset, min(last, stop) - offset]
+                     for first, last in committed
+                     if first < stop and last > offset]
+        width = len(str(stop))
+        for start, end, chunk in batcher.slices(data, committed):
+            print('[BATCH {0:0{3}d}-{1:0{3}d}/{2:0{3}d}]'.format(
+                offset + start, offset + end, stop, width))
+            yield offset + start, offset + end, chunk
+
+    def _committed_rows(self, phase, data, key=None):
+        """Start ``phase`` in the checkpoint manifest.
+
+        Parameters
+        ----------
+        phase : str
+            Phase name, None to not checkpoint.
+        data : :class:`pandas.DataFrame`
+            Rows of the phase, None if streamed.
+        key : str
+            Identity of streamed rows, see :class:`Stream`.
+
+        Returns
+        -------
+        list
+            [start, stop) ranges of rows already committed.
+
+        """
+
+        if self._checkpoint is None or phase is None:
+            return []
+        return self._checkpoint.begin(phase, data, key)
+
+    def _write_batch(self, phase, start, stop):
+        """Record rows ``start`` to ``stop`` of ``phase`` as pending in the
+        checkpoint manifest, before they are written.
+
+        Returns
+        -------
+        bool
+            Whether the rows may have been committed by a previous run, see
+            :meth:`CheckpointManifest.write`, and are to be MERGEd.
+
+        """
+
+        if self._checkpoint is None or phase is None:
+            return False
+        merge = self._checkpoint.write(phase, start, stop)
+        if merge:
+            print('[CHECKPOINT] Rows {}-{} of {} may be committed, '
+                  'MERGE them.'.format(start, stop, phase))
+        return merge
+
+    def _commit_batch(self, phase, start, stop):
+        """Record rows ``start`` to ``stop`` of ``phase`` in the checkpoint
+        manifest."""
+        if self._checkpoint is not None and phase is not None:
+            self._checkpoint.commit(phase, start, stop)
+
+    def _write_relationships(self, connection, data, columns, source, target,
+                             rel_type, create_one, unwind=True,
+                             deduplicated=False, writers=1, strip=False,
+                             phase=None, batch_size=None, batcher=None,
+                             committed=None, offset=0):
+        """Write relationships in batches.
+
+        Parameters
+        ----------
+        connection : :class:`ConnectionManager`
+            Hands out sessions.
+        data : :class:`pandas.DataFrame`
+            Edge table, or a :class:`Stream` of its chunks, see
+            :meth:`_stream_relationships`.
+        columns : tuple
+            Columns holding the start and end node keys.
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+        create_one : callable
+            ``create_one(tx, rel)``, the per-row fallback.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement.
+        deduplicated : bool
+            CREATE relationships instead of MERGE them.
+        writers : int
+            Number of sessions writing concurrently. Only used when
+            ``unwind`` is set.
+        strip : bool
+            Strip surrounding whitespace from keys.
+        phase : str
+            Phase name to checkpoint rows under, None to not checkpoint.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        batcher : :class:`AdaptiveBatcher`
+            Batcher of a streamed phase, None to start one.
+        committed : list
+            Committed row ranges of a streamed phase, see
+            :meth:`_pending_batches`.
+        offset : int
+            Row of a streamed phase ``data`` starts at.
+
+        Returns
+        -------
+        int
+            Number of pairs dropped because an endpoint was not found.
+
+        """
+
+        if isinstance(data, Stream):
+            return self._stream_relationships(
+                    connection, data, columns, source, target, rel_type,
+                    deduplicated, writers, strip, phase, batch_size)
+
+        def write_rows(tx, rows):
+            return self.create_relationship_batch(
+                    tx, rows, source, target, rel_type, create=deduplicated)
+
+        def merge_rows(tx, rows):
+            return write_rows(MergeTransaction(tx), rows)
+
+        def write(tx, chunk):
+            if not unwind:
+                for index, rel in chunk.iterrows():
+                    create_one(tx, rel)
+                return 0
+            return write_rows(tx, self._pair_records(
+                chunk, columns[0], columns[1], strip=strip))
+
+        if not unwind or writers <= 1:
+            with self._connection.session() as session:
+                return sum(self._write_batches(session, data, write, phase,
+                                               batch_size, batcher,
+                                               committed, offset))
+        dropped = 0
+        batcher = batcher or self._batcher(batch_size)
+        self._start_phase(phase)
+        # the writer splits only the cell a server rejects, the batch as a
+        # whole is never written again
+        with PartitionedWriter(
+                connection, writers, same_space=source == target,
+                transact=lambda session, write, rows: self._transact(
+                    session, write, rows, phase),
+                batcher=batcher) as writer:
+            for start, stop, chunk in self._pending_batches(
+                    phase, data, batcher, committed, offset):
+                pairs = self._pair_frame(chunk, columns[0], columns[1],
+                                         strip=strip)
+                write = merge_rows if self._write_batch(
+                    phase, start, stop) else write_rows
+                began = time.time()
+                dropped += writer.write(pairs, write)
+                batcher.record(len(pairs), time.time() - began)
+                self._commit_batch(phase, start, stop)
+            writer.report()
+        self._finish_phase(phase)
+        return dropped
+
+    def _stream_chunks(self, handler, construct):
+        """Stream the table of a builder, reading chunks ahead on a worker
+        thread.
+
+        Parameters
+        ----------
+        handler : :class:`PatentsViewHandler`
+            Reads the table.
+        construct : str
+            Builder of :attr:`STREAMS`. The cache key of its table identifies
+            the stream in checkpoints, see :meth:`FrameCache.key`.
+
+        Returns
+        -------
+        :class:`Stream`
+            Chunks of :attr:`_chunksize` rows, as the builder would return
+            them as a whole.
+
+        """
+
+        table, iterate = self.STREAMS[construct]
+        key = handler.cache.key(table) if self._checkpoint else None
+        return Stream(prefetch(getattr(handler, iterate)(self._chunksize)),
+                      key)
+
+    def _stream_relationships(self, connection, data, columns, source,
+                              target, rel_type, deduplicated=False, writers=1,
+                              strip=False, phase=None, batch_size=None):
+        """Write relationships chunk by chunk, as they are read.
+
+        Only :data:`QUEUE_SIZE` chunks are held besides the one written, so
+        memory does not grow with the table. Rows are checkpointed by their
+        position in the whole stream, and batch sizes carry over from one
+        chunk to the next.
+
+        Parameters
+        ----------
+        data : :class:`Stream`
+            Chunks of the edge table.
+
+        Other parameters are those of :meth:`_write_relationships`.
+
+        Returns
+        -------
+        int
+            Number of pairs dropped because an endpoint was not found.
+
+        """
+
+        committed = self._committed_rows(phase, None, data.key)
+        batcher = self._batcher(batch_size)
+        dropped = offset = 0
+        self._start_phase(phase)
+        for chunk in data:
+            dropped += self._write_relationships(
+                    connection, chunk, columns, source, target, rel_type,
+                    None, True, deduplicated, writers, strip, phase,
+                    batcher=batcher, committed=committed, offset=offset)
+            offset += len(chunk)
+        self._finish_phase(phase)
+        return dropped
+
+    def create_relationship_batch(self, tx, rows, source, target, rel_type,
+                                  create=False):
+        """Insert a batch of relationships with a single statement.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        rows : list
+            Key pairs, see :meth:`_pair_records`.
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+        create : bool
+            CREATE relationships instead of MERGE them. Only safe when
+            ``rows`` holds no duplicates and the relationships do not exist
+            yet.
+
+        Returns
+        -------
+        int
+            Number of pairs dropped because an endpoint was not found.
+
+        """
+
+        st = relationship_batch(source, target, rel_type, create=create)
+        matched = tx.run(st, rows=rows).single()['matched']
+        return len(rows) - matched
+
+    def _pair_records(self, chunk, source, target, strip=False):
+        """Convert an edge chunk to (source, target) key pairs.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Edge chunk.
+        source : str
+            Column holding the start node key.
+        target : str
+            Column holding the end node key.
+        strip : bool
+            Strip surrounding whitespace from keys.
+
+        Returns
+        -------
+        list
+            Key pairs as ``{'source': ..., 'target': ...}``.
+
+        """
+
+        pairs = self._pair_frame(chunk, source, target, strip=strip)
+        return [{'source': a, 'target': b}
+                for a, b in zip(pairs['source'], pairs['target'])]
+
+    def _pair_frame(self, chunk, source, target, strip=False):
+        """Select the start and end node keys of an edge chunk.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Edge chunk.
+        source : str
+            Column holding the start node key.
+        target : str
+            Column holding the end node key.
+        strip : bool
+            Strip surrounding whitespace from keys.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            Keys in columns 'source' and 'target'.
+
+        """
+
+        sources = chunk[source].astype(str)
+        targets = chunk[target].astype(str)
+        if strip:
+            sources, targets = sources.str.strip(), targets.str.strip()
+        return pd.DataFrame({'source': sources.values,
+                             'target': targets.values})
+
+    def create_cpc_nodes_and_edges(self, batch_size=None, unwind=True):
         """Create cpc nodes and edges.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement per level. Set to
+            False to fall back to one statement per patent and level, which
+            always writes the full schema.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading cpc nodes.')
-        handler = PatentsViewHandler(self._data)
-        nodes, data = handler.construct_cpc_nodes(chunks)
+        handler = self._patentsview()
+        if self._stream and unwind:
+            dropped = self._stream_classification(
+                    self._stream_chunks(handler, 'construct_cpc_nodes'),
+                    'cpc', batch_size)
+            print('Dropped {} cpc classifications with missing '
+                  'endpoints.'.format(dropped))
+            return
+        nodes, data = handler.construct_cpc_nodes()
         print('Finish loading cpc nodes.')
-        with graph.session() as session:
+        with self._connection.session() as session:
             self.create_cpc_nodes(session, nodes)
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:05d}/{:05d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_cpc_edge(tx, rel)
-                tx.commit()
+            dropped = self._write_classification(
+                    session, data, 'cpc', self.create_cpc_edge, unwind,
+                    batch_size)
+        if unwind:
+            print('Dropped {} cpc classifications with missing '
+                  'endpoints.'.format(dropped))
 
     def create_cpc_nodes(self, session, nodes):
         """Create cpc nodes."""
-
-        session.run(('CREATE CONSTRAINT ON (c:cpc_section) '
-                    'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:cpc_subsection) '
-                     'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:cpc_group) '
-                     'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:cpc_subgroup) '
-                     'ASSERT c.id IS UNIQUE'))
-        items = {0: 'cpc_section', 1: 'cpc_subsection', 2: 'cpc_group',
-                 3: 'cpc_subgroup'}
-        for k, v in items.items():
-            tx = session.begin_transaction()
-            for node in nodes[k]:
-                node_type = 'MERGE (c:{} '.format(str(v))
-                st = (node_type + '{id: $id})')
-                tx.run(st, id=str(node))
-            tx.commit()
+        self._create_codes(session, self.LEVELS['cpc'], nodes)
 
     def create_cpc_edge(self, tx, rel):
         """Insert patent-cpc relationship.
@@ -544,46 +1754,36 @@ class Neo4jHandler(object):
               'MERGE (p)-[:BELONGS_TO]->(c)')
         tx.run(st, pid=str(rel['patent_id']), id=str(rel['cpc_subgroup']))
 
-    def create_uspc_nodes_and_edges(self, chunks=10000):
+    def create_uspc_nodes_and_edges(self, batch_size=None, unwind=True):
         """Create uspc nodes and edges.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement per level. Set to
+            False to fall back to one statement per patent and level, which
+            always writes the full schema.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading uspc nodes.')
-        handler = PatentsViewHandler(self._data)
-        nodes, data = handler.construct_uspc_nodes(chunks)
+        handler = self._patentsview()
+        nodes, data = handler.construct_uspc_nodes()
         print('Finish loading uspc nodes.')
-        with graph.session() as session:
+        with self._connection.session() as session:
             self.create_uspc_nodes(session, nodes)
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:05d}/{:05d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_uspc_edge(tx, rel)
-                tx.commit()
+            dropped = self._write_classification(
+                    session, data, 'uspc', self.create_uspc_edge, unwind,
+                    batch_size)
+        if unwind:
+            print('Dropped {} uspc classifications with missing '
+                  'endpoints.'.format(dropped))
 
     def create_uspc_nodes(self, session, nodes):
         """Create uspc nodes."""
-
-        session.run(('CREATE CONSTRAINT ON (c:uspc_mainclass) '
-                    'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:uspc_subclass) '
-                     'ASSERT c.id IS UNIQUE'))
-        items = {0: 'uspc_mainclass', 1: 'uspc_subclass'}
-        for k, v in items.items():
-            tx = session.begin_transaction()
-            for node in nodes[k]:
-                node_type = 'MERGE (c:{} '.format(str(v))
-                st = (node_type + '{id: $id})')
-                tx.run(st, id=str(node))
-            tx.commit()
+        self._create_codes(session, self.LEVELS['uspc'], nodes)
 
     def create_uspc_edge(self, tx, rel):
         """Insert patent-cpc relationship.
@@ -602,53 +1802,36 @@ class Neo4jHandler(object):
               'MERGE (p)-[:BELONGS_TO]->(c)')
         tx.run(st, pid=str(rel['patent_id']), id=str(rel['uspc_subclass']))
 
-    def create_ipcr_nodes_and_edges(self, chunks=10000):
+    def create_ipcr_nodes_and_edges(self, batch_size=None, unwind=True):
         """Create ipcr nodes and edges.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement per level. Set to
+            False to fall back to one statement per patent and level, which
+            always writes the full schema.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading ipcr nodes.')
-        handler = PatentsViewHandler(self._data)
-        nodes, data = handler.construct_ipcr_nodes(chunks)
+        handler = self._patentsview()
+        nodes, data = handler.construct_ipcr_nodes()
         print('Finish loading ipcr nodes.')
-        with graph.session() as session:
+        with self._connection.session() as session:
             self.create_ipcr_nodes(session, nodes)
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:05d}/{:05d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_ipcr_edge(tx, rel)
-                tx.commit()
+            dropped = self._write_classification(
+                    session, data, 'ipcr', self.create_ipcr_edge, unwind,
+                    batch_size)
+        if unwind:
+            print('Dropped {} ipcr classifications with missing '
+                  'endpoints.'.format(dropped))
 
     def create_ipcr_nodes(self, session, nodes):
-        """Create uspc nodes."""
-
-        session.run(('CREATE CONSTRAINT ON (c:ipcr_section) '
-                    'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:ipcr_class) '
-                     'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:ipcr_subclass) '
-                     'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:ipcr_group) '
-                     'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:ipcr_subgroup) '
-                     'ASSERT c.id IS UNIQUE'))
-        items = {0: 'ipcr_section', 1: 'ipcr_class', 2: 'ipcr_subclass',
-                 3: 'ipcr_group', 4: 'ipcr_subgroup'}
-        for k, v in items.items():
-            tx = session.begin_transaction()
-            for node in nodes[k]:
-                node_type = 'MERGE (c:{} '.format(str(v))
-                st = (node_type + '{id: $id})')
-                tx.run(st, id=str(node))
-            tx.commit()
+        """Create ipcr nodes."""
+        self._create_codes(session, self.LEVELS['ipcr'], nodes)
 
     def create_ipcr_edge(self, tx, rel):
         """Insert patent-cpc relationship.
@@ -676,46 +1859,36 @@ class Neo4jHandler(object):
               '(c:ipcr_subgroup {id: $id}) MERGE (p)-[:BELONGS_TO]->(c)')
         tx.run(st, pid=str(rel['patent_id']), id=str(rel['ipcr_subgroup']))
 
-    def create_nber_nodes_and_edges(self, chunks=10000):
+    def create_nber_nodes_and_edges(self, batch_size=None, unwind=True):
         """Create nber nodes and edges.
 
         Parameters
         ----------
-        chunks : int
-            Number of batches to process.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        unwind : bool
+            Send each batch as one ``UNWIND`` statement per level. Set to
+            False to fall back to one statement per patent and level, which
+            always writes the full schema.
 
         """
 
-        graph = GraphDatabase.driver('bolt://localhost:7687',
-                                     auth=(self._username, self._password))
         print('Loading nber nodes.')
-        handler = PatentsViewHandler(self._data)
-        nodes, data = handler.construct_nber_nodes(chunks)
+        handler = self._patentsview()
+        nodes, data = handler.construct_nber_nodes()
         print('Finish loading nber nodes.')
-        with graph.session() as session:
+        with self._connection.session() as session:
             self.create_nber_nodes(session, nodes)
-            for ix, chunk in enumerate(data, start=1):  # batch insert
-                print('[BATCH {:05d}/{:05d}]'.format(ix, chunks))
-                tx = session.begin_transaction()
-                for index, rel in chunk.iterrows():
-                    self.create_nber_edge(tx, rel)
-                tx.commit()
+            dropped = self._write_classification(
+                    session, data, 'nber', self.create_nber_edge, unwind,
+                    batch_size)
+        if unwind:
+            print('Dropped {} nber classifications with missing '
+                  'endpoints.'.format(dropped))
 
     def create_nber_nodes(self, session, nodes):
-        """Create uspc nodes."""
-
-        session.run(('CREATE CONSTRAINT ON (c:nber_category) '
-                    'ASSERT c.id IS UNIQUE'))
-        session.run(('CREATE CONSTRAINT ON (c:nber_subcategory) '
-                     'ASSERT c.id IS UNIQUE'))
-        items = {0: 'nber_category', 1: 'nber_subcategory'}
-        for k, v in items.items():
-            tx = session.begin_transaction()
-            for node in nodes[k]:
-                node_type = 'MERGE (c:{} '.format(str(v))
-                st = (node_type + '{id: $id})')
-                tx.run(st, id=str(node))
-            tx.commit()
+        """Create nber nodes."""
+        self._create_codes(session, self.LEVELS['nber'], nodes)
 
     def create_nber_edge(self, tx, rel):
         """Insert patent-cpc relationship.
@@ -733,3 +1906,336 @@ class Neo4jHandler(object):
         st = ('MATCH (p:patent {pid: $pid}), '
               '(c:nber_subcategory {id: $id}) MERGE (p)-[:BELONGS_TO]->(c)')
         tx.run(st, pid=str(rel['patent_id']), id=str(rel['nber_subcategory']))
+
+    def _create_codes(self, session, levels, nodes):
+        """Create classification code nodes, one phase of batches per level,
+        see :meth:`_merge_codes`.
+
+        Parameters
+        ----------
+        session : :class:`neo4j.Session`
+            A neo4j session.
+        levels : list
+            Classification levels, i.e., node labels.
+        nodes : tuple
+            Set of codes of each level.
+
+        """
+
+        for level, codes in zip(levels, nodes):
+            self._merge_codes(session, level,
+                              sorted(str(code) for code in codes))
+
+    def _merge_codes(self, session, level, codes, phase=None):
+        """MERGE classification code nodes of one level in batches, see
+        :meth:`_write_batches`.
+
+        Parameters
+        ----------
+        session : :class:`neo4j.Session`
+            A neo4j session.
+        level : str
+            Classification level, i.e., node label.
+        codes : list
+            Code ids.
+        phase : str
+            Phase name to checkpoint codes under, None to not checkpoint.
+
+        """
+
+        def write(tx, chunk):
+            self.merge_code_batch(tx, level, chunk['id'].tolist())
+
+        self._write_batches(session, pd.DataFrame({'id': codes}), write,
+                            phase)
+
+    def merge_code_batch(self, tx, label, codes):
+        """MERGE a batch of classification code nodes.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        label : str
+            Classification level.
+        codes : list
+            Code ids.
+
+        """
+
+        st = 'UNWIND $codes AS code MERGE (c:{} {{id: code}})'.format(label)
+        tx.run(st, codes=codes)
+
+    def _write_classification(self, session, data, scheme, create_one,
+                              unwind=True, batch_size=None):
+        """Write patent BELONGS_TO relationships of a classification.
+
+        In the compact schema, see :meth:`_edge_levels`, SUBCLASS_OF
+        relationships between codes are written first.
+
+        Parameters
+        ----------
+        session : :class:`neo4j.Session`
+            A neo4j session.
+        data : :class:`pandas.DataFrame`
+            Patent classifications, one column per level.
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber', also the phase name.
+        create_one : callable
+            ``create_one(tx, rel)``, the per-row fallback.
+        unwind : bool
+            Write deduplicated triples, see :func:`classification_triples`,
+            with one ``UNWIND`` statement per level and batch.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        Returns
+        -------
+        int
+            Number of triples dropped because an endpoint was not found.
+
+        """
+
+        if not unwind:
+            def write(tx, chunk):
+                for index, rel in chunk.iterrows():
+                    create_one(tx, rel)
+
+            self._write_batches(session, data, write, scheme, batch_size)
+            return 0
+        levels = self._edge_levels(scheme)
+        if levels != self.LEVELS[scheme]:
+            self._write_hierarchy(data, scheme, batch_size)
+        return sum(self._write_batches(
+            session, classification_triples(data, levels),
+            self.create_classification_batch, scheme, batch_size))
+
+    def _stream_classification(self, data, scheme, batch_size=None):
+        """Write codes and BELONGS_TO relationships of a classification
+        chunk by chunk, as they are read.
+
+        The codes of each chunk, and in the compact schema their SUBCLASS_OF
+        relationships, are MERGEd before its triples, see
+        :func:`classification_triples`. As triples are deduplicated per
+        chunk, their positions depend on where chunks fall, e.g., on
+        ``--chunksize`` or whether the cached frame is read, so the source
+        rows of a chunk are checkpointed instead, once all its triples are
+        committed. A resumed run skips committed source rows, whatever its
+        chunks, and MERGEs again the triples of a chunk cut short.
+
+        Parameters
+        ----------
+        data : :class:`Stream`
+            (codes of each level, patent classifications) of each chunk, e.g.,
+            of :meth:`PatentsViewHandler.iter_cpc_nodes`.
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber', also the phase name.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+
+        Returns
+        -------
+        int
+            Number of triples dropped because an endpoint was not found.
+
+        """
+
+        levels = self._edge_levels(scheme)
+        key = data.key and '{}:{}:rows'.format(data.key, ','.join(levels))
+        committed = self._committed_rows(scheme, None, key)
+        batcher = self._batcher(batch_size)
+        dropped = offset = 0
+        self._start_phase(scheme)
+        with self._connection.session() as session:
+            for nodes, chunk in data:
+                start, offset = offset, offset + len(chunk)
+                chunk = self._uncommitted_rows(chunk, committed, start)
+                if not len(chunk):
+                    continue
+                self._create_codes(session, self.LEVELS[scheme], nodes)
+                if levels != self.LEVELS[scheme]:
+                    self._write_hierarchy(chunk, scheme, batch_size,
+                                          checkpoint=False)
+                dropped += sum(self._write_batches(
+                    session, classification_triples(chunk, levels),
+                    self.create_classification_batch, scheme,
+                    batcher=batcher, committed=[], checkpoint=False))
+                self._commit_batch(scheme, start, offset)
+        self._finish_phase(scheme)
+        return dropped
+
+    @staticmethod
+    def _uncommitted_rows(chunk, committed, start):
+        """Rows of a streamed chunk not committed yet.
+
+        Parameters
+        ----------
+        chunk : :class:`pandas.DataFrame`
+            Chunk of a stream.
+        committed : list
+            Committed [start, stop) row ranges of the whole stream.
+        start : int
+            Row of the stream ``chunk`` starts at.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            ``chunk`` without its committed rows, ``chunk`` itself if none
+            are committed.
+
+        """
+
+        stop = start + len(chunk)
+        pending = [range(max(first, start) - start, min(last, stop) - start)
+                   for first, last in gaps(committed, stop) if last > start]
+        if len(pending) == 1 and len(pending[0]) == len(chunk):
+            return chunk
+        if not pending:
+            return chunk.iloc[:0]
+        return chunk.iloc[np.concatenate(pending)]
+
+    def _edge_levels(self, scheme):
+        """Levels patents are linked to.
+
+        Parameters
+        ----------
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber'.
+
+        Returns
+        -------
+        list
+            The most specific level in the compact schema if codes of the
+            scheme have a single parent, see :attr:`HIERARCHICAL`, otherwise
+            all levels.
+
+        """
+
+        if self._compact and scheme in HIERARCHICAL:
+            return self.LEVELS[scheme][-1:]
+        return self.LEVELS[scheme]
+
+    def _write_hierarchy(self, data, scheme, batch_size=None,
+                         checkpoint=True):
+        """MERGE SUBCLASS_OF relationships from each code to its parent.
+
+        Parameters
+        ----------
+        data : :class:`pandas.DataFrame`
+            Patent classifications, one column per level.
+        scheme : str
+            One of 'cpc', 'uspc' and 'nber'.
+        batch_size : int
+            Rows per batch to start with, None for the handler default.
+        checkpoint : bool
+            Checkpoint the pairs of each level as a phase, not for the
+            chunks of a streamed classification, whose pairs repeat.
+
+        """
+
+        for child, parent, pairs in code_hierarchy(data, self.LEVELS[scheme]):
+            print('Linking {} to {}.'.format(child, parent))
+            self._write_relationships(
+                    self._connection, pairs, (child, parent), (child, 'id'),
+                    (parent, 'id'), 'SUBCLASS_OF', None,
+                    phase='subclass_of_{}'.format(child) if checkpoint
+                    else None, batch_size=batch_size)
+
+    def create_classification_batch(self, tx, triples):
+        """MERGE a batch of BELONGS_TO relationships, one statement per level.
+
+        Parameters
+        ----------
+        tx : :class:`neo4j.Database.session.transaction`
+            A neo4j transaction.
+        triples : :class:`pandas.DataFrame`
+            Triples, see :func:`classification_triples`.
+
+        Returns
+        -------
+        int
+            Number of triples dropped because an endpoint was not found.
+
+        """
+
+        dropped = 0
+        for level, group in triples.groupby('level', observed=True,
+                                            sort=False):
+            dropped += self.create_relationship_batch(
+                    tx, self._pair_records(group, 'patent_id', 'code'),
+                    ('patent', 'pid'), (level, 'id'), 'BELONGS_TO')
+        return dropped
+
+    def get_patent_classes(self, pid, scheme, level):
+        """Codes of one classification level a patent belongs to, in either
+        schema.
+
+        Parameters
+        ----------
+        pid : str
+            Patent id.
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber'.
+        level : str
+            Level to roll up to, e.g., 'cpc_subsection'.
+
+        Returns
+        -------
+        list
+            Sorted code ids.
+
+        """
+
+        st = classes_query(self.LEVELS[scheme], level,
+                           self._edge_levels(scheme) != self.LEVELS[scheme])
+        with self._connection.session() as session:
+            return [record['id'] for record in session.run(st, pid=str(pid))]
+
+    def get_classified_patents(self, code, scheme, level):
+        """Patents under a code, including those classified under its
+        descendants.
+
+        Parameters
+        ----------
+        code : str
+            Code id.
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber'.
+        level : str
+            Level of the code.
+
+        Returns
+        -------
+        list
+            Sorted patent ids.
+
+        """
+
+        st = members_query(self.LEVELS[scheme], level,
+                           self._edge_levels(scheme) != self.LEVELS[scheme])
+        with self._connection.session() as session:
+            return [record['pid']
+                    for record in session.run(st, code=str(code))]
+
+    def get_class_counts(self, scheme, level):
+        """Number of patents under each code of a level.
+
+        Parameters
+        ----------
+        scheme : str
+            One of 'cpc', 'uspc', 'ipcr' and 'nber'.
+        level : str
+            Level to roll up to.
+
+        Returns
+        -------
+        dict
+            Code id to number of distinct patents.
+
+        """
+
+        st = counts_query(self.LEVELS[scheme], level,
+                          self._edge_levels(scheme) != self.LEVELS[scheme])
+        with self._connection.session() as session:
+            return {record['id']: record['patents']
+                    for record in session.run(st)}
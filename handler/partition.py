@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import concurrent.futures
+import time
+
+import pandas as pd
+
+from .connection import execute_write
+
+
+def diagonal_rounds(partitions):
+    """Schedule cells of a grid whose rows and columns are disjoint node sets,
+    e.g., inventor x patent.
+
+    In round ``r`` task ``i`` writes cell ``(i, (i + r) % partitions)``, so no
+    two tasks of a round share a start or an end partition.
+
+    Parameters
+    ----------
+    partitions : int
+        Number of partitions per endpoint.
+
+    Returns
+    -------
+    list
+        Rounds, each a list of tasks, each a list of (start, end) cells.
+
+    """
+
+    return [[[(i, (i + r) % partitions)] for i in range(partitions)]
+            for r in range(partitions)]
+
+
+def pairing_rounds(partitions):
+    """Schedule cells of a grid whose rows and columns are the same node set,
+    e.g., patent x patent.
+
+    Partitions are paired round robin, the task of pair ``(a, b)`` writes
+    cells ``(a, b)`` and ``(b, a)``, which touch partitions ``a`` and ``b``
+    only. A last round writes the diagonal cells two at a time.
+
+    Parameters
+    ----------
+    partitions : int
+        Number of partitions, must be even.
+
+    Returns
+    -------
+    list
+        Rounds, each a list of tasks, each a list of (start, end) cells.
+
+    """
+
+    if partitions % 2:
+        raise ValueError('Number of partitions must be even.')
+    players = list(range(partitions))
+    rounds = []
+    for _ in range(partitions - 1):
+        pairs = zip(players[:partitions // 2], reversed(players))
+        rounds.append([[(a, b), (b, a)] for a, b in pairs])
+        players = [players[0], players[-1]] + players[1:-1]
+    rounds.append([[(a, a), (a + 1, a + 1)]
+                   for a in range(0, partitions, 2)])
+    return rounds
+
+
+class PartitionedWriter(object):
+    """Write relationship batches on several sessions without lock contention.
+
+    Key pairs are assigned to cells of a grid by hashing their start and end
+    keys. Cells are written round by round, and the cells written at the
+    same time never share an endpoint partition, so concurrent transactions
+    never lock the same node.
+
+    Parameters
+    ----------
+    connection : :class:`ConnectionManager`
+        Hands out sessions on a shared driver.
+    writers : int
+        Number of sessions writing at the same time.
+    same_space : bool
+        Start and end nodes come from the same key space, e.g., CITES.
+    transact : callable
+        ``transact(session, write, rows)``, runs one transaction, e.g., to
+        record its metrics. None to call :func:`execute_write`.
+    batcher : :class:`AdaptiveBatcher`
+        Splits a cell the server rejects as too large, None to not split.
+        Only the rejected cell is written again, cells committed before are
+        not.
+
+    Attributes
+    ----------
+    _sessions : list
+        One session per writer.
+    _pool : :class:`concurrent.futures.ThreadPoolExecutor`
+        One thread per writer.
+    _partitions : int
+        Number of partitions per endpoint.
+    _rounds : list
+        Write schedule, see :func:`diagonal_rounds` and
+        :func:`pairing_rounds`.
+    _stats : dict
+        Writer index to counts of rows, dropped rows, transactions and
+        seconds spent writing.
+    _transact : callable
+        Runs one transaction.
+    _batcher : :class:`AdaptiveBatcher`
+        Splits rejected cells, None to not split.
+
+    """
+
+    def __init__(self, connection, writers, same_space=False,
+                 transact=None, batcher=None):
+        super(PartitionedWriter, self).__init__()
+        self._sessions = [connection.session() for _ in range(writers)]
+        self._pool = concurrent.futures.ThreadPoolExecutor(writers)
+        if same_space:
+            self._partitions = 2 * writers
+            self._rounds = pairing_rounds(self._partitions)
+        else:
+            self._partitions = writers
+            self._rounds = diagonal_rounds(self._partitions)
+        self._stats = collections.defaultdict(collections.Counter)
+        self._transact = transact or (
+                lambda session, write, rows: execute_write(session, write,
+                                                           rows))
+        self._batcher = batcher
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close all sessions."""
+        self._pool.shutdown()
+        for session in self._sessions:
+            session.close()
+
+    def write(self, pairs, write):
+        """Write one batch of key pairs.
+
+        Parameters
+        ----------
+        pairs : :class:`pandas.DataFrame`
+            Key pairs in columns 'source' and 'target'.
+        write : callable
+            ``write(tx, rows)``, writes a list of key pair records and returns
+            the number of pairs dropped.
+
+        Returns
+        -------
+        int
+            Number of pairs dropped.
+
+        """
+
+        cells = self._cells(pairs)
+        dropped = 0
+        for tasks in self._rounds:  # one task per writer
+            futures = [self._pool.submit(self._write_task, ix,
+                                         [cells[cell] for cell in task
+                                          if cell in cells], write)
+                       for ix, task in enumerate(tasks)]
+            dropped += sum(future.result() for future in futures)
+        return dropped
+
+    def report(self):
+        """Print per writer throughput."""
+        for ix in sorted(self._stats):
+            stats = self._stats[ix]
+            seconds = stats['seconds'] or float('nan')
+            print('[WRITER {:02d}] {} rows, {} dropped, {} tx in {:.1f}s, '
+                  '{:.0f} rows/s'.format(ix, stats['rows'], stats['dropped'],
+                                         stats['tx'], stats['seconds'],
+                                         stats['rows'] / seconds))
+
+    def stats(self):
+        """Per writer counts of rows, dropped rows, transactions and seconds.
+
+        Returns
+        -------
+        dict
+            Writer index to :class:`collections.Counter`.
+
+        """
+
+        return dict(self._stats)
+
+    def _cells(self, pairs):
+        """Group key pairs by (start partition, end partition)."""
+        start = pd.util.hash_pandas_object(pairs['source'], index=False)
+        end = pd.util.hash_pandas_object(pairs['target'], index=False)
+        keys = [(start % self._partitions).values,
+                (end % self._partitions).values]
+        return {(int(a), int(b)): group[['source', 'target']]
+                for (a, b), group in pairs.groupby(keys)}
+
+    def _write_task(self, ix, groups, write):
+        """Write the cells of one task on session ``ix``."""
+        dropped = 0
+        session = self._sessions[ix]
+
+        def transact(rows):
+            return self._transact(session, write, rows)
+
+        for group in groups:
+            start = time.time()
+            rows = group.to_dict('records')
+            if self._batcher is None:
+                results = [transact(rows)]
+            else:  # a rejected cell rolled back, split only that one
+                results = self._batcher.write(transact, rows, record=False)
+            dropped += sum(results)
+            stats = self._stats[ix]
+            stats['seconds'] += time.time() - start
+            stats['rows'] += len(rows)
+            stats['tx'] += len(results)
+        self._stats[ix]['dropped'] += dropped
+        return dropped
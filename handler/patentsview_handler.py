@@ -2,30 +2,609 @@
 
 
 import os
-import collections
 
 import pandas as pd
 import numpy as np
 
+from .cache import FrameCache
+from .tables import (READ_OPTIONS, convert_table, find_table, open_table,
+                     parse_table)
+from .vocabulary import Vocabulary
+
+
+# classification schemes whose codes are unique across the whole scheme, so
+# every code has exactly one parent, e.g., cpc subgroup A01B1/00 lies under
+# group A01B only, whereas ipcr main group 1 lies under every subclass
+HIERARCHICAL = ('cpc', 'uspc', 'nber')
+
+
+def _vocabulary(frame, levels):
+    """Distinct codes of each classification level.
+
+    Parameters
+    ----------
+    frame : :class:`pandas.DataFrame`
+        Patent classifications, one column per level.
+    levels : list
+        Level columns.
+
+    Returns
+    -------
+    tuple
+        One set of code strings per level.
+
+    """
+
+    return tuple(set(frame[level].drop_duplicates().astype(str).tolist())
+                 for level in levels)
+
+
+def code_hierarchy(frame, levels):
+    """Distinct (child, parent) code pairs of consecutive levels.
+
+    Parameters
+    ----------
+    frame : :class:`pandas.DataFrame`
+        Patent classifications, one column per level.
+    levels : list
+        Level columns, from the most general to the most specific.
+
+    Returns
+    -------
+    list
+        (child level, parent level, :class:`pandas.DataFrame` of code strings
+        in columns child level and parent level), one per pair of levels.
+
+    """
+
+    hierarchy = []
+    for parent, child in zip(levels[:-1], levels[1:]):
+        pairs = frame[[child, parent]].drop_duplicates().astype(str)
+        hierarchy.append((child, parent, pairs.reset_index(drop=True)))
+    return hierarchy
+
+
+def _sum_counts(chunks, vocabulary, columns):
+    """Sum counts per patent of chunks into integer arrays.
+
+    Patent ids are mapped to their codes in ``vocabulary``, and the counts
+    of each chunk added at those positions of one int32 array per column,
+    so each chunk costs its own patents rather than all patents counted.
+
+    Parameters
+    ----------
+    chunks : iterable
+        :class:`pandas.Series` or :class:`pandas.DataFrame` of counts of
+        each chunk, indexed by patent.
+    vocabulary : :class:`Vocabulary`
+        Codes of patent ids, e.g., shared with the frames of the handler.
+    columns : list
+        Names of the counts, one per column of the chunks.
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        Summed counts in ``columns``, indexed by patent id, of the patents
+        found in any chunk, in the order of their codes.
+
+    """
+
+    totals = np.zeros((len(columns), 1024), dtype=np.int32)
+    found = np.zeros(1024, dtype=bool)
+    for counts in chunks:
+        codes = vocabulary.codes(counts.index)
+        values = counts.to_numpy().reshape(len(counts), len(columns))
+        valid = codes >= 0
+        codes, values = codes[valid], values[valid]
+        if len(vocabulary) > len(found):  # grow by doubling
+            size = max(len(vocabulary), 2 * len(found))
+            totals = np.pad(totals, ((0, 0), (0, size - len(found))))
+            found = np.pad(found, (0, size - len(found)))
+        for row in range(len(columns)):
+            np.add.at(totals[row], codes, values[:, row])
+        found[codes] = True
+    positions = np.flatnonzero(found)
+    return pd.DataFrame(dict(zip(columns, totals[:, positions])),
+                        index=pd.Index(vocabulary.categories.take(positions),
+                                       dtype=object))
+
+
+def _rechunk(chunks, size):
+    """Cut or join consecutive frames into frames of ``size`` rows, the
+    last one shorter.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Frames in order, e.g., the ranges of :func:`parse_table`.
+    size : int
+        Rows per frame.
+
+    Yields
+    ------
+    :class:`pandas.DataFrame`
+        Consecutive rows of ``chunks``.
+
+    """
+
+    pending, rows = [], 0
+    for chunk in chunks:
+        while rows + len(chunk) >= size:
+            cut = size - rows
+            pending.append(chunk.iloc[:cut])
+            yield pd.concat(pending) if len(pending) > 1 else pending[0]
+            chunk, pending, rows = chunk.iloc[cut:], [], 0
+        if len(chunk):
+            pending.append(chunk)
+            rows += len(chunk)
+    if pending:
+        yield pd.concat(pending) if len(pending) > 1 else pending[0]
+
+
+def _count_claims(frame):
+    """Count the dependent and independent claims of each patent in a chunk
+    of table claim, whose claims must have patent_id and dependent."""
+    frame = frame.dropna(axis='index', how='any')
+    independent = (frame['dependent'] == '-1').astype(np.int64)
+    counts = independent.groupby(frame['patent_id']).agg(['size', 'sum'])
+    return pd.DataFrame({'dependent': counts['size'] - counts['sum'],
+                         'independent': counts['sum']})
+
+
+def _count_records(frame):
+    """Count the records of each patent in a chunk with all fields."""
+    return frame.dropna(axis='index', how='any').groupby('patent_id').size()
+
+
+def _clean_pairs(frame):
+    """Keep rows of a crosswalk or edge table with both keys."""
+    return frame.dropna(axis='index', how='any')
+
+
+def _clean_patent(frame):
+    """Keep the type and date of rows of table patent with an id, as pid."""
+    frame = frame.drop(columns=['number', 'country', 'abstract', 'title',
+                                'kind', 'num_claims', 'filename',
+                                'withdrawn'])
+    frame['date'] = pd.to_datetime(frame['date'], errors='coerce')
+    frame = frame.rename(columns={'id': 'pid'})
+    return frame.dropna(axis='index', subset=['pid'], how='any')
+
+
+def _clean_application(frame):
+    """Keep rows of table application with all fields, keyed by pid."""
+    frame = frame.drop(columns=['number', 'country'])
+    frame = frame.dropna(axis='index', how='any')
+    return frame.rename(columns={'patent_id': 'pid', 'id': 'application_id',
+                                 'date': 'application_date'})
+
+
+def _name(column):
+    """Strip a name column, mapping missing values to ''."""
+    return column.map(lambda x: str(x).strip() if isinstance(x, str) else '')
+
+
+def _clean_assignee(frame):
+    """Join the names of rows of table assignee with an id."""
+    frame = frame.assign(assignee_name=_name(frame['name_first']) + ' ' +
+                         _name(frame['name_last']) + ' ' +
+                         _name(frame['organization']))
+    frame = frame.drop(columns=['name_first', 'name_last', 'organization'])
+    frame = frame.dropna(axis='index', subset=['id'], how='all')
+    return frame.rename(columns={'id': 'assignee_id',
+                                 'type': 'assignee_type'})
+
+
+def _clean_inventor(frame):
+    """Join the names of rows of table inventor with an id."""
+    frame = frame.dropna(axis='index', how='all', subset=['id'])
+    frame = frame.assign(inventor_name=_name(frame['name_first']) + ' ' +
+                         _name(frame['name_last']))
+    frame = frame.drop(columns=['name_first', 'name_last'])
+    return frame.rename(columns={'id': 'inventor_id'})
+
+
+def _clean_location(frame):
+    """Keep rows of table location with any field."""
+    frame = frame.dropna(axis='index', how='all',
+                         subset=['city', 'state', 'country', 'latitude',
+                                 'longitude', 'county', 'state_fips',
+                                 'county_fips'])
+    return frame.rename(columns={'id': 'location_id'})
+
+
+def _clean_cpc_current(frame):
+    """Keep rows of table cpc_current with all levels, named by level."""
+    frame = frame.drop(columns=['uuid', 'category', 'sequence'])
+    frame = frame.dropna(axis='index', how='any')
+    return frame.rename(columns={'section_id': 'cpc_section',
+                                 'group_id': 'cpc_group',
+                                 'subsection_id': 'cpc_subsection',
+                                 'subgroup_id': 'cpc_subgroup'})
+
+
+def _clean_uspc_current(frame):
+    """Keep rows of table uspc_current with all levels, named by level."""
+    frame = frame.drop(columns=['uuid', 'sequence'])
+    frame = frame.replace('No longer published', np.nan)
+    frame = frame.dropna(axis='index', how='any')
+    return frame.rename(columns={'mainclass_id': 'uspc_mainclass',
+                                 'subclass_id': 'uspc_subclass'})
+
+
+def _clean_ipcr(frame):
+    """Keep rows of table ipcr with all levels, named by level."""
+    frame = frame.drop(columns=['uuid', 'classification_level',
+                                'symbol_position', 'classification_value',
+                                'classification_status',
+                                'classification_data_source', 'action_date',
+                                'ipc_version_indicator', 'sequence'])
+    frame = frame.dropna(axis='index', subset=['patent_id', 'section',
+                                               'ipc_class', 'subclass',
+                                               'main_group', 'subgroup'],
+                         how='any')
+    return frame.rename(columns={'section': 'ipcr_section',
+                                 'ipc_class': 'ipcr_class',
+                                 'subclass': 'ipcr_subclass',
+                                 'main_group': 'ipcr_group',
+                                 'subgroup': 'ipcr_subgroup'})
+
+
+def _clean_nber(frame):
+    """Keep rows of table nber with all levels, named by level."""
+    frame = frame.drop(columns=['uuid']).dropna(axis='index')
+    return frame.rename(columns={'category_id': 'nber_category',
+                                 'subcategory_id': 'nber_subcategory'})
+
 
 class PatentsViewHandler(object):
     """Class handling PatentsView data.
 
+    Tables are read once, frames built from them are cached in the data
+    dir, see :class:`FrameCache`, and rebuilt when their tables or the
+    version of their transform, see :attr:`FRAMES`, change.
+
     Parameters
     ----------
     ipath : str
         Dir to PatentsView data.
+    cache : str
+        Cache format, 'parquet', 'feather' or 'pickle', None for the default
+        of :class:`FrameCache`.
+    vocabularies : dict
+        Kind of node, see :attr:`KEYS`, to the :class:`Vocabulary` coding
+        its keys, shared with other handlers. Given, even empty, node keys in
+        the frames of ``construct_*`` and ``iter_*`` methods are integer
+        coded and :attr:`CATEGORICAL` columns categorical, see
+        :meth:`_encode`. None to return strings.
+    processes : int
+        Processes parsing each table, see :func:`parse_table`, 1 to parse
+        on the calling thread.
 
     Attributes
     ----------
     _ipath : str
         Dir to PatentsView data.
+    _cache : :class:`FrameCache`
+        Frames built from tables.
+    _vocabularies : dict
+        Kind of node to :class:`Vocabulary`, None to return strings.
+    _tables : dict
+        Table name to its file, in any format, see :func:`find_table`.
+    _processes : int
+        Processes parsing each table.
 
     """
 
-    def __init__(self, ipath):
+    # cached frame to (method building it, transform version, tables read,
+    # frames it is built from); bump the version when the method changes
+    FRAMES = {
+        'patent.node': ('construct_patent_nodes', 1, (),
+                        ('patent', 'claim', 'application', 'foreigncitation',
+                         'otherreference', 'usapplicationcitation')),
+        'patent': ('_patent', 1, ('patent',), ()),
+        'application': ('_application', 1, ('application',), ()),
+        'claim': ('_claim', 1, ('claim',), ()),
+        'foreigncitation': ('_foreigncitation', 1, ('foreigncitation',), ()),
+        'otherreference': ('_otherreference', 1, ('otherreference',), ()),
+        'usapplicationcitation': ('_usapplicationcitation', 1,
+                                  ('usapplicationcitation',), ()),
+        'assignee': ('_assignee', 1, ('assignee',), ()),
+        'inventor': ('_inventor', 1, ('inventor',), ()),
+        'location': ('_location', 1, ('location',), ()),
+        'uspatentcitation': ('_uspatentcitation', 1, ('uspatentcitation',),
+                             ()),
+        'patent_assignee': ('_patent_assignee', 1, ('patent_assignee',), ()),
+        'patent_inventor': ('_patent_inventor', 1, ('patent_inventor',), ()),
+        'location_assignee': ('_location_assignee', 1,
+                              ('location_assignee',), ()),
+        'location_inventor': ('_location_inventor', 1,
+                              ('location_inventor',), ()),
+        'cpc_current': ('_cpc_current', 1, ('cpc_current',), ()),
+        'uspc_current': ('_uspc_current', 1, ('uspc_current',), ()),
+        'ipcr': ('_ipcr', 1, ('ipcr',), ()),
+        'nber': ('_nber', 1, ('nber',), ()),
+    }
+
+    # node key column, or index, to the kind of node whose key it holds
+    KEYS = {
+        'pid': 'patent', 'patent_id': 'patent', 'citation_id': 'patent',
+        'assignee_id': 'assignee', 'inventor_id': 'inventor',
+        'location_id': 'location',
+    }
+
+    # columns of few distinct values, held as categorical
+    CATEGORICAL = (
+        'type', 'series_code', 'assignee_type', 'state', 'country',
+        'cpc_section', 'cpc_subsection', 'cpc_group', 'cpc_subgroup',
+        'uspc_mainclass', 'uspc_subclass', 'ipcr_section', 'ipcr_class',
+        'ipcr_subclass', 'ipcr_group', 'ipcr_subgroup', 'nber_category',
+        'nber_subcategory',
+    )
+
+    # rows per chunk of tables read to be encoded, see :meth:`_read_table`
+    CHUNKSIZE = 1000000
+
+    def __init__(self, ipath, cache=None, vocabularies=None, processes=1):
         super(PatentsViewHandler, self).__init__()
         self._ipath = ipath
+        self._processes = processes
+        self._vocabularies = vocabularies
+        self._tables = {table: find_table(ipath, table)
+                        for method, version, tables, frames
+                        in self.FRAMES.values() for table in tables}
+        self._cache = FrameCache(ipath, cache, frames={
+            name: (version, [os.path.basename(self._tables[table])
+                             for table in tables], frames)
+            for name, (method, version, tables, frames)
+            in self.FRAMES.items()})
+
+    @property
+    def cache(self):
+        """Frames built from tables, e.g., to read only some columns of
+        a cached frame with ``handler.cache.load('patent', ['date'])``."""
+        return self._cache
+
+    def convert_tables(self, fmt=None, threads=None):
+        """Write every table once in a format that reads at disk speed, see
+        :func:`convert_table`.
+
+        Copies are recorded with the content digest of their original in the
+        cache manifest, see :meth:`FrameCache.alias`, so frames cached from
+        the originals stay valid.
+
+        Parameters
+        ----------
+        fmt : str
+            'zstd', 'gzip' or 'plain', None for the default of
+            :func:`convert_table`.
+        threads : int
+            Threads decompressing bz2, None for one per core.
+
+        Returns
+        -------
+        list
+            Paths of the copies written.
+
+        """
+
+        converted = []
+        for table, path in sorted(self._tables.items()):
+            if not os.path.exists(path) or \
+                    path.endswith(('.tsv', '.tsv.zst', '.tsv.gz')):
+                continue
+            target = convert_table(path, fmt, threads)
+            self._cache.alias(os.path.basename(target),
+                              os.path.basename(path))
+            self._tables[table] = target
+            converted.append(target)
+        return converted
+
+    def _read_table(self, table, clean=None, renumber=True, **kwargs):
+        """Read a table, in any format, see :func:`open_table`.
+
+        With :attr:`_processes` above one, byte ranges of the table are
+        parsed and cleaned on a process pool, see :func:`parse_table`, and
+        cut or joined into chunks of ``chunksize`` cleaned rows, see
+        :func:`_rechunk`, unless ``renumber`` is off.
+
+        With vocabularies, the table is read in chunks, of :attr:`CHUNKSIZE`
+        rows unless ``chunksize`` is given, and the key and categorical
+        columns of each cleaned chunk are coded as it is read, see
+        :meth:`_encode_columns`, so the strings of a whole table are never
+        held at once. Their categoricals are built once for the whole table,
+        see :meth:`_concat`, or per chunk with ``chunksize``.
+
+        Parameters
+        ----------
+        table : str
+            Table name.
+        clean : callable
+            ``clean(frame)``, run on the table, or each chunk, as read, a
+            module level function. None to return them as read.
+        renumber : bool
+            Number rows of parallel ranges on from the ranges before, off
+            for results of ``clean`` not indexed by row.
+        kwargs : dict
+            Passed to :func:`pandas.read_csv`, e.g., ``usecols``. Values are
+            read as strings.
+
+        Returns
+        -------
+        object
+            The cleaned table, or an iterator of cleaned chunks with
+            ``chunksize``.
+
+        """
+
+        chunksize = kwargs.pop('chunksize', None)
+        if self._processes > 1:
+            chunks = parse_table(self._tables[table], self._processes, clean,
+                                 renumber, **kwargs)
+            if chunksize and renumber:
+                chunks = _rechunk(chunks, chunksize)
+        elif chunksize or self._vocabularies is not None:
+            chunks = self._iter_table(table, clean,
+                                      chunksize=chunksize or self.CHUNKSIZE,
+                                      **kwargs)
+        else:
+            with open_table(self._tables[table]) as ifp:
+                frame = pd.read_csv(ifp, **dict(READ_OPTIONS, **kwargs))
+            return clean(frame) if clean else frame
+        if self._vocabularies is not None:
+            chunks = (self._encode_columns(chunk, codes=not chunksize)
+                      for chunk in chunks)
+        return chunks if chunksize else self._concat(list(chunks))
+
+    def _iter_table(self, table, clean=None, **kwargs):
+        """Read a table in chunks, closing it once read, see
+        :meth:`_read_table`."""
+        with open_table(self._tables[table]) as ifp:
+            for chunk in pd.read_csv(ifp, **dict(READ_OPTIONS, **kwargs)):
+                yield clean(chunk) if clean else chunk
+
+    def _encode(self, frame):
+        """Hold a built frame compactly, if the handler has vocabularies.
+
+        Node keys, in :attr:`KEYS` columns or the index, become integer codes
+        of the shared :class:`Vocabulary` of their kind of node, and
+        :attr:`CATEGORICAL` columns codes of a shared vocabulary of their
+        own. Both decode to the original strings with ``astype(str)``, which
+        is left to the writer. Without vocabularies, columns cached as
+        categorical are decoded to strings.
+
+        Parameters
+        ----------
+        frame : :class:`pandas.DataFrame`
+            Frame with string or categorical keys and codes.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            The frame, compact if enabled.
+
+        """
+
+        if self._vocabularies is None:
+            return self._decode(frame)
+        frame = self._encode_columns(frame)
+        if frame.index.name in self.KEYS:
+            frame.index = pd.CategoricalIndex(
+                    self._vocabulary(frame.index.name).encode(frame.index),
+                    name=frame.index.name)
+        return frame
+
+    def _encode_columns(self, frame, codes=False):
+        """Encode the :attr:`KEYS` and :attr:`CATEGORICAL` columns of a
+        frame, e.g., of a chunk as read, see :meth:`_encode`, or with
+        ``codes`` only code them as integers, see :meth:`_concat`."""
+        if not isinstance(frame, pd.DataFrame):
+            return frame
+        columns = {column: getattr(self._vocabulary(column),
+                                   'codes' if codes else 'encode')(
+                                       frame[column])
+                   for column in self._coded(frame)}
+        return frame.assign(**columns) if columns else frame
+
+    def _coded(self, frame):
+        """Columns of a frame coded by vocabularies."""
+        return [column for column in frame.columns
+                if column in self.KEYS or column in self.CATEGORICAL]
+
+    def _decode(self, frame):
+        """Turn categorical columns and index of a frame, e.g., cached with
+        vocabularies, back to the strings they code."""
+        columns = {column: frame[column].astype(
+                       frame[column].cat.categories.dtype)
+                   for column in frame.columns
+                   if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+        if columns:
+            frame = frame.assign(**columns)
+        if isinstance(frame.index, pd.CategoricalIndex):
+            frame.index = frame.index.astype(frame.index.categories.dtype)
+        return frame
+
+    def _recode(self, frame):
+        """Express the codes of a frame against the current categories of
+        their vocabularies, so frames encoded at different times have the
+        same dtypes, e.g., to be concatenated or joined."""
+        if self._vocabularies is None or not isinstance(frame, pd.DataFrame):
+            return frame
+        columns = {column: self._vocabulary(column).recode(frame[column])
+                   for column in frame.columns
+                   if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+        frame = frame.assign(**columns) if columns else frame
+        if isinstance(frame.index, pd.CategoricalIndex):
+            frame.index = pd.CategoricalIndex(
+                    self._vocabulary(frame.index.name).recode(frame.index),
+                    name=frame.index.name)
+        return frame
+
+    def _concat(self, chunks):
+        """Concatenate chunks read by :meth:`_read_table`, turning the codes
+        of their columns, see :meth:`_encode_columns`, into categoricals
+        once for the whole table."""
+        frame = pd.concat(chunks)
+        if self._vocabularies is None or not isinstance(frame, pd.DataFrame):
+            return frame
+        columns = {column: pd.Categorical.from_codes(
+                       frame[column].to_numpy(),
+                       dtype=self._vocabulary(column).dtype)
+                   for column in self._coded(frame)}
+        return frame.assign(**columns) if columns else frame
+
+    def _vocabulary(self, column):
+        """Shared :class:`Vocabulary` of the kind of node ``column`` keys, or
+        of the codes of a :attr:`CATEGORICAL` column."""
+        kind = self.KEYS.get(column, column)
+        return self._vocabularies.setdefault(kind, Vocabulary())
+
+    def _patent_vocabulary(self):
+        """:class:`Vocabulary` of patent ids to count patents by, the shared
+        one if the handler has vocabularies."""
+        if self._vocabularies is None:
+            return Vocabulary()
+        return self._vocabulary('patent_id')
+
+    def _save(self, name, frame):
+        """Cache a frame, encoded ones with only the codes they use, rather
+        than every key of their vocabulary."""
+        compact = {column: frame[column].cat.remove_unused_categories()
+                   for column in frame.columns
+                   if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+        if compact or isinstance(frame.index, pd.CategoricalIndex):
+            frame = frame.assign(**compact)
+            if isinstance(frame.index, pd.CategoricalIndex):
+                frame.index = frame.index.remove_unused_categories()
+        self._cache.save(name, frame)
+
+    def _split(self, frame, chunks):
+        """Encode a built frame, see :meth:`_encode`, and split it in
+        ``chunks`` chunks, None to not split."""
+        frame = self._encode(frame)
+        return np.array_split(frame, chunks) if chunks else frame
+
+    def refresh_cache(self, names=None):
+        """Rebuild cached frames that are stale, see :meth:`FrameCache.valid`.
+
+        Parameters
+        ----------
+        names : list
+            Frames to check, None to check all frames in :attr:`FRAMES`.
+
+        Returns
+        -------
+        list
+            Names of the frames rebuilt.
+
+        """
+
+        stale = [name for name in names or self.FRAMES
+                 if self._cache.exists(name) and
+                 not self._cache.valid(name)]
+        for name in stale:
+            getattr(self, self.FRAMES[name][0])()
+        return stale
 
     def construct_patent_nodes(self, chunks=None):
         """Construct patent nodes.
@@ -42,24 +621,19 @@ class PatentsViewHandler(object):
 
         """
 
-        opath = os.path.join(self._ipath, 'patent.node.pkl.bz2')
-        if os.path.exists(opath):
-            patents = pd.read_pickle(opath)
-            return np.array_split(patents, chunks) if chunks else patents
-        patents = self._patent()
-        patents = patents.join(self._claim(), how='left')
-        patents = patents.join(self._application(), how='left')
-        patents = patents.join(self._foreigncitation(), how='left')
-        patents['foreigncitation'] = patents['foreigncitation'].replace(
-                np.NaN, 0)
-        patents = patents.join(self._otherreference(), how='left')
-        patents['otherreference'] = patents['otherreference'].replace(np.NaN,
-                                                                      0)
-        patents = patents.join(self._usapplicationcitation(), how='left')
-        patents['applicationcitation'] =\
-            patents['applicationcitation'].replace(np.NaN, 0)
-        patents.to_pickle(opath)
-        return np.array_split(patents, chunks) if chunks else patents
+        patents = self._cache.load('patent.node')
+        if patents is not None:
+            return self._split(patents, chunks)
+        patents = self._encode(self._patent())
+        for counts in (self._claim, self._application, self._foreigncitation,
+                       self._otherreference, self._usapplicationcitation):
+            counts = self._recode(self._encode(counts()))
+            patents = self._recode(patents).join(counts, how='left')
+        for column in ('foreigncitation', 'otherreference',
+                       'applicationcitation'):
+            patents[column] = patents[column].replace(np.nan, 0)
+        self._save('patent.node', patents)
+        return self._split(patents, chunks)
 
     def _patent(self):
         """Read table patent. All 6,819,362 records in table are valid. Each
@@ -73,20 +647,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading patent.tsv')
-        ipath = os.path.join(self._ipath, 'patent.tsv.bz2')
-        opath = os.path.join(self._ipath, 'patent.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        patent = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                             dtype=str)
-        patent.drop(columns=['number', 'country', 'abstract', 'title', 'kind',
-                             'num_claims', 'filename', 'withdrawn'],
-                    inplace=True)
-        patent['date'] = pd.to_datetime(patent['date'], errors='coerce')
-        patent.rename(columns={'id': 'pid'}, inplace=True)
-        patent.dropna(axis='index', subset=['pid'], how='any', inplace=True)
+        cached = self._cache.load('patent')
+        if cached is not None:
+            return cached
+        patent = self._read_table('patent', _clean_patent)
         patent.set_index('pid', inplace=True, verify_integrity=True)
-        patent.to_pickle(opath)
+        self._save('patent', patent)
         return patent
 
     def _application(self):
@@ -100,19 +666,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading application.tsv.')
-        ipath = os.path.join(self._ipath, 'application.tsv.bz2')
-        opath = os.path.join(self._ipath, 'application.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        application = pd.read_csv(ipath, sep='\t', quoting=3,
-                                  lineterminator='\n', dtype=str)
-        application.drop(columns=['number', 'country'], inplace=True)
-        application.dropna(axis='index', how='any', inplace=True)
-        application.rename(columns={'patent_id': 'pid',
-                                    'id': 'application_id',
-                                    'date': 'application_date'}, inplace=True)
+        cached = self._cache.load('application')
+        if cached is not None:
+            return cached
+        application = self._read_table('application', _clean_application)
         application.set_index('pid', inplace=True, verify_integrity=True)
-        application.to_pickle(opath)
+        self._save('application', application)
         return application
 
     def _claim(self):
@@ -120,36 +679,29 @@ class PatentsViewHandler(object):
         94,128,045 have valid patent_id and dependent fields. Overall,
         6,817,926 patents are found.
 
+        Only patent_id and dependent are read. Claims are counted per chunk,
+        and the counts added into integer arrays as chunks are read, see
+        :func:`_sum_counts`, so memory grows with the number of patents
+        rather than claims.
+
         Returns
         -------
         :class:`pandas.DataFrame`
-            Patent claims and their dependency.
+            Number of dependent and independent claims of each patent.
 
         """
 
         print('Loading claim.tsv.')
-        ipath = os.path.join(self._ipath, 'claim.tsv.bz2')
-        opath = os.path.join(self._ipath, 'claim.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        chunks = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                             dtype=str, chunksize=1000000)
-        claim = []
-        for chunk in chunks:  # must have dependent and patent_id
-            chunk.drop(columns=['uuid', 'text', 'sequence', 'exemplary'],
-                       inplace=True)
-            chunk.dropna(axis='index', subset=['dependent', 'patent_id'],
-                         how='any', inplace=True)
-            chunk.loc[chunk.loc[:, 'dependent'] != '-1', 'dependent'] = 'D'
-            chunk.loc[chunk.loc[:, 'dependent'] == '-1', 'dependent'] = 'I'
-            claim.append(chunk)
-        claim = pd.concat(claim).groupby('patent_id').aggregate(
-                lambda x: collections.Counter(tuple(x)))
-        claim = claim.apply(lambda e: pd.Series([int(e['dependent']['D']),
-                                                 int(e['dependent']['I'])],
-                            index=['dependent', 'independent']), axis=1)
+        cached = self._cache.load('claim')
+        if cached is not None:
+            return cached
+        chunks = self._read_table('claim', _count_claims, renumber=False,
+                                  usecols=['patent_id', 'dependent'],
+                                  chunksize=1000000)
+        claim = _sum_counts(chunks, self._patent_vocabulary(),
+                            ['dependent', 'independent'])
         claim.index.rename('pid', inplace=True)
-        claim.to_pickle(opath)
+        self._save('claim', claim)
         return claim
 
     def _foreigncitation(self):
@@ -159,27 +711,11 @@ class PatentsViewHandler(object):
         Returns
         -------
         :class:`pandas.DataFrame`
-            Citations made to foreign patents by US patents.
-
-        """
-
-        print('Loading foreigncitation.tsv')
-        ipath = os.path.join(self._ipath, 'foreigncitation.tsv.bz2')
-        opath = os.path.join(self._ipath, 'foreigncitation.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        foreigncitation = pd.read_csv(ipath, sep='\t', quoting=3,
-                                      lineterminator='\n', dtype=str)
-        foreigncitation.drop(columns=['uuid', 'date', 'country', 'category',
-                                      'sequence'], inplace=True)
-        foreigncitation.dropna(axis='index', how='any', inplace=True)
-        foreigncitation = foreigncitation.groupby('patent_id').aggregate(
-                lambda x: len(list(x)))
-        foreigncitation.rename(columns={'number': 'foreigncitation'},
-                               inplace=True)
-        foreigncitation.index.rename('pid', inplace=True)
-        foreigncitation.to_pickle(opath)
-        return foreigncitation
+            Number of citations made to foreign patents by each US patent.
+
+        """
+
+        return self._count('foreigncitation', 'number', 'foreigncitation')
 
     def _otherreference(self):
         """Read table otherreference. Out of 36,101,604 records in table,
@@ -188,26 +724,12 @@ class PatentsViewHandler(object):
         Returns
         -------
         :class:`pandas.DataFrame`
-            Non-patent citations mentioned in patents (e.g. articles, papers,
-            etc.).
-
-        """
-
-        print('Loading otherreference.tsv')
-        ipath = os.path.join(self._ipath, 'otherreference.tsv.bz2')
-        opath = os.path.join(self._ipath, 'otherreference.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        otherreference = pd.read_csv(ipath, sep='\t', quoting=3, dtype=str,
-                                     lineterminator='\n').drop(
-                                             columns=['uuid', 'sequence'])
-        otherreference.dropna(axis='index', how='any', inplace=True)
-        otherreference = otherreference.groupby('patent_id').aggregate(
-                lambda x: len(list(x)))
-        otherreference.rename(columns={'text': 'otherreference'}, inplace=True)
-        otherreference.index.rename('pid', inplace=True)
-        otherreference.to_pickle(opath)
-        return otherreference
+            Number of non-patent citations mentioned in each patent (e.g.
+            articles, papers, etc.).
+
+        """
+
+        return self._count('otherreference', 'text', 'otherreference')
 
     def _usapplicationcitation(self):
         """Read table usapplicationcitation. All 32,145,240 records in table
@@ -216,28 +738,51 @@ class PatentsViewHandler(object):
         Returns
         -------
         :class:`pandas.DataFrame`
-            Citations made to US patent applications by US patents.
-
-        """
-
-        print('Loading usapplicationcitation.tsv')
-        ipath = os.path.join(self._ipath, 'usapplicationcitation.tsv.bz2')
-        opath = os.path.join(self._ipath, 'usapplicationcitation.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        usapplicationcitation = pd.read_csv(ipath, sep='\t', quoting=3,
-                                            lineterminator='\n', dtype=str)
-        usapplicationcitation.drop(columns=['uuid', 'date', 'name', 'kind',
-                                            'number', 'country', 'category',
-                                            'sequence'], inplace=True)
-        usapplicationcitation.dropna(axis='index', how='any', inplace=True)
-        usapplicationcitation = usapplicationcitation.groupby(
-                'patent_id').aggregate(lambda x: len(list(x)))
-        usapplicationcitation.rename(columns={
-            'application_id': 'applicationcitation'}, inplace=True)
-        usapplicationcitation.index.rename('pid', inplace=True)
-        usapplicationcitation.to_pickle(opath)
-        return usapplicationcitation
+            Number of citations made to US patent applications by each US
+            patent.
+
+        """
+
+        return self._count('usapplicationcitation', 'application_id',
+                           'applicationcitation')
+
+    def _count(self, table, column, name, chunksize=1000000):
+        """Count the valid records of a table per patent.
+
+        Only patent_id and ``column`` are read, in chunks. Records of each
+        chunk are counted per patent and added to an integer array of
+        running counts indexed by patent code, see :func:`_sum_counts`, so
+        memory grows with the number of patents rather than records.
+
+        Parameters
+        ----------
+        table : str
+            Table name, also the name of the cached frame.
+        column : str
+            Column a record must have to be counted.
+        name : str
+            Column of the counts.
+        chunksize : int
+            Rows per chunk.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            Number of records of each patent.
+
+        """
+
+        print('Loading {}.tsv'.format(table))
+        cached = self._cache.load(table)
+        if cached is not None:
+            return cached
+        chunks = self._read_table(table, _count_records, renumber=False,
+                                  usecols=['patent_id', column],
+                                  chunksize=chunksize)
+        counts = _sum_counts(chunks, self._patent_vocabulary(), [name])
+        counts.index.rename('pid', inplace=True)
+        self._save(table, counts)
+        return counts
 
     def construct_assignee_nodes(self, chunks=None):
         """Construct assignee nodes.
@@ -255,7 +800,7 @@ class PatentsViewHandler(object):
         """
 
         assignees = self._assignee()
-        return np.array_split(assignees, chunks) if chunks else assignees
+        return self._split(assignees, chunks)
 
     def _assignee(self):
         """Read table assignee. All 506,284 records in table are valid.
@@ -268,27 +813,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading assignee.tsv.')
-        ipath = os.path.join(self._ipath, 'assignee.tsv.bz2')
-        opath = os.path.join(self._ipath, 'assignee.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        assignee = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                               dtype=str)
-        assignee['name_first'] = assignee['name_first'].map(
-                lambda x: str(x).strip() if isinstance(x, str) else '')
-        assignee['name_last'] = assignee['name_last'].map(
-                lambda x: str(x).strip() if isinstance(x, str) else '')
-        assignee['organization'] = assignee['organization'].map(
-                lambda x: str(x).strip() if isinstance(x, str) else '')
-        assignee['assignee_name'] = assignee['name_first'] + ' '\
-            + assignee['name_last'] + ' ' + assignee['organization']
-        assignee.drop(columns=['name_first', 'name_last', 'organization'],
-                      inplace=True)
-        assignee.dropna(axis='index', subset=['id'], how='all', inplace=True)
-        assignee.rename(columns={'id': 'assignee_id',
-                                 'type': 'assignee_type'}, inplace=True)
+        cached = self._cache.load('assignee')
+        if cached is not None:
+            return cached
+        assignee = self._read_table('assignee', _clean_assignee)
         assignee.set_index('assignee_id', inplace=True, verify_integrity=True)
-        assignee.to_pickle(opath)
+        self._save('assignee', assignee)
         return assignee
 
     def construct_inventor_nodes(self, chunks=None):
@@ -307,7 +837,7 @@ class PatentsViewHandler(object):
         """
 
         inventors = self._inventor()
-        return np.array_split(inventors, chunks) if chunks else inventors
+        return self._split(inventors, chunks)
 
     def _inventor(self):
         """Read table inventor. All 3,772,041 records in table are valid.
@@ -320,23 +850,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading inventor.tsv')
-        ipath = os.path.join(self._ipath, 'inventor.tsv.bz2')
-        opath = os.path.join(self._ipath, 'inventor.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        inventor = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                               dtype=str)
-        inventor.dropna(axis='index', how='all', subset=['id'], inplace=True)
-        inventor['name_first'] = inventor['name_first'].map(
-                lambda x: str(x).strip() if isinstance(x, str) else '')
-        inventor['name_last'] = inventor['name_last'].map(
-                lambda x: str(x).strip() if isinstance(x, str) else '')
-        inventor['inventor_name'] = inventor['name_first'] + ' '\
-            + inventor['name_last']
-        inventor.drop(columns=['name_first', 'name_last'], inplace=True)
-        inventor.rename(columns={'id': 'inventor_id'}, inplace=True)
+        cached = self._cache.load('inventor')
+        if cached is not None:
+            return cached
+        inventor = self._read_table('inventor', _clean_inventor)
         inventor.set_index('inventor_id', inplace=True, verify_integrity=True)
-        inventor.to_pickle(opath)
+        self._save('inventor', inventor)
         return inventor
 
     def construct_location_nodes(self, chunks=None):
@@ -350,7 +869,7 @@ class PatentsViewHandler(object):
         """
 
         locations = self._location()
-        return np.array_split(locations, chunks) if chunks else locations
+        return self._split(locations, chunks)
 
     def _location(self):
         """Read table location. All 141,189 records in table are valid.
@@ -363,19 +882,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading location.tsv')
-        ipath = os.path.join(self._ipath, 'location.tsv.bz2')
-        opath = os.path.join(self._ipath, 'location.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        location = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                               dtype=str)
-        location.dropna(axis='index', how='all',
-                        subset=['city', 'state', 'country', 'latitude',
-                                'longitude', 'county', 'state_fips',
-                                'county_fips'], inplace=True)
-        location.rename(columns={'id': 'location_id'}, inplace=True)
+        cached = self._cache.load('location')
+        if cached is not None:
+            return cached
+        location = self._read_table('location', _clean_location)
         location.set_index('location_id', inplace=True, verify_integrity=True)
-        location.to_pickle(opath)
+        self._save('location', location)
         return location
 
     def construct_patent_citations(self, chunks=None):
@@ -394,7 +906,64 @@ class PatentsViewHandler(object):
         """
 
         citations = self._uspatentcitation()
-        return np.array_split(citations, chunks) if chunks else citations
+        return self._split(citations, chunks)
+
+    def iter_patent_citations(self, chunksize=1000000):
+        """Stream patent citation edges from the raw table. Unlike
+        :meth:`construct_patent_citations`, the table is never held in memory
+        as a whole.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of rows read per chunk.
+
+        Yields
+        ------
+        :class:`pandas.DataFrame`
+            Citations made to US granted patents by US patents.
+
+        """
+
+        return self._stream('uspatentcitation', _clean_pairs, chunksize,
+                            usecols=['patent_id', 'citation_id'])
+
+    def _stream(self, table, clean, chunksize, usecols=None):
+        """Stream cleaned chunks of a table.
+
+        Chunks come from the cached frame if it is valid, otherwise straight
+        from the compressed TSV. Both yield the rows of the full reader in
+        the same order.
+
+        Parameters
+        ----------
+        table : str
+            Table name, also the name of its cached frame.
+        clean : callable
+            ``clean(chunk)``, the cleaning of the full reader.
+        chunksize : int
+            Number of rows read per chunk.
+        usecols : list
+            Columns to read, None to read all.
+
+        Yields
+        ------
+        :class:`pandas.DataFrame`
+            Cleaned chunks, empty ones are skipped.
+
+        """
+
+        if self._cache.valid(table):
+            print('Streaming cached {}.'.format(table))
+            for chunk in self._cache.iter_frames(table, usecols, chunksize):
+                yield self._encode(chunk)
+            return
+        print('Streaming {}.tsv'.format(table))
+        chunks = self._read_table(table, clean, usecols=usecols,
+                                  chunksize=chunksize)
+        for chunk in chunks:
+            if len(chunk):
+                yield self._encode(chunk)
 
     def _uspatentcitation(self):
         """Read table uspatentcitation. Out of 98,207,057 records in table,
@@ -408,16 +977,13 @@ class PatentsViewHandler(object):
         """
 
         print('Loading uspatentcitation.tsv')
-        ipath = os.path.join(self._ipath, 'uspatentcitation.tsv.bz2')
-        opath = os.path.join(self._ipath, 'uspatentcitation.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        uspatentcitation = pd.read_csv(ipath, sep='\t', quoting=3,
-                                       lineterminator='\n',
-                                       usecols=['patent_id', 'citation_id'],
-                                       dtype=str)
-        uspatentcitation.dropna(axis='index', how='any', inplace=True)
-        uspatentcitation.to_pickle(opath)
+        cached = self._cache.load('uspatentcitation')
+        if cached is not None:
+            return cached
+        uspatentcitation = self._read_table(
+                'uspatentcitation', _clean_pairs,
+                usecols=['patent_id', 'citation_id'])
+        self._save('uspatentcitation', uspatentcitation)
         return uspatentcitation
 
     def construct_patent_assignee_edges(self, chunks=None):
@@ -436,8 +1002,7 @@ class PatentsViewHandler(object):
         """
 
         patent_assignee = self._patent_assignee()
-        return np.array_split(patent_assignee, chunks)\
-            if chunks else patent_assignee
+        return self._split(patent_assignee, chunks)
 
     def _patent_assignee(self):
         """Read table patent_assignee. All 6,070,101 records in table are
@@ -451,14 +1016,11 @@ class PatentsViewHandler(object):
         """
 
         print('Loading patent_assignee.tsv')
-        ipath = os.path.join(self._ipath, 'patent_assignee.tsv.bz2')
-        opath = os.path.join(self._ipath, 'patent_assignee.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        patent_assignee = pd.read_csv(ipath, sep='\t', quoting=3,
-                                      lineterminator='\n', dtype=str)
-        patent_assignee.dropna(axis='index', how='any', inplace=True)
-        patent_assignee.to_pickle(opath)
+        cached = self._cache.load('patent_assignee')
+        if cached is not None:
+            return cached
+        patent_assignee = self._read_table('patent_assignee', _clean_pairs)
+        self._save('patent_assignee', patent_assignee)
         return patent_assignee
 
     def construct_patent_inventor_edges(self, chunks=None):
@@ -477,8 +1039,24 @@ class PatentsViewHandler(object):
         """
 
         patent_inventor = self._patent_inventor()
-        return np.array_split(patent_inventor, chunks)\
-            if chunks else patent_inventor
+        return self._split(patent_inventor, chunks)
+
+    def iter_patent_inventor_edges(self, chunksize=1000000):
+        """Stream patent-inventor edges, see :meth:`iter_patent_citations`.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of rows read per chunk.
+
+        Yields
+        ------
+        :class:`pandas.DataFrame`
+            Crosswalk between patent and inventor tables.
+
+        """
+
+        return self._stream('patent_inventor', _clean_pairs, chunksize)
 
     def _patent_inventor(self):
         """Read table patent_inventor. All 16,237,888 records in table are
@@ -492,14 +1070,11 @@ class PatentsViewHandler(object):
         """
 
         print('Loading patent_inventor.tsv')
-        ipath = os.path.join(self._ipath, 'patent_inventor.tsv.bz2')
-        opath = os.path.join(self._ipath, 'patent_inventor.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        patent_inventor = pd.read_csv(ipath, sep='\t', quoting=3,
-                                      lineterminator='\n', dtype=str)
-        patent_inventor.dropna(axis='index', how='any', inplace=True)
-        patent_inventor.to_pickle(opath)
+        cached = self._cache.load('patent_inventor')
+        if cached is not None:
+            return cached
+        patent_inventor = self._read_table('patent_inventor', _clean_pairs)
+        self._save('patent_inventor', patent_inventor)
         return patent_inventor
 
     def construct_assignee_location_edges(self, chunks=None):
@@ -518,8 +1093,7 @@ class PatentsViewHandler(object):
         """
 
         assignee_location = self._location_assignee()
-        return np.array_split(assignee_location, chunks)\
-            if chunks else assignee_location
+        return self._split(assignee_location, chunks)
 
     def _location_assignee(self):
         """Read table location_assignee. All 619,055 records in table are
@@ -537,14 +1111,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading location_assignee.tsv')
-        ipath = os.path.join(self._ipath, 'location_assignee.tsv.bz2')
-        opath = os.path.join(self._ipath, 'location_assignee.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        location_assignee = pd.read_csv(ipath, sep='\t', quoting=3,
-                                        lineterminator='\n', dtype=str)
-        location_assignee.dropna(axis='index', how='any', inplace=True)
-        location_assignee.to_pickle(opath)
+        cached = self._cache.load('location_assignee')
+        if cached is not None:
+            return cached
+        location_assignee = self._read_table('location_assignee',
+                                             _clean_pairs)
+        self._save('location_assignee', location_assignee)
         return location_assignee
 
     def construct_inventor_location_edges(self, chunks=None):
@@ -563,8 +1135,24 @@ class PatentsViewHandler(object):
         """
 
         inventor_location = self._location_inventor()
-        return np.array_split(inventor_location, chunks)\
-            if chunks else inventor_location
+        return self._split(inventor_location, chunks)
+
+    def iter_inventor_location_edges(self, chunksize=1000000):
+        """Stream inventor-location edges, see :meth:`iter_patent_citations`.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of rows read per chunk.
+
+        Yields
+        ------
+        :class:`pandas.DataFrame`
+            Crosswalk between location and inventor tables.
+
+        """
+
+        return self._stream('location_inventor', _clean_pairs, chunksize)
 
     def _location_inventor(self):
         """Read table location_inventor. All 16,237,556 records in table are
@@ -582,14 +1170,12 @@ class PatentsViewHandler(object):
         """
 
         print('Loading location_inventor.tsv')
-        ipath = os.path.join(self._ipath, 'location_inventor.tsv.bz2')
-        opath = os.path.join(self._ipath, 'location_inventor.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        location_inventor = pd.read_csv(ipath, sep='\t', quoting=3,
-                                        lineterminator='\n', dtype=str)
-        location_inventor.dropna(axis='index', how='any', inplace=True)
-        location_inventor.to_pickle(opath)
+        cached = self._cache.load('location_inventor')
+        if cached is not None:
+            return cached
+        location_inventor = self._read_table('location_inventor',
+                                             _clean_pairs)
+        self._save('location_inventor', location_inventor)
         return location_inventor
 
     def construct_cpc_nodes(self, chunks=None):
@@ -608,14 +1194,29 @@ class PatentsViewHandler(object):
         """
 
         cpc = self._cpc_current()
-        cpc_section = set([str(e) for e in cpc.loc[:, 'cpc_section'].tolist()])
-        cpc_subsection = set([str(e)
-                              for e in cpc.loc[:, 'cpc_subsection'].tolist()])
-        cpc_group = set([str(e) for e in cpc.loc[:, 'cpc_group'].tolist()])
-        cpc_subgroup = set([str(e)
-                            for e in cpc.loc[:, 'cpc_subgroup'].tolist()])
-        nodes = (cpc_section, cpc_subsection, cpc_group, cpc_subgroup)
-        return nodes, np.array_split(cpc, chunks) if chunks else cpc
+        nodes = _vocabulary(cpc, ['cpc_section', 'cpc_subsection',
+                                  'cpc_group', 'cpc_subgroup'])
+        return nodes, self._split(cpc, chunks)
+
+    def iter_cpc_nodes(self, chunksize=1000000):
+        """Stream cpc classifications, see :meth:`iter_patent_citations`.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of rows read per chunk.
+
+        Yields
+        ------
+        tuple
+            Codes of each level found in the chunk, and the chunk.
+
+        """
+
+        for chunk in self._stream('cpc_current', _clean_cpc_current,
+                                  chunksize):
+            yield _vocabulary(chunk, ['cpc_section', 'cpc_subsection',
+                                      'cpc_group', 'cpc_subgroup']), chunk
 
     def _cpc_current(self):
         """Read table cpc_current. All 36,846,878 records in table are valid.
@@ -628,19 +1229,11 @@ class PatentsViewHandler(object):
         """
 
         print('Loading cpc_current.tsv')
-        ipath = os.path.join(self._ipath, 'cpc_current.tsv.bz2')
-        opath = os.path.join(self._ipath, 'cpc_current.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        cpc = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                          dtype=str)
-        cpc.drop(columns=['uuid', 'category', 'sequence'], inplace=True)
-        cpc.dropna(axis='index', how='any', inplace=True)
-        cpc.rename(columns={'section_id': 'cpc_section',
-                            'group_id': 'cpc_group',
-                            'subsection_id': 'cpc_subsection',
-                            'subgroup_id': 'cpc_subgroup'}, inplace=True)
-        cpc.to_pickle(opath)
+        cached = self._cache.load('cpc_current')
+        if cached is not None:
+            return cached
+        cpc = self._read_table('cpc_current', _clean_cpc_current)
+        self._save('cpc_current', cpc)
         return cpc
 
     def construct_uspc_nodes(self, chunks=None):
@@ -659,10 +1252,8 @@ class PatentsViewHandler(object):
         """
 
         uspc = self._uspc_current()
-        uspc_mainclass = set(uspc.loc[:, 'uspc_mainclass'].tolist())
-        uspc_subclass = set(uspc.loc[:, 'uspc_subclass'].tolist())
-        nodes = (uspc_mainclass, uspc_subclass)
-        return nodes, np.array_split(uspc, chunks) if chunks else uspc
+        nodes = _vocabulary(uspc, ['uspc_mainclass', 'uspc_subclass'])
+        return nodes, self._split(uspc, chunks)
 
     def _uspc_current(self):
         """Read table uspc_current. Out of 22,885,509 records in table,
@@ -680,19 +1271,11 @@ class PatentsViewHandler(object):
         """
 
         print('Loading uspc_current.tsv')
-        ipath = os.path.join(self._ipath, 'uspc_current.tsv.bz2')
-        opath = os.path.join(self._ipath, 'uspc_current.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        uspc_current = pd.read_csv(ipath, sep='\t', quoting=3,
-                                   lineterminator='\n', dtype=str)
-        uspc_current.drop(columns=['uuid', 'sequence'], inplace=True)
-        uspc_current.replace('No longer published', np.NaN, inplace=True)
-        uspc_current.dropna(axis='index', how='any', inplace=True)
-        uspc_current.rename(columns={'mainclass_id': 'uspc_mainclass',
-                                     'subclass_id': 'uspc_subclass'},
-                            inplace=True)
-        uspc_current.to_pickle(opath)
+        cached = self._cache.load('uspc_current')
+        if cached is not None:
+            return cached
+        uspc_current = self._read_table('uspc_current', _clean_uspc_current)
+        self._save('uspc_current', uspc_current)
         return uspc_current
 
     def construct_ipcr_nodes(self, chunks=None):
@@ -711,14 +1294,10 @@ class PatentsViewHandler(object):
         """
 
         ipcr = self._ipcr()
-        ipcr_section = set(ipcr.loc[:, 'ipcr_section'].tolist())
-        ipcr_class = set(ipcr.loc[:, 'ipcr_class'].tolist())
-        ipcr_subclass = set(ipcr.loc[:, 'ipcr_subclass'].tolist())
-        ipcr_group = set(ipcr.loc[:, 'ipcr_group'].tolist())
-        ipcr_subgroup = set(ipcr.loc[:, 'ipcr_subgroup'].tolist())
-        nodes = (ipcr_section, ipcr_class, ipcr_subclass, ipcr_group,
-                 ipcr_subgroup)
-        return nodes, np.array_split(ipcr, chunks) if chunks else ipcr
+        nodes = _vocabulary(ipcr, ['ipcr_section', 'ipcr_class',
+                                   'ipcr_subclass', 'ipcr_group',
+                                   'ipcr_subgroup'])
+        return nodes, self._split(ipcr, chunks)
 
     def _ipcr(self):
         """Read table ipcr. Out of 13,854,255 records in table, 13,685,911 are
@@ -738,25 +1317,11 @@ class PatentsViewHandler(object):
         """
 
         print('Loading ipcr.tsv')
-        ipath = os.path.join(self._ipath, 'ipcr.tsv.bz2')
-        opath = os.path.join(self._ipath, 'ipcr.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        ipcr = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                           dtype=str)
-        ipcr.drop(columns=['uuid', 'classification_level', 'symbol_position',
-                           'classification_value', 'classification_status',
-                           'classification_data_source', 'action_date',
-                           'ipc_version_indicator', 'sequence'], inplace=True)
-        ipcr.dropna(axis='index', subset=['patent_id', 'section', 'ipc_class',
-                                          'subclass', 'main_group',
-                                          'subgroup'], how='any', inplace=True)
-        ipcr.rename(columns={'section': 'ipcr_section',
-                             'ipc_class': 'ipcr_class',
-                             'subclass': 'ipcr_subclass',
-                             'main_group': 'ipcr_group',
-                             'subgroup': 'ipcr_subgroup'}, inplace=True)
-        ipcr.to_pickle(opath)
+        cached = self._cache.load('ipcr')
+        if cached is not None:
+            return cached
+        ipcr = self._read_table('ipcr', _clean_ipcr)
+        self._save('ipcr', ipcr)
         return ipcr
 
     def construct_nber_nodes(self, chunks=None):
@@ -775,10 +1340,8 @@ class PatentsViewHandler(object):
         """
 
         nber = self._nber()
-        nber_cat = set(nber.loc[:, 'nber_category'].tolist())
-        nber_subcat = set(nber.loc[:, 'nber_subcategory'].tolist())
-        nodes = (nber_cat, nber_subcat)
-        return nodes, np.array_split(nber, chunks) if chunks else nber
+        nodes = _vocabulary(nber, ['nber_category', 'nber_subcategory'])
+        return nodes, self._split(nber, chunks)
 
     def _nber(self):
         """Read table nber. All 5,105,937 records in table are valid.
@@ -795,15 +1358,9 @@ class PatentsViewHandler(object):
         """
 
         print('Loading nber.tsv')
-        ipath = os.path.join(self._ipath, 'nber.tsv.bz2')
-        opath = os.path.join(self._ipath, 'nber.pkl.bz2')
-        if os.path.exists(opath):
-            return pd.read_pickle(opath)
-        nber = pd.read_csv(ipath, sep='\t', quoting=3, lineterminator='\n',
-                           dtype=str).drop(columns=['uuid'])
-        nber.dropna(axis='index', inplace=True)
-        nber.rename(columns={'category_id': 'nber_category',
-                             'subcategory_id': 'nber_subcategory'},
-                    inplace=True)
-        nber.to_pickle(opath)
+        cached = self._cache.load('nber')
+        if cached is not None:
+            return cached
+        nber = self._read_table('nber', _clean_nber)
+        self._save('nber', nber)
         return nber
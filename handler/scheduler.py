@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import time
+
+
+class PhaseScheduler(object):
+    """Run load phases as soon as the phases they depend on have finished.
+
+    Independent phases run at the same time on a pool of worker threads.
+    Phases are mostly waiting on the database, so threads keep it busy
+    without copying the DataFrames between processes.
+
+    Parameters
+    ----------
+    workers : int
+        Maximum number of phases running at the same time.
+
+    Attributes
+    ----------
+    _workers : int
+        Maximum number of phases running at the same time.
+    _phases : dict
+        Phase name to (callable, names of required phases), in the order
+        phases were added.
+
+    """
+
+    def __init__(self, workers=1):
+        super(PhaseScheduler, self).__init__()
+        self._workers = workers
+        self._phases = {}
+
+    def add(self, name, func, requires=()):
+        """Declare a phase.
+
+        Parameters
+        ----------
+        name : str
+            Phase name.
+        func : callable
+            Called without arguments to run the phase.
+        requires : tuple
+            Names of phases that must finish before this one starts.
+
+        """
+
+        if name in self._phases:
+            raise ValueError('Duplicate phase {}.'.format(name))
+        self._phases[name] = (func, tuple(requires))
+
+    def order(self, only=None, skip=()):
+        """Resolve which phases run and in what order.
+
+        Parameters
+        ----------
+        only : list
+            Run only these phases, None to run all. Phases left out are
+            considered done.
+        skip : list
+            Phases already done.
+
+        Returns
+        -------
+        list
+            Phase names in a dependency respecting order.
+
+        """
+
+        selected = list(self._phases) if only is None else list(only)
+        for name in list(selected) + list(skip):
+            if name not in self._phases:
+                raise ValueError('Unknown phase {}.'.format(name))
+        for name, (func, requires) in self._phases.items():
+            for required in requires:
+                if required not in self._phases:
+                    raise ValueError('Phase {} requires unknown phase '
+                                     '{}.'.format(name, required))
+        pending = [name for name in self._phases
+                   if name in selected and name not in skip]
+        done = set(self._phases) - set(pending)
+        ordered = []
+        while pending:
+            ready = [name for name in pending
+                     if set(self._phases[name][1]) <= done]
+            if not ready:
+                raise ValueError('Cyclic phase dependencies among '
+                                 '{}.'.format(', '.join(pending)))
+            ordered += ready
+            done.update(ready)
+            pending = [name for name in pending if name not in ready]
+        return ordered
+
+    def run(self, only=None, skip=()):
+        """Run phases, independent ones concurrently.
+
+        A failing phase stops new phases from being started; running phases
+        are waited for and the first error is raised.
+
+        Parameters
+        ----------
+        only : list
+            Run only these phases, None to run all. Phases left out are
+            considered done.
+        skip : list
+            Phases already done.
+
+        """
+
+        pending = self.order(only, skip)
+        done = set(self._phases) - set(pending)
+        running = {}
+        error = None
+        with concurrent.futures.ThreadPoolExecutor(self._workers) as pool:
+            while pending or running:
+                ready = [] if error else [
+                        name for name in pending
+                        if set(self._phases[name][1]) <= done]
+                for name in ready[:self._workers - len(running)]:
+                    print('[PHASE] Start {}.'.format(name))
+                    pending.remove(name)
+                    future = pool.submit(self._phases[name][0])
+                    running[future] = (name, time.time())
+                if not running:
+                    break
+                finished, _ = concurrent.futures.wait(
+                        running,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    name, start = running.pop(future)
+                    if future.exception() is not None:
+                        print('[PHASE] {} failed.'.format(name))
+                        error = error or future.exception()
+                        continue
+                    print('[PHASE] Finish {} in {:.1f}s.'.format(
+                        name, time.time() - start))
+                    done.add(name)
+        if error is not None:
+            raise error
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import re
+import time
+
+
+def parse_version(version):
+    """Turn a server version like '4.4.12' or '5.13-aura' into (major,
+    minor)."""
+    numbers = [int(part) for part in re.findall(r'\d+', version)[:2]]
+    return tuple(numbers + [0] * (2 - len(numbers)))
+
+
+def constraint_statement(label, key, version):
+    """Build the statement creating a uniqueness constraint.
+
+    Parameters
+    ----------
+    label : str
+        Node label.
+    key : str
+        Key property.
+    version : tuple
+        (major, minor) version of the server.
+
+    Returns
+    -------
+    str
+        Cypher statement, a no-op if the constraint exists on 4.1 or later.
+
+    """
+
+    if version >= (4, 4):
+        return ('CREATE CONSTRAINT {0}_{1} IF NOT EXISTS '
+                'FOR (n:{0}) REQUIRE n.{1} IS UNIQUE').format(label, key)
+    if version >= (4, 1):
+        return ('CREATE CONSTRAINT {0}_{1} IF NOT EXISTS '
+                'ON (n:{0}) ASSERT n.{1} IS UNIQUE').format(label, key)
+    return 'CREATE CONSTRAINT ON (n:{0}) ASSERT n.{1} IS UNIQUE'.format(
+            label, key)
+
+
+def index_statement(label, prop, version):
+    """Build the statement creating a property index.
+
+    Parameters
+    ----------
+    label : str
+        Node label.
+    prop : str
+        Indexed property.
+    version : tuple
+        (major, minor) version of the server.
+
+    Returns
+    -------
+    str
+        Cypher statement, a no-op if the index exists on 4.1 or later.
+
+    """
+
+    if version >= (4, 1):
+        return ('CREATE INDEX {0}_{1} IF NOT EXISTS '
+                'FOR (n:{0}) ON (n.{1})').format(label, prop)
+    return 'CREATE INDEX ON :{0}({1})'.format(label, prop)
+
+
+class SchemaManager(object):
+    """Create the constraints and indexes of the graph in load order.
+
+    Uniqueness constraints back the key lookups of MERGE and of every edge
+    phase, so they are created before any data is written. Secondary
+    indexes are not needed during the load and would only slow down writes,
+    they are created once all phases have finished, see
+    :meth:`create_indexes`, and populated in the background until
+    :meth:`await_indexes` returns.
+
+    Parameters
+    ----------
+    connection : :class:`ConnectionManager`
+        Hands out sessions.
+    constraints : list
+        (label, key property) of unique node keys.
+    indexes : list
+        (label, property) of secondary indexes.
+    timeout : int
+        Seconds to wait for index population.
+    interval : int
+        Seconds between checks of index population.
+
+    Attributes
+    ----------
+    _connection : :class:`ConnectionManager`
+        Hands out sessions.
+    _constraints : list
+        (label, key property) of unique node keys.
+    _indexes : list
+        (label, property) of secondary indexes.
+    _timeout : int
+        Seconds to wait for index population.
+    _interval : int
+        Seconds between checks of index population.
+    _version : tuple
+        (major, minor) version of the server, None until first asked.
+
+    """
+
+    def __init__(self, connection, constraints, indexes, timeout=3600,
+                 interval=10):
+        super(SchemaManager, self).__init__()
+        self._connection = connection
+        self._constraints = constraints
+        self._indexes = indexes
+        self._timeout = timeout
+        self._interval = interval
+        self._version = None
+
+    @property
+    def version(self):
+        """tuple: (major, minor) version of the server."""
+        if self._version is None:
+            with self._connection.session() as session:
+                record = session.run(
+                        'CALL dbms.components() YIELD name, versions '
+                        'WHERE name = "Neo4j Kernel" '
+                        'RETURN versions[0] AS version').single()
+            self._version = parse_version(record['version'] if record
+                                          else '')
+        return self._version
+
+    def create_constraints(self):
+        """Create all uniqueness constraints."""
+        self._run([constraint_statement(label, key, self.version)
+                   for label, key in self._constraints])
+
+    def create_indexes(self):
+        """Create all secondary indexes, populated in the background."""
+        self._run([index_statement(label, prop, self.version)
+                   for label, prop in self._indexes])
+
+    def await_indexes(self):
+        """Block until every index is online.
+
+        Raises
+        ------
+        RuntimeError
+            If an index failed to populate.
+
+        """
+
+        if self.version < (4, 2):  # no SHOW INDEXES
+            with self._connection.session() as session:
+                session.run('CALL db.awaitIndexes($timeout)',
+                            timeout=self._timeout).consume()
+            return
+        deadline = time.time() + self._timeout
+        while True:
+            with self._connection.session() as session:
+                states = [(record['name'], record['state'],
+                           record['populationPercent'])
+                          for record in session.run(
+                              'SHOW INDEXES YIELD name, state, '
+                              'populationPercent')]
+            failed = [name for name, state, done in states
+                      if state == 'FAILED']
+            if failed:
+                raise RuntimeError('Index population failed: {}.'.format(
+                    ', '.join(failed)))
+            populating = [(name, done) for name, state, done in states
+                          if state != 'ONLINE']
+            if not populating:
+                return
+            if time.time() > deadline:
+                raise RuntimeError('Indexes still populating after {}s: '
+                                   '{}.'.format(self._timeout, ', '.join(
+                                       name for name, done in populating)))
+            for name, done in populating:
+                print('[SCHEMA] Populating {}, {:.1f}%.'.format(name, done))
+            time.sleep(self._interval)
+
+    def _run(self, statements):
+        """Run schema statements one after the other."""
+        with self._connection.session() as session:
+            for statement in statements:
+                print('[SCHEMA] {}'.format(statement))
+                session.run(statement).consume()
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import os
+import re
+import threading
+
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet output is optional
+    pa = pq = None
+
+from .connection import ConnectionManager
+
+# The Bolt sink hands out sessions of a live server
+BoltSink = ConnectionManager
+
+# UNWIND statements creating or merging one node per item, e.g.,
+# UNWIND $rows AS row CREATE (p:patent {pid: row.pid, ...}) or
+# UNWIND $codes AS code MERGE (c:cpc_group {id: code})
+NODE_STATEMENT = re.compile(
+        r'^UNWIND \$(?P<param>\w+) AS (?P<item>\w+) (?P<verb>CREATE|MERGE) '
+        r'\(\w+:(?P<label>\w+) \{(?P<key>\w+): (?P=item)\b')
+
+# UNWIND statements inserting relationships between existing nodes, see
+# :func:`relationship_batch`
+EDGE_STATEMENT = re.compile(
+        r'^UNWIND \$rows AS row '
+        r'MATCH \(a:(?P<source>\w+) \{(?P<source_key>\w+): row\.source\}\) '
+        r'MATCH \(b:(?P<target>\w+) \{(?P<target_key>\w+): row\.target\}\) '
+        r'(?P<verb>CREATE|MERGE) \(a\)-\[:(?P<rel_type>\w+)\]->\(b\)')
+
+
+class Result(object):
+    """Records returned by a statement, with the parts of the
+    :class:`neo4j.Result` API the loader uses."""
+
+    def __init__(self, records):
+        super(Result, self).__init__()
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def data(self):
+        return list(self._records)
+
+    def consume(self):
+        return None
+
+
+class AsyncResult(Result):
+    """:class:`Result` of an asyncio session."""
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for record in self._records:
+            yield record
+
+    async def single(self):
+        return super(AsyncResult, self).single()
+
+    async def data(self):
+        return super(AsyncResult, self).data()
+
+    async def consume(self):
+        return None
+
+
+class Transaction(object):
+    """Transaction of a :class:`Sink`, statements apply when run."""
+
+    def __init__(self, sink):
+        super(Transaction, self).__init__()
+        self._sink = sink
+
+    def run(self, statement, parameters=None, **kwparameters):
+        return Result(self._sink.execute(statement,
+                                         dict(parameters or {},
+                                              **kwparameters)))
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncTransaction(Transaction):
+    """:class:`Transaction` of an asyncio session."""
+
+    async def run(self, statement, parameters=None, **kwparameters):
+        return AsyncResult(self._sink.execute(statement,
+                                              dict(parameters or {},
+                                                   **kwparameters)))
+
+
+class Session(object):
+    """Session of a :class:`Sink`, with the blocking driver's API.
+
+    Only the API of the supported drivers, neo4j 5.0 and later, is offered,
+    so a call to one they removed, e.g., ``write_transaction``, fails
+    against a sink as it would against a server.
+
+    """
+
+    def __init__(self, sink):
+        super(Session, self).__init__()
+        self._sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, statement, parameters=None, **kwparameters):
+        return Transaction(self._sink).run(statement, parameters,
+                                           **kwparameters)
+
+    def begin_transaction(self):
+        self._sink.begin()
+        return Transaction(self._sink)
+
+    def execute_write(self, work, *args, **kwargs):
+        self._sink.begin()
+        return work(Transaction(self._sink), *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class AsyncSession(object):
+    """Session of a :class:`Sink`, with the asyncio driver's API."""
+
+    def __init__(self, sink):
+        super(AsyncSession, self).__init__()
+        self._sink = sink
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        pass
+
+    async def run(self, statement, parameters=None, **kwparameters):
+        return await AsyncTransaction(self._sink).run(statement, parameters,
+                                                      **kwparameters)
+
+    async def execute_write(self, work, *args, **kwargs):
+        self._sink.begin()
+        return await work(AsyncTransaction(self._sink), *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class Sink(object):
+    """Stand-in for a neo4j server that receives the loader's statements.
+
+    A sink hands out sessions like :class:`ConnectionManager`, so it can
+    replace the Bolt connection of any handler. Node and relationship batch
+    statements, see :data:`NODE_BATCH` and :func:`relationship_batch`, are
+    parsed and passed to :meth:`write_nodes` and :meth:`write_relationships`;
+    every other statement, e.g., schema statements or the per-row fallback,
+    is only counted.
+
+    Attributes
+    ----------
+    version : str
+        Server version reported to :class:`SchemaManager`.
+    statements : :class:`collections.Counter`
+        Number of times each statement was run.
+    rows : :class:`collections.Counter`
+        Number of parameter rows sent with each statement.
+    transactions : int
+        Number of transactions.
+    _lock : :class:`threading.Lock`
+        Serializes statements of concurrent sessions.
+
+    """
+
+    version = '5.0.0'
+
+    def __init__(self):
+        super(Sink, self).__init__()
+        self.statements = collections.Counter()
+        self.rows = collections.Counter()
+        self.transactions = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def session(self, **config):
+        """Open a session."""
+        return Session(self)
+
+    def async_session(self, **config):
+        """Open an asyncio session."""
+        return AsyncSession(self)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+    def begin(self):
+        """Count a transaction."""
+        with self._lock:
+            self.transactions += 1
+
+    def execute(self, statement, parameters):
+        """Apply one statement.
+
+        Parameters
+        ----------
+        statement : str
+            Cypher statement.
+        parameters : dict
+            Statement parameters.
+
+        Returns
+        -------
+        list
+            Records returned by the statement.
+
+        """
+
+        with self._lock:
+            self.statements[statement] += 1
+            if 'dbms.components' in statement:
+                return [{'version': self.version}]
+            match = NODE_STATEMENT.match(statement)
+            if match:
+                items = parameters[match.group('param')]
+                self.rows[statement] += len(items)
+                key = match.group('key')
+                rows = [item if isinstance(item, dict) else {key: item}
+                        for item in items]
+                self.write_nodes(match.group('label'), key, rows,
+                                 match.group('verb') == 'MERGE')
+                return []
+            match = EDGE_STATEMENT.match(statement)
+            if match:
+                rows = parameters['rows']
+                self.rows[statement] += len(rows)
+                matched = self.write_relationships(
+                        (match.group('source'), match.group('source_key')),
+                        (match.group('target'), match.group('target_key')),
+                        match.group('rel_type'), rows,
+                        match.group('verb') == 'MERGE')
+                return [{'matched': matched}]
+            return []
+
+    def write_nodes(self, label, key, rows, merge=False):
+        """Write a batch of nodes.
+
+        Parameters
+        ----------
+        label : str
+            Node label.
+        key : str
+            Key property.
+        rows : list
+            Node properties, one dict per node.
+        merge : bool
+            Skip nodes whose key exists.
+
+        """
+
+        raise NotImplementedError
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        """Write a batch of relationships.
+
+        Parameters
+        ----------
+        source : tuple
+            (label, key property) of the start node.
+        target : tuple
+            (label, key property) of the end node.
+        rel_type : str
+            Relationship type.
+        rows : list
+            Key pairs, dicts with 'source' and 'target'.
+        merge : bool
+            Skip relationships that exist.
+
+        Returns
+        -------
+        int
+            Number of pairs whose endpoints were both found.
+
+        """
+
+        raise NotImplementedError
+
+    def summary(self):
+        """Number of statements, rows and transactions received.
+
+        Returns
+        -------
+        dict
+            Totals in 'statements', 'rows' and 'transactions'.
+
+        """
+
+        return {'statements': sum(self.statements.values()),
+                'rows': sum(self.rows.values()),
+                'transactions': self.transactions}
+
+
+class MemorySink(Sink):
+    """Keep the graph in memory.
+
+    Nodes are keyed by their key property, so relationships only match
+    nodes written before, as on a server with uniqueness constraints. As on
+    such a server, CREATEing a node whose key exists fails, and no node of
+    its batch is written.
+
+    Attributes
+    ----------
+    nodes : dict
+        Label to {key: properties}.
+    relationships : dict
+        (start label, type, end label) to a
+        :class:`collections.Counter` of (start key, end key) pairs.
+
+    """
+
+    def __init__(self):
+        super(MemorySink, self).__init__()
+        self.nodes = collections.defaultdict(dict)
+        self.relationships = collections.defaultdict(collections.Counter)
+
+    def write_nodes(self, label, key, rows, merge=False):
+        nodes = self.nodes[label]
+        if not merge:
+            created = set()
+            for row in rows:
+                if row[key] in nodes or row[key] in created:
+                    raise ValueError(
+                        'Node already exists with label `{}` and property '
+                        '`{}` = {!r}.'.format(label, key, row[key]))
+                created.add(row[key])
+        for row in rows:
+            nodes.setdefault(row[key], dict(row))
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        sources, targets = self.nodes[source[0]], self.nodes[target[0]]
+        pairs = self.relationships[(source[0], rel_type, target[0])]
+        matched = 0
+        for row in rows:
+            if row['source'] not in sources or row['target'] not in targets:
+                continue
+            matched += 1
+            pair = (row['source'], row['target'])
+            if not merge or pair not in pairs:
+                pairs[pair] += 1
+        return matched
+
+    def summary(self):
+        """Number of nodes per label, relationships per (start label, type,
+        end label), statements, rows and transactions."""
+        summary = super(MemorySink, self).summary()
+        summary['nodes'] = {label: len(nodes)
+                            for label, nodes in self.nodes.items()}
+        summary['relationships'] = {
+            '({})-[:{}]->({})'.format(*path): sum(pairs.values())
+            for path, pairs in self.relationships.items()}
+        return summary
+
+
+class FileSink(Sink):
+    """Append nodes and relationships to CSV or Parquet files.
+
+    Nodes go to ``<label>.<fmt>``, relationships to
+    ``<start label>_<type>_<end label>.<fmt>`` with columns 'source' and
+    'target'. Property values are written as text. Endpoints are not
+    checked, every pair counts as matched.
+
+    Parameters
+    ----------
+    opath : str
+        Dir to write files to.
+    fmt : str
+        'csv' or 'parquet', which requires pyarrow.
+
+    Attributes
+    ----------
+    _opath : str
+        Dir to write files to.
+    _fmt : str
+        'csv' or 'parquet'.
+    _columns : dict
+        File name to the columns of its first frame.
+    _writers : dict
+        File name to open :class:`pyarrow.parquet.ParquetWriter`.
+
+    """
+
+    def __init__(self, opath, fmt='csv'):
+        super(FileSink, self).__init__()
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError('Unknown file format {}.'.format(fmt))
+        if fmt == 'parquet' and pq is None:
+            raise ImportError('Parquet output requires pyarrow.')
+        self._opath = opath
+        self._fmt = fmt
+        self._columns = {}
+        self._writers = {}
+        os.makedirs(opath, exist_ok=True)
+
+    def write_nodes(self, label, key, rows, merge=False):
+        self._append(label, pd.DataFrame.from_records(rows))
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        self._append('{}_{}_{}'.format(source[0], rel_type.lower(),
+                                       target[0]),
+                     pd.DataFrame.from_records(rows,
+                                               columns=['source', 'target']))
+        return len(rows)
+
+    def _append(self, name, frame):
+        """Append a frame to file ``name``, in the columns of the first
+        frame written to it, which truncates the file."""
+        path = os.path.join(self._opath, '{}.{}'.format(name, self._fmt))
+        new = name not in self._columns
+        if new:
+            self._columns[name] = list(frame.columns)
+        frame = frame.reindex(columns=self._columns[name]).astype(object)
+        frame = frame.where(frame.notnull(), None).apply(
+                lambda column: column.map(
+                    lambda value: None if value is None else str(value)))
+        if self._fmt == 'csv':
+            frame.to_csv(path, mode='w' if new else 'a', header=new,
+                         index=False)
+            return
+        if new:
+            self._writers[name] = pq.ParquetWriter(path, pa.schema(
+                [(column, pa.string()) for column in frame.columns]))
+        writer = self._writers[name]
+        writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema,
+                                                preserve_index=False))
+
+    def close(self):
+        """Close open Parquet files."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+
+# chunks read ahead of the writer by :func:`prefetch`
+QUEUE_SIZE = 2
+
+# marks the end of a stream in the queue of :func:`prefetch`
+_DONE = object()
+
+
+def prefetch(chunks, size=QUEUE_SIZE):
+    """Read a stream of chunks on a worker thread, a bounded number ahead.
+
+    Decompressing and parsing the next chunks overlaps with writing the
+    current one, and at most ``size`` chunks wait in the queue, so memory
+    stays flat however long the stream is.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Stream of chunks, e.g., of
+        :meth:`PatentsViewHandler.iter_patent_citations`.
+    size : int
+        Maximum number of chunks read ahead.
+
+    Yields
+    ------
+    object
+        Chunks in order. An error of the worker is raised when the chunk
+        it failed on is due.
+
+    """
+
+    buffer = queue.Queue(size)
+    stop = threading.Event()
+
+    def put(item):
+        """Queue an item unless the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as error:
+            put((_DONE, error))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk, error = buffer.get()
+            if error is not None:
+                raise error
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:  # the consumer stopped early or failed
+        stop.set()
+        worker.join()
+
+
+class Stream(object):
+    """Chunks of a table written as one phase.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Chunks in order, e.g., read ahead by :func:`prefetch`.
+    key : str
+        Identity of the whole stream, e.g., :meth:`FrameCache.key` of the
+        table, to checkpoint its rows under. None to not checkpoint.
+
+    Attributes
+    ----------
+    key : str
+        Identity of the whole stream.
+    _chunks : iterable
+        Chunks in order.
+
+    """
+
+    def __init__(self, chunks, key=None):
+        super(Stream, self).__init__()
+        self._chunks = chunks
+        self.key = key
+
+    def __iter__(self):
+        return iter(self._chunks)
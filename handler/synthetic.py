@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# table to columns, in the order of the PatentsView bulk download files
+LAYOUTS = {
+    'patent': ['id', 'type', 'number', 'country', 'date', 'abstract', 'title',
+               'kind', 'num_claims', 'filename', 'withdrawn'],
+    'application': ['id', 'patent_id', 'series_code', 'number', 'country',
+                    'date'],
+    'claim': ['uuid', 'patent_id', 'text', 'dependent', 'sequence',
+              'exemplary'],
+    'foreigncitation': ['uuid', 'patent_id', 'date', 'number', 'country',
+                        'category', 'sequence'],
+    'otherreference': ['uuid', 'patent_id', 'text', 'sequence'],
+    'usapplicationcitation': ['uuid', 'patent_id', 'application_id', 'date',
+                              'name', 'kind', 'number', 'country', 'category',
+                              'sequence'],
+    'assignee': ['id', 'type', 'name_first', 'name_last', 'organization'],
+    'inventor': ['id', 'name_first', 'name_last'],
+    'location': ['id', 'city', 'state', 'country', 'latitude', 'longitude',
+                 'county', 'state_fips', 'county_fips'],
+    'uspatentcitation': ['uuid', 'patent_id', 'citation_id', 'date', 'name',
+                         'kind', 'country', 'category', 'sequence'],
+    'patent_assignee': ['patent_id', 'assignee_id'],
+    'patent_inventor': ['patent_id', 'inventor_id'],
+    'location_assignee': ['location_id', 'assignee_id'],
+    'location_inventor': ['location_id', 'inventor_id'],
+    'cpc_current': ['uuid', 'patent_id', 'section_id', 'subsection_id',
+                    'group_id', 'subgroup_id', 'category', 'sequence'],
+    'uspc_current': ['uuid', 'patent_id', 'mainclass_id', 'subclass_id',
+                     'sequence'],
+    'ipcr': ['uuid', 'patent_id', 'classification_level', 'section',
+             'ipc_class', 'subclass', 'main_group', 'subgroup',
+             'symbol_position', 'classification_value',
+             'classification_status', 'classification_data_source',
+             'action_date', 'ipc_version_indicator', 'sequence'],
+    'nber': ['uuid', 'patent_id', 'category_id', 'subcategory_id'],
+}
+
+# rows of each table in the release the readers were written against, see
+# the docstrings of :class:`PatentsViewHandler`
+RELEASE_ROWS = {
+    'patent': 6819362,
+    'application': 6819362,
+    'claim': 96694251,
+    'foreigncitation': 25374575,
+    'otherreference': 36101604,
+    'usapplicationcitation': 32145240,
+    'assignee': 506284,
+    'inventor': 3772041,
+    'location': 141189,
+    'uspatentcitation': 98207057,
+    'patent_assignee': 6070101,
+    'patent_inventor': 16237888,
+    'location_assignee': 619055,
+    'location_inventor': 16237556,
+    'cpc_current': 36846878,
+    'uspc_current': 22885509,
+    'ipcr': 13854255,
+    'nber': 5105937,
+}
+
+# share of rows the readers drop as invalid, from the same docstrings
+INVALID = {
+    'claim': 0.0265,
+    'uspc_current': 0.0395,
+    'ipcr': 0.0122,
+}
+
+
+class SyntheticPatentsView(object):
+    """Write a synthetic PatentsView dataset for benchmarks.
+
+    Every table :class:`PatentsViewHandler` reads is written as
+    ``<table>.tsv.bz2`` with the column layout of the bulk download files.
+    Row counts are those of the real release, see :data:`RELEASE_ROWS`,
+    times ``scale``. Popularity follows a Zipf law with exponent ``skew``, so
+    a few patents receive most citations, a few assignees own most patents
+    and a few codes classify most patents. Invalid rows, e.g., claims without
+    dependency or uspc codes that are 'No longer published', appear at the
+    rates of the real release, see :data:`INVALID`.
+
+    Parameters
+    ----------
+    opath : str
+        Dir to write the dataset to.
+    scale : float
+        Fraction of the real release, e.g., 0.001 for about 6,800 patents.
+    skew : float
+        Zipf exponent of popularity, 0 for uniform.
+    seed : int
+        Seed of the random generator, the same seed writes the same files.
+
+    Attributes
+    ----------
+    _opath : str
+        Dir to write the dataset to.
+    _scale : float
+        Fraction of the real release.
+    _skew : float
+        Zipf exponent of popularity.
+    _seed : int
+        Seed of the random generator.
+    _rng : :class:`numpy.random.Generator`
+        Random generator.
+    _ids : dict
+        Table to ids of its rows, for tables other tables refer to.
+
+    """
+
+    def __init__(self, opath, scale=0.001, skew=1.1, seed=0):
+        super(SyntheticPatentsView, self).__init__()
+        self._opath = opath
+        self._scale = scale
+        self._skew = skew
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._ids = {}
+        os.makedirs(opath, exist_ok=True)
+
+    def rows(self, table):
+        """Number of rows of a table, at least one."""
+        return max(1, int(round(RELEASE_ROWS[table] * self._scale)))
+
+    def generate(self, tables=None):
+        """Write the dataset, and its parameters and row counts to
+        ``synthetic.json``.
+
+        Parameters
+        ----------
+        tables : list
+            Tables to write, None for all. Tables are always generated in
+            the order of :data:`LAYOUTS` so that the same seed writes the
+            same rows.
+
+        Returns
+        -------
+        dict
+            Table to number of rows written.
+
+        """
+
+        written = {}
+        for table in LAYOUTS:
+            frame = getattr(self, '_' + table)()
+            if tables is None or table in tables:
+                print('Writing {}.tsv.bz2, {} rows.'.format(table, len(frame)))
+                self._write(table, frame)
+                written[table] = len(frame)
+        with open(os.path.join(self._opath, 'synthetic.json'), 'w') as ofp:
+            json.dump({'scale': self._scale, 'skew': self._skew,
+                       'seed': self._seed, 'rows': written}, ofp, indent=1)
+        return written
+
+    def _write(self, table, frame):
+        """Write a frame as ``<table>.tsv.bz2`` in its table's layout."""
+        frame[LAYOUTS[table]].to_csv(
+                os.path.join(self._opath, '{}.tsv.bz2'.format(table)),
+                sep='\t', index=False, quoting=csv.QUOTE_NONE,
+                lineterminator='\n', compression='bz2')
+
+    def _popular(self, n, size):
+        """Draw ``size`` indices of ``n`` items, Zipf distributed over a
+        random order of the items."""
+        weights = 1.0 / np.arange(1, n + 1) ** self._skew
+        order = self._rng.permutation(n)
+        return order[self._rng.choice(n, size=size, p=weights / weights.sum())]
+
+    def _uniform(self, n, size):
+        """Draw ``size`` indices of ``n`` items uniformly."""
+        return self._rng.integers(0, n, size=size)
+
+    def _repeat(self, ids, rows):
+        """Spread ``rows`` rows over ``ids``, Poisson distributed around the
+        mean, in id order.
+
+        Returns
+        -------
+        tuple
+            Ids, one per row, and the sequence of each row within its id.
+
+        """
+
+        counts = self._rng.poisson(rows / len(ids), size=len(ids))
+        repeated = np.repeat(ids, counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        return repeated, np.arange(len(repeated)) - starts
+
+    def _dates(self, size, start='1976-01-01', end='2019-12-31'):
+        """Draw ISO dates between ``start`` and ``end``."""
+        first = np.datetime64(start, 'D')
+        days = (np.datetime64(end, 'D') - first).astype(int)
+        dates = first + self._uniform(days, size).astype('timedelta64[D]')
+        return pd.Series(dates.astype(str))
+
+    def _uuids(self, size):
+        """Row ids like the uuid columns."""
+        return pd.Series(np.arange(size)).map('{:012x}'.format)
+
+    def _invalid(self, table, column):
+        """Blank out the share of ``column`` the readers drop."""
+        mask = self._rng.random(len(column)) < INVALID.get(table, 0.0)
+        column = column.copy()
+        column[mask] = ''
+        return column
+
+    def _patent_ids(self):
+        if 'patent' not in self._ids:
+            n = self.rows('patent')
+            types = self._rng.choice(
+                    ['utility', 'design', 'plant', 'reissue'], size=n,
+                    p=[0.9, 0.08, 0.005, 0.015])
+            prefix = pd.Series(types).map({'utility': '', 'design': 'D',
+                                           'plant': 'PP', 'reissue': 'RE'})
+            number = pd.Series(np.arange(3930271, 3930271 + n)).astype(str)
+            self._ids['patent'] = (prefix + number).values
+            self._ids['patent_type'] = types
+        return self._ids['patent']
+
+    def _patent(self):
+        ids = self._patent_ids()
+        n = len(ids)
+        dates = self._dates(n)
+        bad = self._rng.random(n) < 0.0001  # e.g., 1968-05-00
+        dates[bad] = dates[bad].str[:8] + '00'
+        return pd.DataFrame({
+            'id': ids, 'type': self._ids['patent_type'], 'number': ids,
+            'country': 'US', 'date': dates,
+            'abstract': 'A synthetic abstract.', 'title': 'Synthetic title',
+            'kind': 'B2', 'num_claims': self._rng.poisson(14, n),
+            'filename': 'ipg000101.xml', 'withdrawn': '0'})
+
+    def _application(self):
+        ids = self._patent_ids()
+        n = len(ids)
+        number = pd.Series(np.arange(n)).map('{:08d}'.format)
+        return pd.DataFrame({
+            'id': number.str[:2] + '/' + number.str[2:], 'patent_id': ids,
+            'series_code': self._uniform(17, n).astype(str), 'number': number,
+            'country': 'US', 'date': self._dates(n, end='2018-12-31')})
+
+    def _claim(self):
+        ids, sequence = self._repeat(self._patent_ids(), self.rows('claim'))
+        independent = (sequence == 0) | (self._rng.random(len(ids)) < 0.15)
+        dependent = pd.Series(np.where(independent, '-1', '1'))
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'text': 'A synthetic claim.',
+            'dependent': self._invalid('claim', dependent),
+            'sequence': sequence, 'exemplary': '0'})
+
+    def _citations(self, table, citing):
+        """Rows citing documents outside the patent table, made by a
+        ``citing`` share of the patents."""
+        patents = self._patent_ids()
+        makers = patents[self._rng.permutation(len(patents))[
+            :max(1, int(len(patents) * citing))]]
+        ids, sequence = self._repeat(makers, self.rows(table))
+        return ids, sequence, pd.Series(np.arange(len(ids))).astype(str)
+
+    def _foreigncitation(self):
+        ids, sequence, number = self._citations('foreigncitation', 0.53)
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'date': self._dates(len(ids), '1950-01-01'),
+            'number': 'EP' + number, 'country': 'EP',
+            'category': 'cited by examiner', 'sequence': sequence})
+
+    def _otherreference(self):
+        ids, sequence, number = self._citations('otherreference', 0.44)
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'text': 'Synthetic reference ' + number + ', Journal.',
+            'sequence': sequence})
+
+    def _usapplicationcitation(self):
+        ids, sequence, number = self._citations('usapplicationcitation',
+                                                0.40)
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'application_id': '2005/' + number.str.zfill(7),
+            'date': self._dates(len(ids), '2001-01-01'), 'name': 'Smith',
+            'kind': 'A1', 'number': '2005' + number.str.zfill(7),
+            'country': 'US', 'category': 'cited by applicant',
+            'sequence': sequence})
+
+    def _node_ids(self, table, prefix):
+        if table not in self._ids:
+            self._ids[table] = (prefix + pd.Series(
+                np.arange(self.rows(table))).map('{:07d}'.format)).values
+        return self._ids[table]
+
+    def _assignee(self):
+        ids = self._node_ids('assignee', 'org_')
+        n = len(ids)
+        person = self._rng.random(n) < 0.1
+        number = pd.Series(np.arange(n)).astype(str)
+        return pd.DataFrame({
+            'id': ids, 'type': np.where(person, '4', '2'),
+            'name_first': np.where(person, 'Ann', ''),
+            'name_last': np.where(person, 'Lee ' + number, ''),
+            'organization': np.where(person, '',
+                                     'Synthetic Corp. ' + number + ' ')})
+
+    def _inventor(self):
+        ids = self._node_ids('inventor', 'fl:in_')
+        n = len(ids)
+        return pd.DataFrame({
+            'id': ids,
+            'name_first': self._rng.choice(['Ann', 'Bo', 'Chen', 'Dana'], n),
+            'name_last': 'Doe ' + pd.Series(np.arange(n)).astype(str)})
+
+    def _location(self):
+        ids = self._node_ids('location', 'loc_')
+        n = len(ids)
+        us = self._rng.random(n) < 0.8
+        return pd.DataFrame({
+            'id': ids, 'city': 'City ' + pd.Series(np.arange(n)).astype(str),
+            'state': np.where(us, 'CA', ''),
+            'country': np.where(us, 'US', 'JP'),
+            'latitude': self._rng.uniform(-60, 70, n).round(4),
+            'longitude': self._rng.uniform(-180, 180, n).round(4),
+            'county': np.where(us, 'County', ''),
+            'state_fips': np.where(us, '06', ''),
+            'county_fips': np.where(us, '06085', '')})
+
+    def _uspatentcitation(self):
+        patents = self._patent_ids()
+        n = self.rows('uspatentcitation')
+        ids, sequence = self._repeat(patents, n)
+        cited = patents[self._popular(len(patents), len(ids))].astype(object)
+        old = self._rng.random(len(ids)) < 0.05  # granted before 1976
+        cited[old] = pd.Series(self._uniform(3930271, old.sum())).astype(
+                str).values
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'citation_id': cited, 'date': self._dates(len(ids), '1900-01-01'),
+            'name': 'Smith', 'kind': 'A', 'country': 'US',
+            'category': 'cited by examiner', 'sequence': sequence})
+
+    def _patent_assignee(self):
+        patents = self._patent_ids()
+        n = min(self.rows('patent_assignee'), len(patents))
+        assignees = self._node_ids('assignee', 'org_')
+        return pd.DataFrame({
+            'patent_id': patents[self._rng.permutation(len(patents))[:n]],
+            'assignee_id': assignees[self._popular(len(assignees), n)]})
+
+    def _patent_inventor(self):
+        ids, sequence = self._repeat(self._patent_ids(),
+                                     self.rows('patent_inventor'))
+        inventors = self._node_ids('inventor', 'fl:in_')
+        return pd.DataFrame({
+            'patent_id': ids,
+            'inventor_id': inventors[self._popular(len(inventors), len(ids))]})
+
+    def _location_assignee(self):
+        assignees = self._node_ids('assignee', 'org_')
+        ids, sequence = self._repeat(assignees, self.rows('location_assignee'))
+        locations = self._node_ids('location', 'loc_')
+        return pd.DataFrame({
+            'location_id': locations[self._popular(len(locations), len(ids))],
+            'assignee_id': ids}).drop_duplicates()
+
+    def _location_inventor(self):
+        inventors = self._node_ids('inventor', 'fl:in_')
+        ids, sequence = self._repeat(inventors,
+                                     self.rows('location_inventor'))
+        locations = self._node_ids('location', 'loc_')
+        return pd.DataFrame({
+            'location_id': locations[self._popular(len(locations), len(ids))],
+            'inventor_id': ids}).drop_duplicates()
+
+    def _codes(self, table, levels, fanout):
+        """Draw classifications of every patent from a code tree.
+
+        Parameters
+        ----------
+        table : str
+            Table, for its number of rows.
+        levels : list
+            Functions building the code of a level from the parent code and
+            the child's index.
+        fanout : list
+            Children per code of each level, the top level included.
+
+        Returns
+        -------
+        tuple
+            Patent ids, sequences and one code column per level.
+
+        """
+
+        tree = [['']]
+        for make, children in zip(levels, fanout):
+            tree.append([make(parent, ix) for parent in tree[-1]
+                         for ix in range(children)])
+        leaves = len(tree[-1])
+        ids, sequence = self._repeat(self._patent_ids(), self.rows(table))
+        leaf = self._popular(leaves, len(ids))
+        columns = []
+        for depth, codes in enumerate(tree[1:]):
+            below = int(np.prod(fanout[depth + 1:]))
+            columns.append(np.asarray(codes)[leaf // below])
+        return ids, sequence, columns
+
+    def _cpc_current(self):
+        ids, sequence, (section, subsection, group, subgroup) = self._codes(
+                'cpc_current',
+                [lambda parent, ix: 'ABCDEFGHY'[ix],
+                 lambda parent, ix: '{}{:02d}'.format(parent, ix + 1),
+                 lambda parent, ix: parent + 'BCDFGHJK'[ix],
+                 lambda parent, ix: '{}{}/{:02d}'.format(
+                     parent, ix // 10 + 1, ix % 10 * 2)],
+                [9, 10, 8, 50])
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'section_id': section, 'subsection_id': subsection,
+            'group_id': group, 'subgroup_id': subgroup,
+            'category': np.where(sequence == 0, 'inventional', 'additional'),
+            'sequence': sequence})
+
+    def _uspc_current(self):
+        ids, sequence, (mainclass, subclass) = self._codes(
+                'uspc_current',
+                [lambda parent, ix: '{:03d}'.format(ix + 1),
+                 lambda parent, ix: '{}/{:03d}'.format(parent, ix + 1)],
+                [450, 30])
+        stale = self._rng.random(len(ids)) < INVALID['uspc_current']
+        mainclass = np.where(stale, 'No longer published', mainclass)
+        subclass = np.where(stale, 'No longer published', subclass)
+        return pd.DataFrame({
+            'uuid': self._uuids(len(ids)), 'patent_id': ids,
+            'mainclass_id': mainclass, 'subclass_id': subclass,
+            'sequence': sequence})
+
+    def _ipcr(self):
+        ids, sequence, (section, klass, subclass, group, subgroup) = \
+            self._codes(
+                'ipcr',
+                [lambda parent, ix: 'ABCDEFGH'[ix],
+                 lambda parent, ix: '{:02d}'.format(ix + 1),
+                 lambda parent, ix: 'ABCDEFGH'[ix],
+                 lambda parent, ix: str(ix + 1),
+                 lambda parent, ix: '{:02d}'.format(ix * 2)],
+                [8, 20, 8, 30, 10])
+        n = len(ids)
+        return pd.DataFrame({
+            'uuid': self._uuids(n), 'patent_id': ids,
+            'classification_level': 'A', 'section': section,
+            'ipc_class': klass, 'subclass': subclass,
+            'main_group': self._invalid('ipcr', pd.Series(group)),
+            'subgroup': subgroup,
+            'symbol_position': np.where(sequence == 0, 'F', 'L'),
+            'classification_value': 'I', 'classification_status': 'B',
+            'classification_data_source': 'H',
+            'action_date': self._dates(n, '2006-01-01'),
+            'ipc_version_indicator': '2006-01-01', 'sequence': sequence})
+
+    def _nber(self):
+        patents = self._patent_ids()
+        n = min(self.rows('nber'), len(patents))
+        ids = patents[self._rng.permutation(len(patents))[:n]]
+        category = self._popular(6, n) + 1
+        return pd.DataFrame({
+            'uuid': self._uuids(n), 'patent_id': ids,
+            'category_id': category.astype(str),
+            'subcategory_id': (category * 10 + self._uniform(
+                6, n) + 1).astype(str)})
@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+
+import bz2
+import collections
+import concurrent.futures
+import gzip
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import zipfile
+
+import pandas as pd
+try:
+    import indexed_bzip2
+except ImportError:  # single stream bz2 tables are read on one core
+    indexed_bzip2 = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# table file suffix to format, from the fastest to read to the slowest
+FORMATS = [
+    ('.tsv', 'plain'),
+    ('.tsv.zst', 'zstd'),
+    ('.tsv.gz', 'gzip'),
+    ('.tsv.zip', 'zip'),
+    ('.zip', 'zip'),
+    ('.tsv.bz2', 'bz2'),
+]
+
+# leading bytes of compressed files
+MAGIC = [
+    (b'BZh', 'bz2'),
+    (b'PK\x03\x04', 'zip'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+# suffix of the file recording the original of a converted table
+SOURCE_SUFFIX = '.source.json'
+
+# header of a bz2 stream, i.e., magic, block size and start of first block
+_BZ2_STREAM = re.compile(rb'BZh[1-9]1AY&SY')
+
+# bytes of a table parsed by one task of :func:`parse_table`
+RANGE_BYTES = 1 << 26
+
+# options of :func:`pandas.read_csv` for PatentsView tables, whose fields
+# are never quoted, so every newline ends a record
+READ_OPTIONS = {'sep': '\t', 'quoting': 3, 'lineterminator': '\n',
+                'dtype': str}
+
+
+def find_table(ipath, table):
+    """Path of a table in any of :data:`FORMATS`.
+
+    If the table is found in several formats, e.g., the original bz2 and a
+    copy written by :func:`convert_table`, the most recently modified one is
+    read. A copy counts as old as its original while the original's size
+    and mtime match those recorded by :func:`convert_table`, so the fastest
+    to read of the two is read, and is ignored once they no longer match,
+    e.g., after a new release was downloaded with its server mtime kept.
+
+    Parameters
+    ----------
+    ipath : str
+        Dir to PatentsView data.
+    table : str
+        Table name, e.g., 'uspatentcitation'.
+
+    Returns
+    -------
+    str
+        Path of the table, of its bz2 file if it is not found.
+
+    """
+
+    found = []
+    for rank, (suffix, fmt) in enumerate(FORMATS):
+        path = os.path.join(ipath, table + suffix)
+        if not os.path.exists(path):
+            continue
+        mtime = os.stat(path).st_mtime_ns
+        source = _read_source(path)
+        if source is not None:
+            original = os.path.join(ipath, source['name'])
+            if os.path.exists(original):
+                stat = os.stat(original)
+                if (stat.st_size, stat.st_mtime_ns) != \
+                        (source['size'], source['mtime']):
+                    continue  # a stale copy of a replaced original
+                mtime = stat.st_mtime_ns
+        found.append((mtime, -rank, path))
+    if not found:
+        return os.path.join(ipath, table + '.tsv.bz2')
+    return max(found)[2]
+
+
+def detect(path):
+    """Format of a table file by its leading bytes, 'plain' if none of
+    :data:`MAGIC` matches."""
+    with open(path, 'rb') as ifp:
+        head = ifp.read(4)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return 'plain'
+
+
+def open_table(path, threads=None):
+    """Open a table file of any format for reading.
+
+    bz2 files made of many streams, e.g., by pbzip2, are decompressed in
+    parallel, see :class:`ParallelBZ2Reader`, and single stream ones with
+    ``indexed_bzip2`` if it is installed. zip files must hold one file,
+    zstd files require ``zstandard``. Every file supports ``readline``.
+
+    Parameters
+    ----------
+    path : str
+        Table file.
+    threads : int
+        Threads decompressing bz2, None for one per core.
+
+    Returns
+    -------
+    file
+        Binary file of the decompressed table.
+
+    """
+
+    fmt = detect(path)
+    if fmt == 'bz2':
+        return _open_bz2(path, threads or os.cpu_count() or 1)
+    if fmt == 'gzip':
+        return gzip.open(path, 'rb')
+    if fmt == 'zip':
+        archive = zipfile.ZipFile(path)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) != 1:
+            archive.close()
+            raise ValueError('{} holds {} files, expected one table.'.format(
+                path, len(members)))
+        try:  # the member keeps the file open until it is closed
+            return archive.open(members[0])
+        finally:
+            archive.close()
+    if fmt == 'zstd':
+        if zstandard is None:
+            raise ImportError('zstd tables require zstandard.')
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+                open(path, 'rb'), closefd=True), 1 << 20)
+    return open(path, 'rb')
+
+
+def convert_table(path, fmt=None, threads=None):
+    """Write a table once in a format that reads at disk speed.
+
+    The original file is kept, and its name, size and mtime are recorded
+    next to the copy, in ``<copy>`` + :data:`SOURCE_SUFFIX`.
+    :func:`find_table` picks the copy on later runs while the original is
+    unchanged.
+
+    Parameters
+    ----------
+    path : str
+        Table file, e.g., found by :func:`find_table`.
+    fmt : str
+        'zstd', 'gzip' or 'plain', None for 'zstd' if ``zstandard`` is
+        installed, else 'plain'.
+    threads : int
+        Threads decompressing bz2, see :func:`open_table`.
+
+    Returns
+    -------
+    str
+        Path of the copy.
+
+    """
+
+    if fmt is None:
+        fmt = 'zstd' if zstandard is not None else 'plain'
+    if fmt not in ('zstd', 'gzip', 'plain'):
+        raise ValueError('Unknown table format {}.'.format(fmt))
+    suffixes = dict((fmt, suffix) for suffix, fmt in reversed(FORMATS))
+    base = path
+    for suffix, _ in FORMATS:
+        if path.endswith(suffix):
+            base = path[:-len(suffix)]
+            break
+    target = base + suffixes[fmt]
+    print('Converting {} to {}.'.format(path, target))
+    stat = os.stat(path)
+    tmp = target + '.tmp'
+    with open_table(path, threads) as ifp, _create(tmp, fmt) as ofp:
+        shutil.copyfileobj(ifp, ofp, 1 << 22)
+    with open(tmp + SOURCE_SUFFIX, 'w') as ofp:
+        json.dump({'name': os.path.basename(path), 'size': stat.st_size,
+                   'mtime': stat.st_mtime_ns}, ofp)
+    os.replace(tmp, target)
+    os.replace(tmp + SOURCE_SUFFIX, target + SOURCE_SUFFIX)
+    return target
+
+
+def _read_source(path):
+    """Original of a copy written by :func:`convert_table`, as recorded,
+    None for an original or a copy of an earlier version."""
+    try:
+        with open(path + SOURCE_SUFFIX, 'r') as ifp:
+            return json.load(ifp)
+    except (OSError, ValueError):
+        return None
+
+
+def _create(path, fmt):
+    """Open a table file of ``fmt`` for writing."""
+    if fmt == 'zstd':
+        if zstandard is None:
+            raise ImportError('zstd tables require zstandard.')
+        return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(
+                open(path, 'wb'), closefd=True)
+    if fmt == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=1)
+    return open(path, 'wb')
+
+
+def _open_bz2(path, threads):
+    """Open a bz2 table, decompressing on ``threads`` threads if possible."""
+    if threads > 1:
+        offsets = bz2_streams(path)
+        if len(offsets) > 2:
+            return io.BufferedReader(
+                    ParallelBZ2Reader(path, offsets, threads), 1 << 20)
+        if indexed_bzip2 is not None:
+            return indexed_bzip2.open(path, parallelization=threads)
+    return bz2.open(path, 'rb')
+
+
+def bz2_streams(path):
+    """Offsets of the streams of a bz2 file.
+
+    Parameters
+    ----------
+    path : str
+        bz2 file.
+
+    Returns
+    -------
+    list
+        Start of each stream, followed by the size of the file.
+
+    """
+
+    size = os.path.getsize(path)
+    if not size:
+        return [0, 0]
+    with open(path, 'rb') as ifp, \
+            mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offsets = [match.start() for match in _BZ2_STREAM.finditer(data)]
+    if not offsets or offsets[0]:
+        offsets.insert(0, 0)
+    return offsets + [size]
+
+
+class ParallelBZ2Reader(io.RawIOBase):
+    """Decompress the streams of a multi-stream bz2 file on a thread pool.
+
+    ``bz2`` releases the GIL while decompressing, so threads decompress
+    streams on all cores. Streams are returned in order, and at most two per
+    thread are held decompressed.
+
+    Parameters
+    ----------
+    path : str
+        bz2 file.
+    offsets : list
+        Start of each stream, followed by the size of the file, see
+        :func:`bz2_streams`.
+    threads : int
+        Threads decompressing streams.
+
+    Attributes
+    ----------
+    _ifp : file
+        The bz2 file.
+    _data : :class:`mmap.mmap`
+        The bz2 file, mapped.
+    _pool : :class:`concurrent.futures.ThreadPoolExecutor`
+        Decompresses streams.
+    _streams : iterator
+        (start, stop) of the streams not submitted yet.
+    _pending : :class:`collections.deque`
+        Futures of the streams submitted, in order.
+    _ahead : int
+        Maximum number of streams submitted ahead.
+    _buffer : memoryview
+        Decompressed bytes not read yet.
+
+    """
+
+    def __init__(self, path, offsets, threads):
+        super(ParallelBZ2Reader, self).__init__()
+        self._ifp = open(path, 'rb')
+        self._data = mmap.mmap(self._ifp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pool = concurrent.futures.ThreadPoolExecutor(threads)
+        self._streams = iter(zip(offsets[:-1], offsets[1:]))
+        self._pending = collections.deque()
+        self._ahead = 2 * threads
+        self._buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not len(self._buffer):
+            self._submit()
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(cancel_futures=True)
+            self._buffer = memoryview(b'')
+            self._pending.clear()
+            self._data.close()
+            self._ifp.close()
+        super(ParallelBZ2Reader, self).close()
+
+    def _submit(self):
+        """Submit streams until :attr:`_ahead` are pending."""
+        while len(self._pending) < self._ahead:
+            try:
+                start, stop = next(self._streams)
+            except StopIteration:
+                return
+            self._pending.append(self._pool.submit(bz2.decompress,
+                                                   self._data[start:stop]))
+
+
+def parse_table(path, processes, clean=None, renumber=True,
+                range_bytes=RANGE_BYTES, **kwargs):
+    """Parse a table on a process pool, one byte range per task.
+
+    PatentsView fields are never quoted, ``quoting=3``, so every newline
+    ends a record and ranges are cut right after one. Ranges of plain
+    tables are read by the workers themselves, other tables are
+    decompressed here, see :func:`open_table`, and their ranges sent to the
+    workers. Each worker parses and cleans its range, and returns the
+    result as a frame, i.e., columnar blocks. At most two ranges per
+    process are in flight.
+
+    Parameters
+    ----------
+    path : str
+        Table file.
+    processes : int
+        Worker processes.
+    clean : callable
+        ``clean(frame)``, run by the workers on each range, e.g., to drop
+        invalid rows or count them. A module level function, so it can be
+        sent to the workers. None to return ranges as parsed.
+    renumber : bool
+        Number rows of each range on from the rows of the ranges before it,
+        as :func:`pandas.read_csv` would. Off for results not indexed by
+        row, e.g., counts.
+    range_bytes : int
+        Bytes per range, before aligning to records.
+    kwargs : dict
+        Passed to :func:`pandas.read_csv`, e.g., ``usecols``, besides
+        :data:`READ_OPTIONS`.
+
+    Yields
+    ------
+    object
+        Result of ``clean`` of each range, in order.
+
+    """
+
+    with open_table(path) as ifp:
+        header = ifp.readline()
+    names = header.rstrip(b'\n').decode('utf-8').split('\t')
+    if detect(path) == 'plain':
+        tasks = ((path, start, stop)
+                 for start, stop in _ranges(path, len(header), range_bytes))
+    else:
+        tasks = ((block, 0, len(block))
+                 for block in _blocks(path, len(header), range_bytes))
+    pending = collections.deque()
+    offset = submitted = 0
+    with concurrent.futures.ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context('spawn')) \
+            as pool:
+        for source, start, stop in tasks:
+            pending.append(pool.submit(_parse_range, source, start, stop,
+                                       names, clean, kwargs))
+            submitted += 1
+            if len(pending) < 2 * processes:
+                continue
+            result, rows = pending.popleft().result()
+            yield _renumber(result, offset) if renumber else result
+            offset += rows
+        if not submitted:  # an empty table, parse its header only
+            pending.append(pool.submit(_parse_range, b'', 0, 0, names,
+                                       clean, kwargs))
+        while pending:
+            result, rows = pending.popleft().result()
+            yield _renumber(result, offset) if renumber else result
+            offset += rows
+
+
+def _ranges(path, start, range_bytes):
+    """(start, stop) of ranges of a plain table, stopping after a newline.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as ifp:
+        while start < size:
+            ifp.seek(min(start + range_bytes, size))
+            ifp.readline()  # to the end of the record cut
+            stop = min(ifp.tell(), size)
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+
+def _blocks(path, skip, range_bytes):
+    """Yield ranges of a compressed table, decompressed, each ending after a
+    newline."""
+    with open_table(path) as ifp:
+        ifp.read(skip)
+        while True:
+            block = ifp.read(range_bytes)
+            if not block:
+                return
+            yield block + ifp.readline()
+
+
+def _parse_range(source, start, stop, names, clean, kwargs):
+    """Parse and clean one range in a worker, see :func:`parse_table`.
+
+    Returns
+    -------
+    tuple
+        Result of ``clean``, and the number of records parsed.
+
+    """
+
+    if isinstance(source, str):
+        with open(source, 'rb') as ifp:
+            ifp.seek(start)
+            source = ifp.read(stop - start)
+    try:
+        frame = pd.read_csv(io.BytesIO(source), header=None, names=names,
+                            **dict(READ_OPTIONS, **kwargs))
+    except pd.errors.EmptyDataError:
+        frame = pd.DataFrame({name: pd.Series(dtype=object)
+                              for name in kwargs.get('usecols') or names})
+    rows = len(frame)
+    return (clean(frame) if clean else frame), rows
+
+
+def _renumber(frame, offset):
+    """Shift the row numbers of a range by the rows before it."""
+    frame.index = frame.index + offset
+    return frame
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class Vocabulary(object):
+    """Integer codes of the keys of one kind of node, e.g., patent ids.
+
+    Keys are coded in the order they are first seen, and codes are never
+    reassigned, so frames encoded at different times, e.g., patent nodes and
+    the patent ids of citations, share codes. Encoded columns are
+    :class:`pandas.Categorical`, i.e., integer codes against
+    :attr:`categories`, and decode to strings with ``astype(str)``.
+
+    Codes are looked up in a dict that grows by the keys not seen yet, and
+    keys are appended to an array of spare capacity, so coding a chunk, see
+    :meth:`codes`, costs the distinct keys of the chunk rather than the
+    whole vocabulary. The :class:`pandas.CategoricalDtype` of the keys, whose
+    construction checks every key, is built when first asked for once keys
+    were added, e.g., once per table read rather than once per chunk.
+
+    Parameters
+    ----------
+    keys : iterable
+        Keys to code first.
+
+    Attributes
+    ----------
+    _codes : dict
+        Key to code.
+    _keys : :class:`numpy.ndarray`
+        Keys in the order of their codes, followed by spare capacity.
+    _categories : :class:`pandas.Index`
+        Keys seen so far, a view of :attr:`_keys`.
+    _dtype : :class:`pandas.CategoricalDtype`
+        Categories of the keys seen so far, None until built after keys
+        were added.
+    _lock : :class:`threading.Lock`
+        Guards the keys against concurrent phases.
+
+    """
+
+    def __init__(self, keys=()):
+        super(Vocabulary, self).__init__()
+        self._codes = {}
+        self._keys = np.empty(1024, dtype=object)
+        self._categories = pd.Index([], dtype=object)
+        self._dtype = None
+        self._lock = threading.Lock()
+        self.codes(keys)
+
+    def __len__(self):
+        return len(self._codes)
+
+    @property
+    def categories(self):
+        """Keys in the order of their codes."""
+        return self._categories
+
+    @property
+    def dtype(self):
+        """:class:`pandas.CategoricalDtype` of the keys seen so far."""
+        with self._lock:
+            if self._dtype is None:
+                self._dtype = pd.CategoricalDtype(self._categories,
+                                                  ordered=False)
+            return self._dtype
+
+    def encode(self, keys):
+        """Code keys, adding those not seen yet.
+
+        Parameters
+        ----------
+        keys : iterable
+            Keys, missing ones are coded as missing. Categorical keys, e.g.,
+            of a cached frame or of a chunk encoded before, are coded by
+            their categories.
+
+        Returns
+        -------
+        :class:`pandas.Categorical`
+            Keys as codes against the keys seen so far.
+
+        """
+
+        if isinstance(getattr(keys, 'dtype', None), pd.CategoricalDtype):
+            keys = pd.Categorical(keys)
+            if np.may_share_memory(np.asarray(keys.categories), self._keys):
+                return self.recode(keys)  # coded by this vocabulary
+        return pd.Categorical.from_codes(self.codes(keys), dtype=self.dtype)
+
+    def codes(self, keys):
+        """Code keys, adding those not seen yet, without building
+        :attr:`dtype`, e.g., for the chunks of a table.
+
+        Parameters
+        ----------
+        keys : iterable
+            Keys, see :meth:`encode`.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            int64 codes, -1 for missing keys.
+
+        """
+
+        if isinstance(getattr(keys, 'dtype', None), pd.CategoricalDtype):
+            keys = pd.Categorical(keys)
+            if np.may_share_memory(np.asarray(keys.categories), self._keys):
+                return keys.codes.astype(np.int64)  # coded by this vocabulary
+            codes, uniques = keys.codes, keys.categories
+        else:
+            codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+        with self._lock:
+            known = len(self._codes)
+            mapped = np.fromiter(
+                (self._codes.setdefault(key, len(self._codes))
+                 for key in uniques.tolist()),
+                dtype=np.int64, count=len(uniques))
+            if len(self._codes) > known:
+                self._append(uniques[mapped >= known], known)
+        # -1, i.e., missing, picks the trailing -1
+        return np.append(mapped, -1)[codes]
+
+    def recode(self, values):
+        """Express values encoded earlier against the keys seen so far,
+        e.g., to concatenate chunks encoded at different times.
+
+        Parameters
+        ----------
+        values : :class:`pandas.Categorical`
+            Codes of this vocabulary.
+
+        Returns
+        -------
+        :class:`pandas.Categorical`
+            The same codes against :attr:`dtype`.
+
+        """
+
+        values = pd.Categorical(values)
+        dtype = self.dtype
+        if values.dtype is dtype:
+            return values
+        return pd.Categorical.from_codes(values.codes, dtype=dtype)
+
+    def _append(self, keys, start):
+        """Store new keys from code ``start`` on, :attr:`dtype` is built
+        again when next asked for."""
+
+        stop = start + len(keys)
+        if stop > len(self._keys):
+            grown = np.empty(max(stop, 2 * len(self._keys)), dtype=object)
+            grown[:start] = self._keys[:start]
+            self._keys = grown
+        self._keys[start:stop] = np.asarray(keys, dtype=object)
+        self._categories = pd.Index(self._keys[:stop], dtype=object,
+                                    copy=False)
+        self._dtype = None
@@ -3,13 +3,175 @@
 """Load PatentsView dataset into neo4j database."""
 
 import argparse
+import json
+import os
 
+from handler.admin_import import AdminImportHandler
+from handler.async_handler import AsyncNeo4jHandler
+from handler.delta import DeltaHandler
+from handler.metrics import LoadMetrics
 from handler.neo4j_handler import Neo4jHandler
+from handler.patentsview_handler import PatentsViewHandler
+from handler.sinks import FileSink, MemorySink
 
 if __name__ == "__main__":
     pparser = argparse.ArgumentParser()
     pparser.add_argument('credential', help='Auth file')
     pparser.add_argument('data', help='path to raw patent data')
+    pparser.add_argument('--export', metavar='DIR',
+                         help=('write CSV files for neo4j-admin import to DIR '
+                               'instead of loading through bolt'))
+    pparser.add_argument('--delta', metavar='PREVIOUS',
+                         help=('apply only the difference to the release '
+                               'whose data dir is PREVIOUS'))
+    phases = [name for name, method, requires in Neo4jHandler.PHASES]
+    pparser.add_argument('--uri', default='bolt://localhost:7687',
+                         help='bolt URI of the database')
+    pparser.add_argument('--pool-size', type=int, default=100,
+                         help='maximum number of pooled connections')
+    pparser.add_argument('--fetch-size', type=int,
+                         help='records fetched per pull')
+    pparser.add_argument('--lifetime', type=int, default=3600,
+                         help='seconds before a pooled connection is retired')
+    pparser.add_argument('--workers', type=int, default=1,
+                         help='number of phases running at the same time')
+    pparser.add_argument('--writers', type=int, default=1,
+                         help=('sessions writing the relationships of each '
+                               'edge phase at the same time, partitioned by '
+                               'endpoint, without --async'))
+    pparser.add_argument('--only', nargs='+', choices=phases, metavar='PHASE',
+                         help=('run only these phases, one of '
+                               '{}'.format(', '.join(phases))))
+    pparser.add_argument('--skip', nargs='+', choices=phases, default=[],
+                         metavar='PHASE', help='skip phases already loaded')
+    pparser.add_argument('--checkpoint', metavar='FILE',
+                         help=('checkpoint manifest, defaults to '
+                               'checkpoint.json in the data dir with the '
+                               'bolt sink, none with other sinks'))
+    pparser.add_argument('--resume', action='store_true',
+                         help='skip rows committed by a previous run')
+    pparser.add_argument('--batch-size', type=int, default=10000,
+                         help='rows per transaction to start each phase with')
+    pparser.add_argument('--latency', type=float, default=1.0,
+                         help=('commit latency in seconds that batch sizes '
+                               'are adjusted to'))
+    pparser.add_argument('--schema', action='store_true',
+                         help=('only create constraints and indexes, e.g., '
+                               'after --export and neo4j-admin import'))
+    pparser.add_argument('--sink', default='bolt',
+                         choices=['bolt', 'memory', 'csv', 'parquet'],
+                         help=('where statements go, memory and file sinks '
+                               'need no server'))
+    pparser.add_argument('--sink-dir', metavar='DIR',
+                         help=('dir of csv and parquet sinks, defaults to '
+                               'sink in the data dir'))
+    pparser.add_argument('--compact', action='store_true',
+                         help=('link patents only to the most specific cpc, '
+                               'uspc and nber codes, and codes to their '
+                               'parents by SUBCLASS_OF'))
+    pparser.add_argument('--stream', action='store_true',
+                         help=('stream citations, patent-inventor and '
+                               'inventor-location edges and cpc codes in '
+                               'chunks instead of reading them as a whole'))
+    pparser.add_argument('--chunksize', type=int, default=1000000,
+                         help='rows per chunk, with --stream')
+    pparser.add_argument('--categorical', action='store_true',
+                         help=('hold node keys as integer codes and '
+                               'classification codes as categoricals in '
+                               'memory'))
+    pparser.add_argument('--processes', type=int, default=1,
+                         help=('processes parsing each table in byte '
+                               'ranges, 1 to parse on one core'))
+    pparser.add_argument('--async', dest='use_async', action='store_true',
+                         help=('load through the asyncio driver, requires '
+                               'neo4j 5.0 or later'))
+    pparser.add_argument('--in-flight', type=int, default=4,
+                         help=('transactions committing at the same time per '
+                               'phase, with --async'))
+    pparser.add_argument('--prefetch', type=int, default=2,
+                         help=('prepared batches waiting for a transaction '
+                               'per phase, with --async'))
+    pparser.add_argument('--metrics', metavar='FILE',
+                         help=('append per batch and per phase metrics to '
+                               'FILE as JSON lines'))
+    pparser.add_argument('--textfile', metavar='FILE',
+                         help=('keep load metrics in FILE in the Prometheus '
+                               'text format, e.g., for node_exporter'))
+    pparser.add_argument('--list-cache', action='store_true',
+                         help='list cached frames and their sizes, and exit')
+    pparser.add_argument('--refresh-cache', action='store_true',
+                         help=('rebuild cached frames whose tables or '
+                               'transform changed, and exit'))
+    pparser.add_argument('--convert-tables', nargs='?', const='default',
+                         choices=['default', 'zstd', 'gzip', 'plain'],
+                         metavar='FORMAT',
+                         help=('write every table once as zstd, gzip or '
+                               'plain TSV, read by later runs, and exit'))
     args = pparser.parse_args()
-    handler = Neo4jHandler(args.credential, args.data)
-    handler.load_patentsview()
+    if args.list_cache:
+        entries = PatentsViewHandler(args.data).cache.entries()
+        for entry in entries:
+            print('{name:<24} {format:<8} {bytes:>14,} bytes {rows:>12} rows'
+                  '{stale}'.format(**dict(entry, rows=entry['rows'] or '?',
+                                          stale=' STALE' * entry['stale'])))
+        print('{} frames, {:,} bytes.'.format(
+            len(entries), sum(entry['bytes'] for entry in entries)))
+    elif args.refresh_cache:
+        print('Rebuilt {}.'.format(
+            ', '.join(PatentsViewHandler(args.data).refresh_cache()) or
+            'nothing'))
+    elif args.convert_tables:
+        fmt = None if args.convert_tables == 'default' else args.convert_tables
+        print('Converted {}.'.format(
+            ', '.join(PatentsViewHandler(args.data).convert_tables(fmt)) or
+            'nothing'))
+    elif args.export:
+        AdminImportHandler(args.data, args.export,
+                           compact=args.compact).export_patentsview()
+    else:
+        # a run into another sink must not touch the checkpoint of the
+        # server, which a later --resume would trust
+        checkpoint = args.checkpoint or (
+            os.path.join(args.data, 'checkpoint.json')
+            if args.sink == 'bolt' else None)
+        config = {'uri': args.uri, 'pool_size': args.pool_size,
+                  'fetch_size': args.fetch_size, 'lifetime': args.lifetime,
+                  'checkpoint': checkpoint,
+                  'resume': args.resume, 'batch_size': args.batch_size,
+                  'latency': args.latency, 'compact': args.compact,
+                  'stream': args.stream, 'chunksize': args.chunksize,
+                  'categorical': args.categorical,
+                  'processes': args.processes, 'writers': args.writers}
+        if args.sink == 'memory':
+            config['sink'] = MemorySink()
+        elif args.sink != 'bolt':
+            config['sink'] = FileSink(args.sink_dir or os.path.join(
+                args.data, 'sink'), args.sink)
+        if args.metrics or args.textfile:
+            config['metrics'] = LoadMetrics(args.metrics, args.textfile)
+        try:
+            if args.schema:
+                with Neo4jHandler(args.credential, args.data,
+                                  **config) as handler:
+                    handler.create_schema()
+            elif args.delta:
+                with DeltaHandler(args.credential, args.data, args.delta,
+                                  **config) as handler:
+                    handler.load_delta()
+            elif args.use_async:
+                with AsyncNeo4jHandler(args.credential, args.data,
+                                       in_flight=args.in_flight,
+                                       prefetch=args.prefetch,
+                                       **config) as handler:
+                    handler.load_patentsview(args.workers, args.only,
+                                             args.skip)
+            else:
+                with Neo4jHandler(args.credential, args.data,
+                                  **config) as handler:
+                    handler.load_patentsview(args.workers, args.only,
+                                             args.skip)
+            if args.sink != 'bolt':
+                print(json.dumps(config['sink'].summary(), indent=1))
+        finally:
+            if 'metrics' in config:
+                config['metrics'].close()
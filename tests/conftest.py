@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# import the handler package from the checkout, also in spawned workers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import inspect
+
+import pytest
+
+from handler.async_handler import AsyncNeo4jHandler
+from handler.neo4j_handler import Neo4jHandler
+from handler.sinks import MemorySink
+from handler.synthetic import SyntheticPatentsView
+
+
+class CrashingSink(MemorySink):
+    """Fails the ``crash``-th BELONGS_TO batch, like a killed loader."""
+
+    def __init__(self, crash=None):
+        super(CrashingSink, self).__init__()
+        self.crash = crash
+        self.batches = 0
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        if rel_type == 'BELONGS_TO':
+            self.batches += 1
+            if self.batches == self.crash:
+                raise RuntimeError('killed')
+        return super(CrashingSink, self).write_relationships(
+            source, target, rel_type, rows, merge)
+
+
+@pytest.fixture(scope='module')
+def release(tmp_path_factory):
+    data = str(tmp_path_factory.mktemp('release'))
+    SyntheticPatentsView(data, 0.0001, seed=11).generate()
+    return data
+
+
+def load(data, sink, only, **kwargs):
+    with AsyncNeo4jHandler(None, data, sink=sink, batch_size=100,
+                           in_flight=3, **kwargs) as handler:
+        handler.load_patentsview(only=only)
+    return sink
+
+
+def test_streamed_classification_resumes_with_other_chunks(release,
+                                                           tmp_path):
+    only = ['patent', 'cpc']
+    expected = load(release, MemorySink(), only).relationships
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    sink = CrashingSink(crash=6)
+    with pytest.raises(RuntimeError):
+        load(release, sink, only, stream=True, chunksize=200,
+             checkpoint=checkpoint)
+    sink.crash = None
+    load(release, sink, ['cpc'], stream=True, chunksize=700,
+         checkpoint=checkpoint, resume=True)
+    assert set(sink.relationships) == set(expected)
+    for path, pairs in expected.items():
+        assert set(sink.relationships[path]) == set(pairs)
+        assert set(sink.relationships[path].values()) == {1}
+
+
+def test_async_load_matches_sync_load(release):
+    expected = MemorySink()
+    with Neo4jHandler(None, release, sink=expected) as handler:
+        handler.load_patentsview()
+    sink = load(release, MemorySink(), None)
+    assert sink.nodes == expected.nodes
+    assert sink.relationships == expected.relationships
+
+
+def test_codes_are_merged_in_batches(release):
+    sink = load(release, MemorySink(), ['patent', 'cpc'])
+    statement = 'UNWIND $rows AS code MERGE (c:cpc_subgroup {id: code})'
+    assert sink.rows[statement] == len(sink.nodes['cpc_subgroup']) > 100
+    assert sink.statements[statement] > 1
+    assert not inspect.iscoroutinefunction(AsyncNeo4jHandler._merge_codes)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from handler.batching import AdaptiveBatcher, gaps, oversized
+
+
+class OversizedError(Exception):
+    code = 'Neo.TransientError.General.MemoryPoolOutOfMemoryError'
+
+
+def test_slices_skip_committed_rows():
+    frame = pd.DataFrame({'a': range(10)})
+    batcher = AdaptiveBatcher(3, min_size=1)
+    slices = [(start, stop, list(batch['a']))
+              for start, stop, batch in batcher.slices(frame, [[2, 6]])]
+    assert slices == [(0, 2, [0, 1]), (6, 9, [6, 7, 8]), (9, 10, [9])]
+    assert gaps([[0, 2], [5, 7]], 6) == [(2, 5)]
+
+
+def test_size_follows_commit_latency():
+    batcher = AdaptiveBatcher(100, target=1.0, min_size=10, max_size=150)
+    batcher.record(100, 0.1)  # fast, grow up to max_size
+    assert batcher.size == 150
+    batcher.record(50, 0.1)  # a short last batch says nothing
+    assert batcher.size == 150
+    batcher.record(150, 3.0)  # slow, shrink in proportion
+    assert batcher.size == 50
+    batcher.record(50, 0.75)  # within target
+    assert batcher.size == 50
+    for _ in range(5):
+        batcher.shrink()
+    assert batcher.size == 10
+
+
+def test_rejected_batch_is_split_until_it_fits():
+    batcher = AdaptiveBatcher(8, min_size=1)
+    written = []
+
+    def write(batch):
+        if len(batch) > 2:
+            raise OversizedError()
+        written.append(list(batch))
+        return len(batch)
+
+    assert batcher.write(write, list(range(8))) == [2, 2, 2, 2]
+    assert written == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert batcher.size < 8
+    frame = pd.DataFrame({'a': range(3)})
+    assert sum(batcher.write(lambda batch: len(batch), frame)) == 3
+
+
+@pytest.mark.parametrize('error, rows', [(ValueError, 8),
+                                         (OversizedError, 1)])
+def test_errors_that_splitting_cannot_fix_are_raised(error, rows):
+    batcher = AdaptiveBatcher(8, min_size=1)
+    assert oversized(error()) == (error is OversizedError)
+
+    def write(batch):
+        raise error()
+
+    with pytest.raises(error):
+        batcher.write(write, list(range(rows)))
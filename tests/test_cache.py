@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+
+from handler.cache import FrameCache
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'date': pd.to_datetime(['2001-01-02'] * 5),
+                         'kind': pd.Categorical(list('aabab')),
+                         'num_claims': range(5)},
+                        index=pd.Index(['p{}'.format(i) for i in range(5)],
+                                       name='pid'))
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather', 'pickle'])
+def test_frames_roundtrip_in_every_format(tmp_path, frame, fmt):
+    cache = FrameCache(str(tmp_path), fmt, row_group_size=2)
+    assert cache.load('patent') is None
+    cache.save('patent', frame)
+    assert os.path.exists(cache.path('patent'))
+    pd.testing.assert_frame_equal(cache.load('patent'), frame)
+    pd.testing.assert_frame_equal(cache.load('patent', ['num_claims']),
+                                  frame[['num_claims']])
+    parts = list(cache.iter_frames('patent', ['kind']))
+    assert [len(part) for part in parts] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(parts), frame[['kind']])
+
+
+def test_legacy_pickles_are_converted_on_first_use(tmp_path, frame):
+    cache = FrameCache(str(tmp_path), 'parquet')
+    frame.to_pickle(cache.path('patent', 'pickle'), compression='bz2')
+    assert cache.exists('patent')
+    pd.testing.assert_frame_equal(cache.load('patent', ['kind']),
+                                  frame[['kind']])
+    assert os.path.exists(cache.path('patent'))
+    assert not os.path.exists(cache.path('patent', 'pickle'))
+    pd.testing.assert_frame_equal(cache.load('patent'), frame)
+    assert [entry['format'] for entry in cache.entries()] == ['parquet']
+
+
+FRAMES = {'patent': (1, ['patent.tsv'], []),
+          'claims': (1, ['claims.tsv'], ['patent'])}
+
+
+def cache_of(path, frames=FRAMES):
+    return FrameCache(str(path), 'parquet', frames=frames)
+
+
+@pytest.fixture
+def cached(tmp_path, frame):
+    for source in ['patent.tsv', 'claims.tsv']:
+        (tmp_path / source).write_text('id\np0\n')
+    cache = cache_of(tmp_path)
+    cache.save('patent', frame)
+    cache.save('claims', frame)
+    return tmp_path
+
+
+def test_changed_sources_invalidate_frames_and_dependents(cached):
+    assert cache_of(cached).stale() == []
+    (cached / 'claims.tsv').write_text('id\np0\np1\n')
+    assert cache_of(cached).stale() == ['claims']
+    (cached / 'patent.tsv').write_text('id\np1\np2\n')
+    cache = cache_of(cached)
+    assert cache.stale() == ['patent', 'claims']
+    assert cache.load('claims') is None
+    assert cache.exists('claims')
+
+
+def test_bumped_versions_invalidate_frames_and_dependents(cached):
+    frames = dict(FRAMES, patent=(2, ['patent.tsv'], []))
+    assert cache_of(cached, frames).stale() == ['patent', 'claims']
+    frames = dict(FRAMES, claims=(2, ['claims.tsv'], ['patent']))
+    assert cache_of(cached, frames).stale() == ['claims']
+
+
+def test_frames_without_an_entry_are_adopted_if_newer(cached):
+    os.remove(str(cached / 'cache.json'))
+    cache = cache_of(cached)
+    source = str(cached / 'patent.tsv')
+    old = os.path.getmtime(cache.path('patent')) - 60
+    os.utime(source, (old, old))
+    assert cache.valid('patent')
+    assert cache.stale() == []
+    assert cache_of(cached).valid('patent')  # recorded in the manifest
+    os.remove(str(cached / 'cache.json'))
+    new = os.path.getmtime(cache.path('claims')) + 60
+    os.utime(str(cached / 'claims.tsv'), (new, new))
+    cache = cache_of(cached)
+    assert not cache.valid('claims')
+    assert cache.valid('patent')
+    assert cache.load('claims') is None
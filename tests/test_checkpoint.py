@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from handler.checkpoint import CheckpointManifest
+from handler.neo4j_handler import NODE_BATCH, Neo4jHandler, merge_statement
+from handler.sinks import MemorySink
+
+
+def test_rows_pending_at_a_crash_are_in_doubt(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    manifest = CheckpointManifest(path)
+    manifest.begin('patent', None, 'key')
+    assert not manifest.write('patent', 0, 10)
+    manifest.commit('patent', 0, 10)
+    manifest.write('patent', 10, 20)  # committed, but not recorded
+    manifest = CheckpointManifest(path, resume=True)
+    assert manifest.begin('patent', None, 'key') == [[0, 10]]
+    assert manifest.write('patent', 10, 15)
+    assert manifest.write('patent', 15, 25)
+    assert not manifest.write('patent', 25, 30)
+
+
+def test_batch_committed_before_a_crash_is_merged_on_resume(tmp_path,
+                                                             monkeypatch):
+    path = str(tmp_path / 'checkpoint.json')
+    inventors = pd.DataFrame(
+        {'inventor_name': ['name {}'.format(i) for i in range(250)]},
+        index=pd.Index(['i{}'.format(i) for i in range(250)],
+                       name='inventor_id'))
+    sink = MemorySink()
+
+    def load(resume):
+        handler = Neo4jHandler(None, str(tmp_path), sink=sink,
+                               checkpoint=path, resume=resume,
+                               batch_size=100)
+
+        def write(tx, chunk):
+            handler.create_inventor_node_batch(
+                    tx, handler._inventor_records(chunk))
+
+        with sink.session() as session:
+            handler._write_batches(session, inventors, write, 'inventor')
+
+    def crash(self, phase, start, stop):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Neo4jHandler, '_commit_batch', crash)
+    with pytest.raises(KeyboardInterrupt):
+        load(False)
+    monkeypatch.undo()
+    assert len(sink.nodes['inventor']) == 100
+    load(True)
+    assert len(sink.nodes['inventor']) == 250
+    assert sink.rows[NODE_BATCH['inventor']] == 100 + 150
+    assert sink.rows[merge_statement(NODE_BATCH['inventor'])] == 100
+
+
+def test_doubt_is_cleared_once_rows_are_committed(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    manifest = CheckpointManifest(path)
+    manifest.begin('patent', None, 'key')
+    manifest.write('patent', 0, 10)
+    manifest.write('patent', 10, 20)  # neither recorded as committed
+    manifest = CheckpointManifest(path, resume=True)
+    manifest.begin('patent', None, 'key')
+    assert manifest.write('patent', 0, 15)
+    manifest.commit('patent', 0, 15)
+    assert manifest._phases['patent']['doubt'] == [[15, 20]]
+    assert manifest.write('patent', 15, 25)
+    manifest.commit('patent', 15, 25)
+    assert 'doubt' not in manifest._phases['patent']
+    manifest = CheckpointManifest(path, resume=True)
+    assert manifest.begin('patent', None, 'key') == [[0, 25]]
+    assert not manifest.write('patent', 25, 30)
+    assert 'doubt' not in manifest._phases['patent']
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from handler.delta import diff_edges, diff_nodes
+
+
+def _chunks(frame, size):
+    return lambda: [frame.iloc[start:start + size]
+                    for start in range(0, len(frame), size)]
+
+
+def test_diff_nodes_in_chunks():
+    old = pd.DataFrame({'type': ['utility', 'design', 'utility'],
+                        'claims': [3, 1, 2]},
+                       index=pd.Index(['p1', 'p2', 'p3'], name='pid'))
+    new = pd.DataFrame({'type': ['utility', 'design', 'plant'],
+                        'claims': [3.0, 4.0, 1.0]},
+                       index=pd.Index(['p1', 'p3', 'p4'], name='pid'))
+    added, removed, changed = diff_nodes(_chunks(old, 2), _chunks(new, 1))
+    assert added.index.tolist() == ['p4']
+    assert removed['pid'].tolist() == ['p2']
+    assert changed.index.tolist() == ['p3']
+
+
+def test_diff_edges_in_chunks():
+    columns = ['patent_id', 'cpc_group']
+    old = pd.DataFrame({'patent_id': ['p1', 'p1', 'p2', 'p2'],
+                        'cpc_group': ['A01', 'B02', 'A01', 'A01']})
+    new = pd.DataFrame({'patent_id': ['p1', 'p2', 'p3', 'p3'],
+                        'cpc_group': pd.Categorical(['A01', 'A01', 'C03',
+                                                     'C03'])})
+    added, removed = diff_edges(_chunks(old, 3), _chunks(new, 2), columns)
+    assert added.values.tolist() == [['p3', 'C03']]
+    assert removed.values.tolist() == [['p1', 'B02']]
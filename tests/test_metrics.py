@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from handler.metrics import LATENCY_BUCKETS, LoadMetrics, payload_size
+
+
+def test_payload_size_counts_bytes():
+    rows = [{'name': u'Müller', 'city': u'Zürich'}] * 4
+    assert payload_size({'rows': rows}) == len('rows') + len(json.dumps(
+        rows, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def test_payload_size_scales_sampled_rows():
+    rows = [{'pid': str(i).zfill(7)} for i in range(10000)]
+    exact = len(json.dumps(rows, separators=(',', ':')))
+    assert payload_size({'rows': rows}) == pytest.approx(exact, rel=0.01)
+
+
+def test_latencies_are_bucketed(tmp_path):
+    textfile = str(tmp_path / 'load.prom')
+    with LoadMetrics(textfile=textfile) as metrics:
+        for i in range(1000):
+            metrics.record('patent', 10, 0.001 * (i + 1))
+        summary = metrics.summary('patent')
+    assert len(metrics._phases['patent']['latencies']) == \
+        len(LATENCY_BUCKETS) + 1
+    assert summary['latency']['max'] == pytest.approx(1.0)
+    assert summary['latency']['p50'] == pytest.approx(0.5, rel=0.2)
+    assert summary['latency']['p99'] == pytest.approx(0.99, rel=0.2)
+    with open(textfile) as ifp:
+        lines = ifp.read().splitlines()
+    assert ('patentsview_load_transaction_latency_seconds_bucket'
+            '{phase="patent",le="+Inf"} 1000') in lines
+    assert ('patentsview_load_transaction_latency_seconds_count'
+            '{phase="patent"} 1000') in lines
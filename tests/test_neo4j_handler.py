@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from handler.neo4j_handler import (NODE_BATCH, Neo4jHandler,
+                                   classification_triples, relationship_batch)
+from handler.patentsview_handler import HIERARCHICAL, PatentsViewHandler
+from handler.sinks import MemorySink
+from handler.synthetic import SyntheticPatentsView
+
+NODES = ['patent', 'assignee', 'inventor', 'location']
+
+
+class RecordingSink(MemorySink):
+    """Keeps the parameters of statements it does not parse, e.g., of the
+    per-row fallback."""
+
+    def __init__(self):
+        super(RecordingSink, self).__init__()
+        self.parameters = []
+
+    def execute(self, statement, parameters):
+        records = super(RecordingSink, self).execute(statement, parameters)
+        if statement.startswith('CREATE'):
+            self.parameters.append(parameters)
+        return records
+
+
+@pytest.fixture(scope='module')
+def release(tmp_path_factory):
+    data = str(tmp_path_factory.mktemp('release'))
+    SyntheticPatentsView(data, 0.00005, seed=7).generate()
+    return data
+
+
+def test_node_batches_hold_every_node(release):
+    sink = MemorySink()
+    with Neo4jHandler(None, release, sink=sink, batch_size=100) as handler:
+        handler.load_patentsview(only=NODES)
+    frames = PatentsViewHandler(release)
+    for label in NODES:
+        nodes = getattr(frames, 'construct_{}_nodes'.format(label))()
+        assert sink.rows[NODE_BATCH[label]] == len(nodes)
+        assert sink.statements[NODE_BATCH[label]] <= len(nodes) // 100 + 1
+    patents = frames.construct_patent_nodes()
+    assert len(patents) > 200
+    assert sink.statements[NODE_BATCH['patent']] > 1
+    assert set(sink.nodes['patent']) == set(patents.index)
+
+
+@pytest.mark.parametrize('label', NODES)
+def test_node_batches_match_per_row_statements(release, label):
+    batched, single = MemorySink(), RecordingSink()
+    for sink, unwind in [(batched, True), (single, False)]:
+        with Neo4jHandler(None, release, sink=sink) as handler:
+            getattr(handler, 'create_{}_nodes'.format(label))(unwind=unwind)
+    key = NODE_BATCH[label].split('{', 1)[1].split(':', 1)[0]
+    assert len(single.parameters) == len(batched.nodes[label])
+    for parameters in single.parameters:
+        assert batched.nodes[label][parameters[key]] == parameters
+
+
+EDGES = [
+    ('citation', 'construct_patent_citations', ('patent_id', 'citation_id'),
+     'patent', 'CITES', 'patent'),
+    ('patent_assignee', 'construct_patent_assignee_edges',
+     ('assignee_id', 'patent_id'), 'assignee', 'OWNS', 'patent'),
+    ('patent_inventor', 'construct_patent_inventor_edges',
+     ('inventor_id', 'patent_id'), 'inventor', 'INVENTS', 'patent'),
+    ('assignee_location', 'construct_assignee_location_edges',
+     ('assignee_id', 'location_id'), 'assignee', 'LOCATES_AT', 'location'),
+    ('inventor_location', 'construct_inventor_location_edges',
+     ('inventor_id', 'location_id'), 'inventor', 'LOCATES_AT', 'location'),
+]
+
+
+def test_edge_batches_link_existing_endpoints_once(release, capsys):
+    sink = MemorySink()
+    with Neo4jHandler(None, release, sink=sink, batch_size=100) as handler:
+        handler.load_patentsview(
+                only=NODES + [phase for phase, _, _, _, _, _ in EDGES])
+    frames = PatentsViewHandler(release)
+    for phase, construct, columns, source, rel_type, target in EDGES:
+        edges = getattr(frames, construct)()[list(columns)]
+        edges = edges.apply(lambda column: column.astype(str).str.strip())
+        found = edges[columns[0]].isin(list(sink.nodes[source])) & \
+            edges[columns[1]].isin(list(sink.nodes[target]))
+        pairs = sink.relationships[(source, rel_type, target)]
+        assert set(pairs) == set(map(tuple, edges[found].values))
+        assert set(pairs.values()) == {1}
+        if phase == 'citation':
+            assert 'Dropped {} citations'.format((~found).sum()) in \
+                capsys.readouterr().out
+
+
+def test_relationship_batch_creates_or_merges():
+    merge = relationship_batch(('inventor', 'inventor_id'),
+                               ('patent', 'pid'), 'INVENTS')
+    create = relationship_batch(('inventor', 'inventor_id'),
+                                ('patent', 'pid'), 'INVENTS', create=True)
+    assert merge.startswith('UNWIND $rows AS row ')
+    assert 'MERGE (a)-[:INVENTS]->(b)' in merge
+    assert create == merge.replace('MERGE', 'CREATE')
+    sink = MemorySink()
+    with sink.session() as session:
+        session.run(NODE_BATCH['inventor'],
+                    rows=[{'inventor_id': 'i1', 'inventor_name': 'ada'}])
+        session.run(NODE_BATCH['patent'], rows=[{'pid': 'p1'}])
+        rows = [{'source': 'i1', 'target': 'p1'},
+                {'source': 'i1', 'target': 'p2'}]
+        assert session.run(merge, rows=rows).single()['matched'] == 1
+        session.run(merge, rows=rows)
+        session.run(create, rows=rows)
+    assert sink.relationships[('inventor', 'INVENTS', 'patent')] == \
+        {('i1', 'p1'): 2}
+
+
+def test_classification_triples_are_distinct_per_level():
+    data = pd.DataFrame({'patent_id': ['p1', 'p1', 'p1', 'p2'],
+                         'section': ['A', 'A', 'B', 'A'],
+                         'group': ['A1', 'A2', 'B1', 'A1']})
+    triples = classification_triples(data, ['section', 'group'])
+    assert list(triples['level'].cat.categories) == ['section', 'group']
+    assert list(map(tuple, triples.values)) == [
+        ('p1', 'section', 'A'), ('p1', 'section', 'B'),
+        ('p2', 'section', 'A'), ('p1', 'group', 'A1'),
+        ('p1', 'group', 'A2'), ('p1', 'group', 'B1'), ('p2', 'group', 'A1')]
+
+
+def classifications(frames, scheme):
+    """Patent classifications of ``scheme``, one column per level."""
+    nodes, data = getattr(frames, 'construct_{}_nodes'.format(scheme))()
+    return data
+
+
+@pytest.mark.parametrize('scheme', sorted(Neo4jHandler.LEVELS))
+def test_patents_belong_to_each_code_once(release, scheme):
+    sink = MemorySink()
+    with Neo4jHandler(None, release, sink=sink, batch_size=100) as handler:
+        handler.load_patentsview(only=['patent', scheme])
+    data = classifications(PatentsViewHandler(release), scheme)
+    data = data[data['patent_id'].isin(list(sink.nodes['patent']))]
+    for level in Neo4jHandler.LEVELS[scheme]:
+        pairs = sink.relationships[('patent', 'BELONGS_TO', level)]
+        expected = data[['patent_id', level]].astype(str).drop_duplicates()
+        assert len(pairs) == len(expected) > 0
+        assert set(pairs) == set(map(tuple, expected.values))
+        assert set(pairs.values()) == {1}
+
+
+@pytest.mark.parametrize('scheme', sorted(Neo4jHandler.LEVELS))
+def test_compact_schema_rolls_up_to_the_default_edges(release, scheme):
+    default, compact = MemorySink(), MemorySink()
+    for sink, flag in [(default, False), (compact, True)]:
+        with Neo4jHandler(None, release, sink=sink, batch_size=100,
+                          compact=flag) as handler:
+            handler.load_patentsview(only=['patent', scheme])
+    levels = Neo4jHandler.LEVELS[scheme]
+    if scheme not in HIERARCHICAL:
+        assert compact.relationships == default.relationships
+        return
+    pairs = set(compact.relationships[('patent', 'BELONGS_TO', levels[-1])])
+    for child, parent in reversed(list(zip(levels[1:], levels))):
+        assert not compact.relationships[('patent', 'BELONGS_TO', parent)]
+        edges = compact.relationships[(child, 'SUBCLASS_OF', parent)]
+        assert set(edges.values()) == {1}
+        parents = dict(list(edges))
+        assert len(parents) == len(edges)
+        pairs = {(patent, parents[code]) for patent, code in pairs}
+        assert pairs == set(
+            default.relationships[('patent', 'BELONGS_TO', parent)])
+
+
+class CrashingSink(MemorySink):
+    """Fails the ``crash``-th CITES batch, like a killed loader."""
+
+    def __init__(self, crash=None):
+        super(CrashingSink, self).__init__()
+        self.crash = crash
+        self.batches = 0
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        if rel_type == 'CITES':
+            self.batches += 1
+            if self.batches == self.crash:
+                raise RuntimeError('killed')
+        return super(CrashingSink, self).write_relationships(
+            source, target, rel_type, rows, merge)
+
+
+def test_streamed_citations_resume_with_other_chunks(release, tmp_path):
+    only = ['patent', 'citation']
+    expected = MemorySink()
+    with Neo4jHandler(None, release, sink=expected) as handler:
+        handler.load_patentsview(only=only)
+    expected = expected.relationships[('patent', 'CITES', 'patent')]
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    sink = CrashingSink(crash=4)
+    with pytest.raises(RuntimeError):
+        with Neo4jHandler(None, release, sink=sink, batch_size=100,
+                          stream=True, chunksize=250,
+                          checkpoint=checkpoint) as handler:
+            handler.load_patentsview(only=only)
+    cited = sink.relationships[('patent', 'CITES', 'patent')]
+    assert 0 < len(cited) < len(expected)
+    sink.crash = None
+    with Neo4jHandler(None, release, sink=sink, batch_size=100,
+                      stream=True, chunksize=700, checkpoint=checkpoint,
+                      resume=True) as handler:
+        handler.load_patentsview(only=['citation'])
+    assert set(cited) == set(expected)
+    assert all(cited[pair] <= count for pair, count in expected.items())
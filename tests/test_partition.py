@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+import pytest
+
+from handler.neo4j_handler import Neo4jHandler
+from handler.partition import diagonal_rounds, pairing_rounds
+from handler.sinks import MemorySink
+from handler.synthetic import SyntheticPatentsView
+
+
+@pytest.mark.parametrize('partitions', [1, 3, 4])
+def test_diagonal_rounds_never_share_a_partition(partitions):
+    rounds = diagonal_rounds(partitions)
+    cells = [cell for tasks in rounds for task in tasks for cell in task]
+    assert sorted(cells) == sorted(
+        itertools.product(range(partitions), repeat=2))
+    for tasks in rounds:
+        starts = [start for task in tasks for start, end in task]
+        ends = [end for task in tasks for start, end in task]
+        assert len(set(starts)) == len(starts)
+        assert len(set(ends)) == len(ends)
+
+
+@pytest.mark.parametrize('partitions', [2, 4, 6])
+def test_pairing_rounds_never_share_a_partition(partitions):
+    rounds = pairing_rounds(partitions)
+    cells = [cell for tasks in rounds for task in tasks for cell in task]
+    assert sorted(cells) == sorted(
+        itertools.product(range(partitions), repeat=2))
+    for tasks in rounds:
+        touched = [{p for cell in task for p in cell} for task in tasks]
+        assert sum(len(nodes) for nodes in touched) == \
+            len(set.union(*touched))
+
+
+class OversizedError(Exception):
+    code = 'Neo.TransientError.General.MemoryPoolOutOfMemoryError'
+
+
+class RejectingSink(MemorySink):
+    """Rejects the ``reject``-th relationship batch as too large."""
+
+    def __init__(self, reject):
+        super(RejectingSink, self).__init__()
+        self.reject = reject
+        self.batches = 0
+
+    def write_relationships(self, source, target, rel_type, rows,
+                            merge=True):
+        self.batches += 1
+        if self.batches == self.reject:
+            raise OversizedError()
+        return super(RejectingSink, self).write_relationships(
+            source, target, rel_type, rows, merge)
+
+
+def load_citations(data, sink):
+    with Neo4jHandler(None, data, sink=sink, batch_size=1000,
+                      checkpoint=None) as handler:
+        handler.load_patentsview(only=['patent'])
+        handler.create_citation_relationships(deduplicated=True, writers=3)
+    return sink.relationships[('patent', 'CITES', 'patent')]
+
+
+def test_rejected_cell_is_split_without_rewriting_others(tmp_path):
+    data = str(tmp_path)
+    SyntheticPatentsView(data, 0.00005, seed=5).generate()
+    expected = load_citations(data, MemorySink())
+    sink = RejectingSink(reject=5)
+    cited = load_citations(data, sink)
+    assert cited == expected
+    assert sink.batches > 5
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from handler.patentsview_handler import _count_claims, _rechunk, _sum_counts
+from handler.vocabulary import Vocabulary
+
+
+def test_sum_counts_adds_patents_spanning_chunks():
+    chunks = [pd.Series([2, 1], index=['p1', 'p2']),
+              pd.Series([3, 4], index=['p2', 'p3']),
+              pd.Series([5], index=['p1'])]
+    counts = _sum_counts(chunks, Vocabulary(), ['records'])
+    assert counts['records'].to_dict() == {'p1': 7, 'p2': 4, 'p3': 4}
+
+
+def test_sum_counts_of_columns_by_shared_codes():
+    vocabulary = Vocabulary(['p0'])  # coded, but never counted
+    chunks = [pd.DataFrame({'a': [1], 'b': [0]}, index=['p1']),
+              pd.DataFrame({'a': [1, 2], 'b': [3, 4]}, index=['p0', 'p1'])]
+    counts = _sum_counts(chunks, vocabulary, ['a', 'b'])
+    assert counts.to_dict('index') == {'p0': {'a': 1, 'b': 3},
+                                       'p1': {'a': 3, 'b': 4}}
+
+
+def test_claims_of_patents_spanning_chunks():
+    claims = pd.DataFrame({'patent_id': ['p1', 'p1', 'p2', 'p2', 'p1', None],
+                           'dependent': ['-1', '1', '-1', None, '2', '-1']})
+    chunks = [_count_claims(claims.iloc[:3]), _count_claims(claims.iloc[3:])]
+    counts = _sum_counts(chunks, Vocabulary(), ['dependent', 'independent'])
+    assert counts.to_dict('index') == {'p1': {'dependent': 2,
+                                              'independent': 1},
+                                       'p2': {'dependent': 0,
+                                              'independent': 1}}
+
+
+def test_rechunk_cuts_and_joins_ranges():
+    frame = pd.DataFrame({'patent_id': ['p{}'.format(i) for i in range(10)]})
+    ranges = [frame.iloc[:1], frame.iloc[1:7], frame.iloc[7:7],
+              frame.iloc[7:10]]
+    chunks = list(_rechunk(ranges, 4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert pd.concat(chunks).equals(frame)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pandas as pd
+import pytest
+
+from handler.neo4j_handler import Neo4jHandler
+from handler.scheduler import PhaseScheduler
+from handler.sinks import MemorySink
+
+
+def scheduler(log, workers=1, fail=()):
+    lock = threading.Lock()
+
+    def phase(name):
+        def run():
+            if name in fail:
+                raise RuntimeError(name)
+            with lock:
+                log.append(name)
+        return run
+
+    phases = PhaseScheduler(workers)
+    for name, method, requires in Neo4jHandler.PHASES:
+        phases.add(name, phase(name), requires)
+    return phases
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_phases_run_after_their_requirements(workers):
+    log = []
+    scheduler(log, workers).run()
+    assert sorted(log) == sorted(name for name, _, _ in Neo4jHandler.PHASES)
+    for name, method, requires in Neo4jHandler.PHASES:
+        for required in requires:
+            assert log.index(required) < log.index(name)
+
+
+def test_only_and_skip_count_left_out_phases_as_done():
+    log = []
+    phases = scheduler(log)
+    assert phases.order(only=['patent_inventor', 'inventor']) == \
+        ['inventor', 'patent_inventor']
+    assert 'patent' not in phases.order(skip=['patent'])
+    phases.run(only=['citation', 'patent'], skip=['patent'])
+    assert log == ['citation']
+    with pytest.raises(ValueError):
+        phases.order(only=['nonexistent'])
+
+
+def test_failed_phase_stops_new_phases():
+    log = []
+    with pytest.raises(RuntimeError):
+        scheduler(log, fail=['patent']).run(
+                only=['patent', 'inventor', 'patent_inventor'])
+    assert log == []
+
+
+class DriverSixSession(object):
+    """Session exposing only the managed transactions of neo4j 6."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._session.execute_write(work, *args, **kwargs)
+
+
+def test_batches_commit_through_execute_write(tmp_path):
+    sink = MemorySink()
+    inventors = pd.DataFrame(
+        {'inventor_name': ['ada', 'bob']},
+        index=pd.Index(['i1', 'i2'], name='inventor_id'))
+    handler = Neo4jHandler(None, str(tmp_path), sink=sink)
+
+    def write(tx, chunk):
+        handler.create_inventor_node_batch(tx,
+                                           handler._inventor_records(chunk))
+
+    with sink.session() as session:
+        handler._write_batches(DriverSixSession(session), inventors, write,
+                               'inventor')
+    assert sorted(sink.nodes['inventor']) == ['i1', 'i2']
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from handler.schema import (SchemaManager, constraint_statement,
+                            index_statement, parse_version)
+from handler.sinks import MemorySink
+
+
+@pytest.mark.parametrize('version, expected', [
+    ('3.5.35', (3, 5)), ('4.4.12', (4, 4)), ('5.13-aura', (5, 13)),
+    ('5', (5, 0)), ('', (0, 0))])
+def test_parse_version(version, expected):
+    assert parse_version(version) == expected
+
+
+@pytest.mark.parametrize('version, expected', [
+    ((3, 5), 'CREATE CONSTRAINT ON (n:patent) ASSERT n.pid IS UNIQUE'),
+    ((4, 1), 'CREATE CONSTRAINT patent_pid IF NOT EXISTS '
+             'ON (n:patent) ASSERT n.pid IS UNIQUE'),
+    ((4, 3), 'CREATE CONSTRAINT patent_pid IF NOT EXISTS '
+             'ON (n:patent) ASSERT n.pid IS UNIQUE'),
+    ((4, 4), 'CREATE CONSTRAINT patent_pid IF NOT EXISTS '
+             'FOR (n:patent) REQUIRE n.pid IS UNIQUE'),
+    ((5, 0), 'CREATE CONSTRAINT patent_pid IF NOT EXISTS '
+             'FOR (n:patent) REQUIRE n.pid IS UNIQUE')])
+def test_constraint_statement_follows_the_server_version(version, expected):
+    assert constraint_statement('patent', 'pid', version) == expected
+
+
+@pytest.mark.parametrize('version, expected', [
+    ((3, 5), 'CREATE INDEX ON :patent(date)'),
+    ((4, 0), 'CREATE INDEX ON :patent(date)'),
+    ((4, 1), 'CREATE INDEX patent_date IF NOT EXISTS '
+             'FOR (n:patent) ON (n.date)'),
+    ((5, 0), 'CREATE INDEX patent_date IF NOT EXISTS '
+             'FOR (n:patent) ON (n.date)')])
+def test_index_statement_follows_the_server_version(version, expected):
+    assert index_statement('patent', 'date', version) == expected
+
+
+@pytest.mark.parametrize('server', ['3.5.35', '4.4.12', '5.13.0'])
+def test_schema_manager_runs_the_statements_of_its_server(server):
+    sink = MemorySink()
+    sink.version = server
+    schema = SchemaManager(sink, [('patent', 'pid'), ('assignee', 'id')],
+                           [('patent', 'date')], interval=0)
+    schema.create_constraints()
+    schema.create_indexes()
+    schema.await_indexes()
+    version = parse_version(server)
+    assert schema.version == version
+    for statement in [constraint_statement('patent', 'pid', version),
+                      constraint_statement('assignee', 'id', version),
+                      index_statement('patent', 'date', version)]:
+        assert sink.statements[statement] == 1
+    awaited = [statement for statement in sink.statements
+               if 'awaitIndexes' in statement or 'SHOW INDEXES' in statement]
+    assert len(awaited) == 1
+    assert ('awaitIndexes' in awaited[0]) == (version < (4, 2))
+    assert [count for statement, count in sink.statements.items()
+            if 'dbms.components' in statement] == [1]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from handler.neo4j_handler import NODE_BATCH, Neo4jHandler
+from handler.patentsview_handler import PatentsViewHandler
+from handler.sinks import MemorySink
+from handler.synthetic import SyntheticPatentsView
+
+
+def test_phases_into_memory_sink(tmp_path):
+    data = str(tmp_path)
+    SyntheticPatentsView(data, 0.00005, seed=3).generate()
+    sink = MemorySink()
+    with Neo4jHandler(None, data, sink=sink) as handler:
+        handler.load_patentsview(
+                only=['patent', 'inventor', 'patent_inventor'])
+    frames = PatentsViewHandler(data)
+    patents = frames.construct_patent_nodes()
+    inventors = frames.construct_inventor_nodes()
+    pairs = frames.construct_patent_inventor_edges().drop_duplicates()
+    pairs = pairs[pairs['inventor_id'].isin(inventors.index) &
+                  pairs['patent_id'].isin(patents.index)]
+    summary = sink.summary()
+    assert summary['nodes'] == {'patent': len(patents),
+                                'inventor': len(inventors)}
+    assert summary['relationships'] == {
+        '(inventor)-[:INVENTS]->(patent)': len(pairs)}
+    assert 0 < len(pairs) < len(frames.construct_patent_inventor_edges())
+
+
+def test_memory_sink_rejects_existing_node_keys():
+    sink = MemorySink()
+    with sink.session() as session:
+        session.run(NODE_BATCH['inventor'],
+                    rows=[{'inventor_id': 'i1', 'inventor_name': 'ada'}])
+        with pytest.raises(ValueError):
+            session.run(NODE_BATCH['inventor'],
+                        rows=[{'inventor_id': 'i2', 'inventor_name': 'bob'},
+                              {'inventor_id': 'i1', 'inventor_name': 'cy'}])
+    assert sink.nodes['inventor'] == {
+        'i1': {'inventor_id': 'i1', 'inventor_name': 'ada'}}
+
+
+def test_sessions_offer_only_the_supported_driver_api():
+    sink = MemorySink()
+    with sink.session() as session:
+        assert not hasattr(session, 'write_transaction')
+        assert not hasattr(session, 'read_transaction')
+        session.execute_write(lambda tx: tx.run(
+                NODE_BATCH['inventor'],
+                rows=[{'inventor_id': 'i1', 'inventor_name': 'ada'}]))
+    assert list(sink.nodes['inventor']) == ['i1']
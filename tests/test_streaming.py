@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from handler.streaming import Stream, prefetch
+
+
+def test_prefetch_keeps_the_order_of_chunks():
+    stream = Stream(prefetch(iter(range(50)), size=2), key='table')
+    assert list(stream) == list(range(50))
+    assert stream.key == 'table'
+
+
+def test_prefetch_raises_errors_when_their_chunk_is_due():
+    def chunks():
+        yield 0
+        yield 1
+        raise ValueError('corrupt')
+
+    read = []
+    with pytest.raises(ValueError):
+        for chunk in prefetch(chunks()):
+            read.append(chunk)
+    assert read == [0, 1]
+
+
+def test_prefetch_stops_reading_when_the_consumer_stops():
+    read = []
+
+    def chunks():
+        for chunk in range(100):
+            read.append(chunk)
+            yield chunk
+
+    for chunk in prefetch(chunks(), size=2):
+        if chunk == 3:
+            break
+    assert len(read) < 10
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from handler.tables import (READ_OPTIONS, convert_table, find_table,
+                            open_table, parse_table)
+
+
+def _write_table(path, rows=500):
+    """Write a plain table of ``rows`` records with ragged field widths."""
+    with open(path, 'w') as ofp:
+        ofp.write('patent_id\tcitation_id\n')
+        for row in range(rows):
+            ofp.write('{}\t{}\n'.format(row * 7, 'c' * (row % 13)))
+
+
+@pytest.mark.parametrize('fmt', ['zstd', 'gzip'])
+def test_parse_compressed_table_on_processes(tmp_path, fmt):
+    if fmt == 'zstd':
+        pytest.importorskip('zstandard')
+    plain = os.path.join(str(tmp_path), 'uspatentcitation.tsv')
+    _write_table(plain)
+    expected = pd.read_csv(plain, **READ_OPTIONS)
+    path = convert_table(plain, fmt)
+    chunks = list(parse_table(path, 2, range_bytes=1000))
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+
+def test_find_table_ignores_copy_of_replaced_original(tmp_path):
+    ipath = str(tmp_path)
+    original = os.path.join(ipath, 'patent.tsv.gz')
+    with gzip.open(original, 'wt') as ofp:
+        ofp.write('id\n1\n')
+    copy = convert_table(original, 'plain')
+    assert find_table(ipath, 'patent') == copy
+    with gzip.open(original, 'wt') as ofp:  # a new release, as downloaded
+        ofp.write('id\n1\n2\n')
+    os.utime(original, ns=(0, 0))
+    assert find_table(ipath, 'patent') == original
+
+
+def test_open_zip_table_closes_archive(tmp_path):
+    path = os.path.join(str(tmp_path), 'patent.tsv.zip')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('patent.tsv', 'id\n1\n')
+    with open_table(path) as ifp:
+        archive = ifp._fileobj._file
+        assert ifp.read() == b'id\n1\n'
+    assert archive.closed
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from handler.vocabulary import Vocabulary
+
+
+def test_codes_are_stable_as_keys_are_added():
+    vocabulary = Vocabulary(['p1'])
+    first = vocabulary.encode(pd.Series(['p2', None, 'p1']))
+    for key in range(5000):  # outgrow the initial capacity
+        vocabulary.encode([str(key)])
+    second = vocabulary.encode(['p1', 'p2', '4999'])
+    assert list(first.codes) == [1, -1, 0]
+    assert list(second.codes) == [0, 1, 5001]
+    assert len(vocabulary) == 5002
+    recoded = vocabulary.recode(first)
+    assert recoded.dtype is vocabulary.dtype
+    assert list(recoded.astype(object)[[0, 2]]) == ['p2', 'p1']
+
+
+def test_categorical_keys_are_coded_by_their_categories():
+    vocabulary = Vocabulary(['a', 'b'])
+    cached = pd.Categorical(['c', 'a', 'c'], categories=['c', 'a', 'z'])
+    codes = vocabulary.encode(cached)
+    assert list(codes.codes) == [2, 0, 2]
+    assert list(vocabulary.categories) == ['a', 'b', 'c', 'z']
+    assert vocabulary.encode(codes).dtype is vocabulary.dtype
+
+
+def test_dtype_is_built_once_keys_were_added():
+    vocabulary = Vocabulary()
+    for start in range(0, 3000, 1000):  # chunks of a table
+        codes = vocabulary.codes([str(key) for key in range(start,
+                                                            start + 1000)])
+        assert list(codes[:2]) == [start, start + 1]
+    assert vocabulary._dtype is None
+    dtype = vocabulary.dtype
+    assert list(dtype.categories[[0, 2999]]) == ['0', '2999']
+    assert vocabulary.encode(['5', None]).dtype is dtype
+    assert vocabulary.encode(['new']).dtype is not dtype